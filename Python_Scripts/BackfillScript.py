@@ -0,0 +1,346 @@
+import os
+import shutil
+import asyncio
+import hashlib
+import aiohttp
+import argparse
+import logging
+import tempfile
+import multiprocessing
+import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from aiohttp import ClientSession, ClientTimeout
+
+from alphavantage import RequestScheduler
+from response_cache import ResponseCache
+from price_parser import parse_time_series
+from output_writers import ticker_bucket, write_csv_object, write_parquet_partitions
+from ingest_state import (
+    load_api_calls_today,
+    record_api_calls,
+    ticker_stats_from_frame,
+    update_manifest,
+    update_registry,
+)
+from StockDataApiCallScript import (
+    ALPHAVANTAGE_API_KEY,
+    OUTPUT_FORMAT,
+    PARQUET_PREFIX,
+    PARQUET_TICKER_BUCKETS,
+    S3_BUCKET_NAME,
+    S3_PREFIX,
+    discover_tickers_from_s3,
+    decode_time_series,
+    fetch_time_series_body,
+    load_ticker_registry,
+    log_run_summary,
+    s3_client,
+)
+
+# -----------------------------------------------------------
+# BACKFILL SETTINGS
+# -----------------------------------------------------------
+# still under stock_prices/ so Snowpipe loads the rebuilt history
+BACKFILL_CSV_PREFIX = f"{S3_PREFIX}backfill/"
+DEFAULT_PROCESSES = os.cpu_count() or 1
+SHARDS_PER_PROCESS = 4
+# shards parsed concurrently per worker; caps payloads held in memory
+MAX_QUEUED_SHARDS_PER_PROCESS = 2
+# output files per backfill (tickers are bucketed into groups by name);
+# part of the keys, so keep it fixed between reruns of the same backfill
+BACKFILL_WRITE_GROUPS = int(os.getenv("BACKFILL_WRITE_GROUPS", "8"))
+
+
+def backfill_scope(start_date, end_date, tickers) -> str:
+    """
+    Date range plus a digest of the ticker set. Keys derive only from
+    this and the write group, so rerunning or retrying a backfill
+    overwrites its own objects, while a backfill over another ticker set
+    never touches them. (No dashed dates: rebuild_manifest would read
+    them as daily-load dates.)
+    """
+    digest = hashlib.sha256(",".join(sorted(set(tickers))).encode("utf-8")).hexdigest()[:8]
+    return f"{start_date:%Y%m%d}-{end_date:%Y%m%d}-{digest}"
+
+
+# -----------------------------------------------------------
+# WORKER PROCESS: DECODE + PARSE ONE SHARD, WRITE ONE GROUP
+# -----------------------------------------------------------
+def parse_shard(shard_number, bodies, start_date, end_date, spool_dir, group_count):
+    """
+    Runs inside a pool process. Decodes and parses the raw response of
+    every ticker in one shard (the event loop only moves bytes), then
+    spools the rows of each write group to local disk. Returns
+    (write group -> spool path, ticker -> error).
+    """
+    frames, failures = [], {}
+    ticker_dtype = pd.CategoricalDtype(sorted(bodies))
+
+    for ticker, body in bodies.items():
+        try:
+            series = decode_time_series(body, ticker)
+        except ValueError as exc:
+            failures[ticker] = f"{type(exc).__name__}: {exc}"
+            continue
+        frames.append(parse_time_series(series, ticker, start_date, end_date, ticker_dtype))
+
+    spooled = {}
+    if not frames:
+        return spooled, failures
+
+    df = pd.concat(frames, ignore_index=True)
+    # plain strings: the groups of several shards are concatenated later
+    df["ticker"] = df["ticker"].astype(str)
+    groups = df["ticker"].map(lambda ticker: ticker_bucket(ticker, group_count))
+
+    for group_number, part in df.groupby(groups, sort=True):
+        path = os.path.join(spool_dir, f"group-{group_number:03d}-shard-{shard_number:05d}.pkl")
+        part.to_pickle(path)
+        spooled[group_number] = path
+
+    return spooled, failures
+
+
+def write_group(group_number, group_count, spool_paths, scope, output_format, known):
+    """
+    Runs inside a pool process. Merges the spooled rows of one write
+    group and uploads them: one CSV object per group, or the group's
+    Parquet files under history/, under keys fixed by `scope`.
+    """
+    df = pd.concat([pd.read_pickle(path) for path in spool_paths], ignore_index=True)
+    label = f"{group_number:02d}of{group_count:02d}"
+
+    if output_format == "parquet":
+        keys = write_parquet_partitions(
+            df,
+            s3_client,
+            S3_BUCKET_NAME,
+            PARQUET_PREFIX,
+            file_label=f"backfill-{scope}-{label}",
+            ticker_buckets=PARQUET_TICKER_BUCKETS,
+        )
+    else:
+        keys = [
+            write_csv_object(
+                df, s3_client, S3_BUCKET_NAME, f"{BACKFILL_CSV_PREFIX}{scope}/part-{label}.csv"
+            )
+        ]
+
+    for path in spool_paths:
+        os.remove(path)
+
+    return keys, ticker_stats_from_frame(df, known)
+
+
+# -----------------------------------------------------------
+# MAIN PROCESS: ASYNC FETCH, STATE BOOKKEEPING
+# -----------------------------------------------------------
+def shard_tickers(tickers, shard_count) -> dict[int, list[str]]:
+    shards = defaultdict(list)
+    for ticker in sorted(set(tickers)):
+        shards[ticker_bucket(ticker, shard_count)].append(ticker)
+    return dict(sorted(shards.items()))
+
+
+async def fetch_shard(session, scheduler, tickers, failures) -> dict:
+    """ticker -> raw response body; decoding happens in the pool."""
+    results = await asyncio.gather(
+        *(fetch_time_series_body(session, scheduler, t, "full") for t in tickers),
+        return_exceptions=True,
+    )
+
+    bodies = {}
+    for ticker, result in zip(tickers, results):
+        if isinstance(result, Exception):
+            failures[ticker] = f"{type(result).__name__}: {result}"
+            logging.warning(f"❌ {ticker}: {failures[ticker]}")
+        else:
+            bodies[ticker] = result
+
+    return bodies
+
+
+def record_group(group_number, keys, ticker_stats):
+    """
+    Backfill keys stay out of the manifest's recent-file list: they are
+    not daily loads and carry no load watermark. Only the per-ticker
+    high-water marks and registry counts move.
+    """
+    if not keys:
+        return
+
+    ticker_dates = {ticker: last for ticker, (_, last, _) in ticker_stats.items()}
+    update_manifest(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda manifest: manifest.record_load(None, [], ticker_dates),
+    )
+    update_registry(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda registry: registry.record_rows(ticker_stats),
+    )
+    logging.info(
+        f"✅ Group {group_number}: {len(ticker_stats)} tickers → {len(keys)} file(s)"
+    )
+
+
+async def backfill(start_date, end_date, tickers, shard_count, processes, output_format,
+                   group_count=BACKFILL_WRITE_GROUPS):
+    shards = shard_tickers(tickers, shard_count)
+    scope = backfill_scope(start_date, end_date, tickers)
+    logging.info(
+        f"🏗️ Backfill {scope}: {len(tickers)} tickers {start_date} → {end_date} "
+        f"in {len(shards)} shards / {group_count} write groups "
+        f"on {processes} processes ({output_format})"
+    )
+
+    # rows already counted in the registry are re-sent, not new
+    known = load_ticker_registry().covered()
+
+    scheduler = RequestScheduler(
+        ALPHAVANTAGE_API_KEY,
+        calls_made_today=load_api_calls_today(s3_client, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY),
+        cache=ResponseCache(),
+    )
+    timeout = ClientTimeout(total=120)
+    connector = aiohttp.TCPConnector(limit=scheduler.max_concurrency)
+    loop = asyncio.get_running_loop()
+
+    failures = {}
+    in_flight = {}
+    spooled = defaultdict(dict)  # group -> shard -> spool path
+    spool_dir = tempfile.mkdtemp(prefix=f"backfill-{scope}-")
+
+    def fail(tickers, exc, what):
+        for ticker in tickers:
+            failures.setdefault(ticker, f"{type(exc).__name__}: {exc}")
+        logging.error(f"💥 {what} failed: {exc}")
+
+    async def drain(until_below):
+        while len(in_flight) >= until_below and in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                shard_number = in_flight.pop(future)
+                try:
+                    paths, parse_failures = future.result()
+                except Exception as exc:
+                    fail(shards[shard_number], exc, f"Shard {shard_number}")
+                    continue
+                for ticker, error in parse_failures.items():
+                    failures[ticker] = error
+                    logging.warning(f"❌ {ticker}: {error}")
+                for group_number, path in paths.items():
+                    spooled[group_number][shard_number] = path
+
+    # spawn: the parent holds threads (aiohttp, boto3) that fork would copy
+    pool = ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    )
+
+    try:
+        with pool:
+            async with ClientSession(timeout=timeout, connector=connector) as session:
+                for shard_number, shard in shards.items():
+                    bodies = await fetch_shard(session, scheduler, shard, failures)
+
+                    await drain(until_below=processes * MAX_QUEUED_SHARDS_PER_PROCESS)
+                    future = loop.run_in_executor(
+                        pool,
+                        parse_shard,
+                        shard_number,
+                        bodies,
+                        start_date,
+                        end_date,
+                        spool_dir,
+                        group_count,
+                    )
+                    in_flight[future] = shard_number
+
+            await drain(until_below=1)
+
+            writes = {
+                loop.run_in_executor(
+                    pool,
+                    write_group,
+                    group_number,
+                    group_count,
+                    list(paths.values()),
+                    scope,
+                    output_format,
+                    known,
+                ): group_number
+                for group_number, paths in sorted(spooled.items())
+            }
+            while writes:
+                done, _ = await asyncio.wait(writes, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    group_number = writes.pop(future)
+                    try:
+                        record_group(group_number, *future.result())
+                    except Exception as exc:
+                        group_tickers = [
+                            ticker
+                            for ticker in tickers
+                            if ticker_bucket(ticker, group_count) == group_number
+                            and ticker not in failures
+                        ]
+                        fail(group_tickers, exc, f"Write group {group_number}")
+    finally:
+        record_api_calls(s3_client, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY, scheduler.calls_made)
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    logging.info(
+        f"📡 {scheduler.calls_made} API calls, "
+        f"{scheduler.throttle_count} throttled, "
+        f"{scheduler.cache.hits} served from cache"
+    )
+    log_run_summary(len(tickers) - len(failures), failures)
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Rebuild daily price history for a date range and ticker set."
+    )
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument(
+        "--tickers",
+        help="comma-separated tickers (default: every active ticker in the registry)",
+    )
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument("--shards", type=int, help="default: processes x 4")
+    parser.add_argument(
+        "--write-groups",
+        type=int,
+        default=BACKFILL_WRITE_GROUPS,
+        help="output files per backfill; keep it fixed when rerunning one",
+    )
+    parser.add_argument("--format", choices=("csv", "parquet"), default=OUTPUT_FORMAT)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.tickers:
+        tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    else:
+        tickers = discover_tickers_from_s3(load_ticker_registry())
+
+    asyncio.run(
+        backfill(
+            args.start,
+            args.end,
+            tickers,
+            args.shards or args.processes * SHARDS_PER_PROCESS,
+            args.processes,
+            args.format,
+            args.write_groups,
+        )
+    )
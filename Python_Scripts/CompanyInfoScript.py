@@ -1,13 +1,35 @@
 import os
 import asyncio
 import aiohttp
-import pandas as pd
 import boto3
 import json
+import time
+import hashlib
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from aiohttp import ClientSession, ClientTimeout
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from alphavantage import RequestScheduler
+from response_cache import ResponseCache
+from run_metrics import RunMetrics
+from constituents import ConstituentsProvider
+from ingest_state import (
+    STATE_PREFIX,
+    load_api_calls_today,
+    load_registry,
+    record_api_calls,
+    read_json_state,
+    update_json_state,
+    update_registry,
+)
+from output_writers import S3MultipartStream
+from write_pipeline import BackgroundWriter
 
 # -----------------------------------------------------------
 # Logging Setup
@@ -29,6 +51,30 @@ ALPHAVANTAGE_API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
 if not ALPHAVANTAGE_API_KEY:
     raise ValueError("Missing ALPHAVANTAGE_API_KEY environment variable.")
 
+# Upload every record (not just changed ones) when the last full snapshot
+# is older than this many days; 0 disables periodic snapshots.
+OVERVIEW_FULL_SNAPSHOT_DAYS = int(os.getenv("OVERVIEW_FULL_SNAPSHOT_DAYS", "7"))
+# Daily price-driven moves (market cap, P/E, ...) count as changes. Set to 0
+# to upload only on fundamental changes: those fields in stg_stockoverview
+# can then lag by up to OVERVIEW_FULL_SNAPSHOT_DAYS.
+OVERVIEW_HASH_PRICE_FIELDS = os.getenv("OVERVIEW_HASH_PRICE_FIELDS", "1") == "1"
+# Changed records allowed to wait for the upload thread before fetching pauses.
+OVERVIEW_WRITE_QUEUE = int(os.getenv("OVERVIEW_WRITE_QUEUE", "100"))
+
+# -----------------------------------------------------------
+# Change-Data-Capture Settings
+# -----------------------------------------------------------
+OVERVIEW_HASH_KEY = f"{STATE_PREFIX}company_overview_hashes.json"
+CDC_IGNORED_FIELDS = {"ingest_timestamp"}
+# Recomputed by AlphaVantage from the latest price, so they move every
+# session even when the company's fundamentals have not changed.
+PRICE_DRIVEN_FIELDS = {
+    "MarketCapitalization", "PERatio", "PEGRatio", "TrailingPE", "ForwardPE",
+    "PriceToSalesRatioTTM", "PriceToBookRatio", "EVToRevenue", "EVToEBITDA",
+    "DividendYield", "52WeekHigh", "52WeekLow", "50DayMovingAverage",
+    "200DayMovingAverage",
+}
+
 # -----------------------------------------------------------
 # S3 Client
 # -----------------------------------------------------------
@@ -40,26 +86,68 @@ s3 = boto3.client(
 )
 
 # -----------------------------------------------------------
-# Load S&P500 Tickers
+# Run Metrics
+# -----------------------------------------------------------
+metrics = RunMetrics("company_overview")
+
+# -----------------------------------------------------------
+# Load S&P500 Tickers (conditional GET, snapshot fallback)
 # -----------------------------------------------------------
+constituents = ConstituentsProvider(s3, S3_BUCKET_NAME)
+
 def fetch_sp500_tickers():
-    df = pd.read_csv("https://datahub.io/core/s-and-p-500-companies/r/constituents.csv")
-    return df["Symbol"].str.upper().tolist()
+    tickers, diff = constituents.refresh()
+    metrics.set_context(constituents_source=constituents.source)
+    if diff.initial:
+        # no previous snapshot: every current name shows up as "added", and
+        # onboarding them would queue a full-history refetch for each
+        logging.info("📋 First constituents snapshot — nothing to onboard")
+        return tickers
+
+    metrics.incr("constituents_added", len(diff.added))
+    metrics.incr("constituents_removed", len(diff.removed))
+    onboard_new_constituents(diff.added)
+    return tickers
+
+def onboard_new_constituents(added):
+    """
+    Activates names that joined the index in the price ingest's ticker
+    registry, so the next price run gives them (and only them) a
+    full-history fetch. Names that left are not touched: they keep
+    loading until the registry ages them out.
+    """
+    if not added:
+        return
+
+    if load_registry(s3, S3_BUCKET_NAME) is None:
+        # the price ingest rebuilds a missing registry from its files;
+        # creating one here would hide that history from it
+        logging.warning("⚠️ No ticker registry yet — skipping onboarding")
+        return
+
+    onboarded = []
+
+    def onboard(registry):
+        # re-run from scratch if the registry changed underneath us
+        onboarded[:] = registry.onboard(added, datetime.utcnow().date())
+
+    update_registry(s3, S3_BUCKET_NAME, onboard)
+    metrics.incr("tickers_onboarded", len(onboarded))
+    if onboarded:
+        logging.info(f"🆕 Onboarded {len(onboarded)} new constituents: {onboarded}")
 
 # -----------------------------------------------------------
 # Fetch overview JSON (with retries)
 # -----------------------------------------------------------
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(0.5))
-async def fetch_overview(session, ticker):
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=OVERVIEW&symbol={ticker}&apikey={ALPHAVANTAGE_API_KEY}"
-    )
-
-    async with session.get(url) as resp:
-        if resp.status != 200:
-            raise Exception(f"HTTP {resp.status}")
-        data = await resp.json()
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=30),
+    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError)),
+    before_sleep=lambda _: metrics.incr("fetch_retries"),
+    reraise=True,
+)
+async def fetch_overview(session, scheduler, ticker):
+    data = await scheduler.fetch_json(session, function="OVERVIEW", symbol=ticker)
 
     if not data or "Symbol" not in data:
         logging.warning(f"⚠️ {ticker}: No overview data returned.")
@@ -71,63 +159,205 @@ async def fetch_overview(session, ticker):
     return data
 
 # -----------------------------------------------------------
-# Direct-to-S3 JSON uploader
+# Direct-to-S3 JSON uploader (streamed NDJSON)
+# -----------------------------------------------------------
+class OverviewUpload:
+    """
+    One NDJSON object, written record by record through a multipart
+    upload while the remaining overviews are still being fetched. The
+    object is only created once the first record arrives.
+    """
+
+    def __init__(self):
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H%M%S")
+        self.key = f"company_overview_json/overview_{timestamp}.json"
+        self.records = 0
+        self._stream = None
+
+    def write(self, record):
+        if self._stream is None:
+            self._stream = S3MultipartStream(
+                s3, S3_BUCKET_NAME, self.key, content_type="application/json"
+            )
+
+        # newline-separated records, no trailing newline
+        line = ("\n" if self.records else "") + json.dumps(record)
+        self._stream.write(line.encode("utf-8"))
+        self.records += 1
+
+    def close(self):
+        if self._stream is None:
+            return
+
+        self._stream.close()
+        metrics.incr("s3_bytes_out", self._stream.bytes_written)
+        metrics.incr("rows_emitted", self.records)
+        logging.info(f"📤 Uploaded JSON → s3://{S3_BUCKET_NAME}/{self.key}")
+
+    def abort(self):
+        if self._stream is not None and not self._stream.closed:
+            self._stream.abort()
+
+# -----------------------------------------------------------
+# Change detection against the persisted hash index
 # -----------------------------------------------------------
-def upload_json_to_s3(records):
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H%M%S")
-    s3_key = f"company_overview_json/overview_{timestamp}.json"
+def record_hash(record):
+    ignored = CDC_IGNORED_FIELDS
+    if not OVERVIEW_HASH_PRICE_FIELDS:
+        ignored = ignored | PRICE_DRIVEN_FIELDS
+
+    fundamentals = {k: v for k, v in record.items() if k not in ignored}
+    return hashlib.sha256(
+        json.dumps(fundamentals, sort_keys=True).encode("utf-8")
+    ).hexdigest()
 
-    json_body = "\n".join(json.dumps(rec) for rec in records)
+def load_change_index():
+    """
+    Returns (hash index, is_full_snapshot). Read before fetching so each
+    overview can be classified, and streamed, as soon as it arrives.
+    """
+    index, _ = read_json_state(s3, S3_BUCKET_NAME, OVERVIEW_HASH_KEY)
+    index = index or {"hashes": {}, "last_full_snapshot": None}
 
-    s3.put_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=s3_key,
-        Body=json_body.encode("utf-8"),
-        ContentType="application/json"
+    last_full = index.get("last_full_snapshot")
+    snapshot_due = OVERVIEW_FULL_SNAPSHOT_DAYS > 0 and (
+        not last_full
+        or datetime.fromisoformat(last_full)
+        <= datetime.utcnow() - timedelta(days=OVERVIEW_FULL_SNAPSHOT_DAYS)
     )
 
-    logging.info(f"📤 Uploaded JSON → s3://{S3_BUCKET_NAME}/{s3_key}")
+    if snapshot_due:
+        logging.info("🔍 Full snapshot due — uploading every overview")
+    return index, snapshot_due
+
+def save_record_hashes(new_hashes, is_full_snapshot):
+    def merge(index):
+        index = index or {"hashes": {}, "last_full_snapshot": None}
+        index["hashes"].update(new_hashes)
+        if is_full_snapshot:
+            index["last_full_snapshot"] = datetime.utcnow().isoformat()
+        return index
+
+    update_json_state(s3, S3_BUCKET_NAME, OVERVIEW_HASH_KEY, merge)
 
 # -----------------------------------------------------------
 # Async runner
 # -----------------------------------------------------------
-async def fetch_all_overviews(tickers):
+async def fetch_and_upload_overviews(tickers, index, snapshot_due):
+    """
+    Fetches every overview and streams the new/changed ones (all of them
+    on a snapshot run) to S3 as they arrive. Returns (new_hashes, upload).
+    """
+    scheduler = RequestScheduler(
+        ALPHAVANTAGE_API_KEY,
+        calls_made_today=load_api_calls_today(s3, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY),
+        cache=ResponseCache(),
+        metrics=metrics,
+    )
     timeout = ClientTimeout(total=120)
-    connector = aiohttp.TCPConnector(limit=120)
+    connector = aiohttp.TCPConnector(limit=scheduler.max_concurrency)
+    upload = OverviewUpload()
+    writer = BackgroundWriter(upload.write, OVERVIEW_WRITE_QUEUE)
+    new_hashes = {}
+    completed = 0
 
-    all_records = []
+    async def fetch_one(session, ticker):
+        nonlocal completed
+        started = time.monotonic()
+        try:
+            record = await fetch_overview(session, scheduler, ticker)
+        except Exception as exc:
+            # throttled, quota spent, cache miss, ...: skip the ticker, keep
+            # the run (its previous hash stays, so it uploads next time)
+            completed += 1
+            metrics.incr("tickers_failed")
+            logging.warning(f"❌ [{completed}/{len(tickers)}] {ticker}: {type(exc).__name__}: {exc}")
+            return
+        finally:
+            metrics.observe("ticker_seconds", time.monotonic() - started)
+        completed += 1
 
-    async with ClientSession(timeout=timeout, connector=connector) as session:
-        for i, ticker in enumerate(tickers, start=1):
-            logging.info(f"⏳ [{i}/{len(tickers)}] Fetching OVERVIEW for {ticker}…")
-            record = await fetch_overview(session, ticker)
+        if not record:
+            metrics.incr("tickers_missing")
+            logging.warning(f"❌ [{completed}/{len(tickers)}] No data for {ticker}")
+            return
 
-            if record:
-                all_records.append(record)
-                logging.info(f"✅ {ticker} done")
-            else:
-                logging.warning(f"❌ No data for {ticker}")
+        metrics.incr("tickers_loaded")
+        logging.info(f"✅ [{completed}/{len(tickers)}] {ticker} done")
 
-            await asyncio.sleep(0.5)
+        digest = record_hash(record)
+        new_hashes[record["ticker"]] = digest
+        if snapshot_due or index["hashes"].get(record["ticker"]) != digest:
+            await writer.put(record)
 
-    return all_records
+    try:
+        async with ClientSession(timeout=timeout, connector=connector) as session:
+            logging.info(f"⏳ Fetching OVERVIEW for {len(tickers)} tickers…")
+            await asyncio.gather(
+                *(fetch_one(session, ticker) for ticker in tickers)
+            )
+        await writer.close()
+        with metrics.stage("upload"):
+            upload.close()
+    except BaseException:
+        await writer.abort()
+        upload.abort()
+        raise
+    finally:
+        record_api_calls(s3, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY, scheduler.calls_made)
+
+    logging.info(
+        f"📡 {scheduler.calls_made} API calls, "
+        f"{scheduler.throttle_count} throttled, "
+        f"{scheduler.cache.hits} served from cache"
+    )
+    logging.info(f"🔍 {upload.records} of {len(new_hashes)} overviews uploaded")
+
+    return new_hashes, upload
 
 # -----------------------------------------------------------
 # Main
 # -----------------------------------------------------------
-def main():
+def ingest_overviews():
     logging.info("🚀 STARTING ZERO-LOCAL JSON COMPANY OVERVIEW INGEST")
 
-    tickers = fetch_sp500_tickers()
-    records = asyncio.run(fetch_all_overviews(tickers))
+    with metrics.stage("fetch_tickers"):
+        tickers = fetch_sp500_tickers()
+    metrics.set_context(tickers=len(tickers))
+
+    with metrics.stage("change_detection"):
+        index, is_full_snapshot = load_change_index()
+
+    # uploads happen inside this stage, overlapped with the fetches
+    with metrics.stage("fetch"):
+        new_hashes, upload = asyncio.run(
+            fetch_and_upload_overviews(tickers, index, is_full_snapshot)
+        )
+    metrics.set_context(changed=upload.records, full_snapshot=is_full_snapshot)
 
-    if not records:
+    if not new_hashes:
         logging.warning("⚠️ No company overview data returned.")
         return
 
-    upload_json_to_s3(records)
+    if not upload.records:
+        logging.info("💤 No overview changes since last run — nothing to upload.")
+        return
+
+    # only remember hashes once the upload is durable
+    with metrics.stage("save_hashes"):
+        save_record_hashes(new_hashes, is_full_snapshot)
+
+    logging.info(f"🎉 COMPLETE — {upload.records} JSON records uploaded directly to S3!")
+
+def main():
+    try:
+        ingest_overviews()
+    except BaseException:
+        metrics.publish(s3, S3_BUCKET_NAME, status="failed")
+        raise
 
-    logging.info("🎉 COMPLETE — JSON uploaded directly to S3!")
+    status = "partial" if metrics.counters.get("tickers_failed") else "success"
+    metrics.publish(s3, S3_BUCKET_NAME, status=status)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,450 @@
+import os
+import re
+import json
+import logging
+import argparse
+import pandas as pd
+
+# -----------------------------------------------------------
+# LOGGING
+# -----------------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+# -----------------------------------------------------------
+# PROFILER SETTINGS
+# -----------------------------------------------------------
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROJECT_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), "dbt_stockmarketproject")
+
+DEFAULT_RECENT_RUNS = 3
+DEFAULT_BASELINE_RUNS = 10
+# flag a model when its runtime grew this much more than its input did
+REGRESSION_RATIO = 1.5
+# ... and it now takes at least this long (ignores noise on tiny models)
+MIN_REGRESSION_SECONDS = 1.0
+
+TIMED_RESOURCES = ("model.", "seed.", "snapshot.")
+# adapter_response keys that carry scanned bytes (BigQuery and friends;
+# Snowflake returns a query_id instead, see QUERY_HISTORY)
+BYTES_KEYS = ("bytes_scanned", "bytes_processed", "bytes_billed")
+
+ANSI = re.compile(r"\x1b\[[0-9;]*m")
+# "==== 2025-11-06 00:00:13.168650 | <invocation id> ====" (the date is
+# missing from dbt-core's own file log)
+LOG_HEADER = re.compile(
+    r"^=+ (?:(?P<date>\d{4}-\d{2}-\d{2}) )?(?P<time>\d{2}:\d{2}:\d{2}\.\d+) \| (?P<id>[0-9a-f-]{36}) =+$"
+)
+# "3 of 20 OK created sql table model ANALYTICS.dim_company .... [SUCCESS 512 in 1.42s]"
+LOG_RESULT = re.compile(
+    r"\d+ of \d+ (?P<outcome>OK created|ERROR creating) sql (?P<materialized>\w+) model "
+    r"(?P<relation>[\w.\"]+) \.*\s*\[(?P<code>\w+)(?: (?P<rows>-?\d+))? in (?P<seconds>[\d.]+)s\]"
+)
+
+
+# -----------------------------------------------------------
+# RUN RECORDS FROM ARTIFACTS
+# -----------------------------------------------------------
+def node_name(unique_id: str) -> str:
+    return unique_id.rsplit(".", 1)[-1]
+
+
+def parent_map(manifest: dict) -> dict[str, list[str]]:
+    """model name -> names of the timed nodes it selects from."""
+    nodes = manifest.get("nodes", {})
+    timed = {uid for uid in nodes if uid.startswith(TIMED_RESOURCES)}
+
+    return {
+        node_name(uid): sorted(
+            node_name(parent)
+            for parent in nodes[uid].get("depends_on", {}).get("nodes", [])
+            if parent in timed
+        )
+        for uid in timed
+    }
+
+
+def _adapter_number(response: dict, keys):
+    for key in keys:
+        value = response.get(key)
+        if isinstance(value, (int, float)) and value >= 0:
+            return value
+    return None
+
+
+def record_from_run_results(run_results: dict, manifest: dict | None) -> dict | None:
+    """One history record per dbt invocation, timed nodes only."""
+    models = {}
+
+    for result in run_results.get("results", []):
+        if not result["unique_id"].startswith(TIMED_RESOURCES):
+            continue
+
+        execute = next((t for t in result.get("timing", []) if t["name"] == "execute"), {})
+        response = result.get("adapter_response") or {}
+        models[node_name(result["unique_id"])] = {
+            "status": result["status"],
+            "seconds": round(result["execution_time"], 3),
+            "rows": _adapter_number(response, ("rows_affected",)),
+            "bytes": _adapter_number(response, BYTES_KEYS),
+            "query_id": response.get("query_id"),
+            "started_at": execute.get("started_at"),
+            "completed_at": execute.get("completed_at"),
+        }
+
+    if not models:
+        return None
+
+    metadata = run_results.get("metadata", {})
+    return {
+        "invocation_id": metadata.get("invocation_id"),
+        "generated_at": metadata.get("generated_at"),
+        "source": "run_results",
+        "command": run_results.get("args", {}).get("which"),
+        "elapsed_seconds": round(run_results.get("elapsed_time", 0.0), 3),
+        "models": models,
+        "parents": parent_map(manifest) if manifest else {},
+    }
+
+
+def records_from_log(path: str) -> list[dict]:
+    """
+    Backfills history from a dbt file log: one record per invocation
+    that built models. Rows come from the adapter status when it has
+    them ("SUCCESS 512"); there is no DAG or byte count in the log.
+    """
+    records, current = [], None
+
+    with open(path, errors="replace") as fh:
+        for line in fh:
+            line = ANSI.sub("", line).strip()
+
+            header = LOG_HEADER.match(line)
+            if header:
+                stamp = f"{header['date']}T{header['time']}" if header["date"] else None
+                current = {
+                    "invocation_id": header["id"],
+                    "generated_at": stamp,
+                    "source": "log",
+                    "command": None,
+                    "elapsed_seconds": None,
+                    "models": {},
+                    "parents": {},
+                }
+                records.append(current)
+                continue
+
+            result = LOG_RESULT.search(line)
+            if result and current is not None:
+                current["models"][result["relation"].rsplit(".", 1)[-1].strip('"')] = {
+                    "status": "success" if result["outcome"] == "OK created" else "error",
+                    "seconds": float(result["seconds"]),
+                    "rows": int(result["rows"]) if result["rows"] and int(result["rows"]) >= 0 else None,
+                    "bytes": None,
+                    "query_id": None,
+                    "started_at": None,
+                    "completed_at": None,
+                }
+
+    return [record for record in records if record["models"]]
+
+
+# -----------------------------------------------------------
+# HISTORY STORE (JSONL, ONE LINE PER INVOCATION)
+# -----------------------------------------------------------
+def load_history(path: str) -> dict[str, dict]:
+    history = {}
+    if os.path.exists(path):
+        with open(path) as fh:
+            for line in fh:
+                if line.strip():
+                    record = json.loads(line)
+                    history[record["invocation_id"]] = record
+    return history
+
+
+def save_history(path: str, history: dict[str, dict]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as fh:
+        for record in history.values():
+            fh.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def merge_records(history: dict, records) -> int:
+    """Adds new invocations; artifact records replace log-derived ones."""
+    added = 0
+    for record in records:
+        existing = history.get(record["invocation_id"])
+        if existing is None:
+            added += 1
+        elif existing["source"] == "run_results" and record["source"] != "run_results":
+            continue
+        history[record["invocation_id"]] = record
+    return added
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+# -----------------------------------------------------------
+# ANALYSIS
+# -----------------------------------------------------------
+def history_frame(history: dict) -> pd.DataFrame:
+    """One row per (run, model), in run order."""
+    runs = sorted(
+        enumerate(history.values()),
+        key=lambda item: (item[1]["generated_at"] or "", item[0]),
+    )
+    rows = [
+        {
+            "run": run_number,
+            "invocation_id": record["invocation_id"],
+            "generated_at": record["generated_at"],
+            "model": model,
+            **stats,
+        }
+        for run_number, (_, record) in enumerate(runs)
+        for model, stats in record["models"].items()
+    ]
+    return pd.DataFrame(rows)
+
+
+def latest_parents(history: dict) -> dict[str, list[str]]:
+    for record in sorted(history.values(), key=lambda r: r["generated_at"] or "", reverse=True):
+        if record["parents"]:
+            return record["parents"]
+    return {}
+
+
+def critical_path(seconds: dict[str, float], parents: dict[str, list[str]]):
+    """
+    Longest chain of dependent nodes by execution time: the part of the
+    run that no amount of threads can overlap. Returns ([(model, seconds)], total).
+    """
+    finish = {}
+
+    def finish_time(model):
+        if model not in finish:
+            upstream = [p for p in parents.get(model, []) if p in seconds]
+            finish[model] = seconds[model] + max((finish_time(p) for p in upstream), default=0.0)
+        return finish[model]
+
+    if not seconds:
+        return [], 0.0
+
+    model = max(seconds, key=finish_time)
+    total, path = finish[model], []
+    while model is not None:
+        path.append((model, seconds[model]))
+        upstream = [p for p in parents.get(model, []) if p in seconds]
+        model = max(upstream, key=finish_time) if upstream else None
+
+    return path[::-1], round(total, 3)
+
+
+def input_sizes(frame: pd.DataFrame, parents: dict) -> pd.Series:
+    """
+    Per (run, model) input measure: bytes scanned when the adapter
+    reports it, else the rows its parents produced in the same run.
+    """
+    rows = frame.set_index(["run", "model"])["rows"]
+    sizes = []
+
+    for run, model, scanned in frame[["run", "model", "bytes"]].itertuples(index=False):
+        if pd.notna(scanned):
+            sizes.append(scanned)
+            continue
+        upstream = [rows.get((run, p)) for p in parents.get(model, [])]
+        upstream = [r for r in upstream if pd.notna(r)]
+        sizes.append(sum(upstream) if upstream else None)
+
+    return pd.Series(sizes, index=frame.index, dtype="float64")
+
+
+def model_summary(frame: pd.DataFrame, on_path: set[str]) -> pd.DataFrame:
+    ok = frame[frame["status"] == "success"]
+    summary = ok.groupby("model").agg(
+        runs=("seconds", "size"),
+        last_s=("seconds", "last"),
+        median_s=("seconds", "median"),
+        p90_s=("seconds", lambda s: s.quantile(0.9)),
+        last_rows=("rows", "last"),
+        last_bytes=("bytes", "last"),
+    )
+    summary["critical"] = summary.index.isin(on_path)
+    return summary.sort_values("median_s", ascending=False)
+
+
+def find_regressions(frame, recent=DEFAULT_RECENT_RUNS, baseline=DEFAULT_BASELINE_RUNS,
+                     ratio=REGRESSION_RATIO, min_seconds=MIN_REGRESSION_SECONDS) -> pd.DataFrame:
+    """
+    Compares each model's last `recent` successful runs with the
+    `baseline` runs before them: flagged when the runtime grew `ratio`
+    times more than the input did (input assumed flat when unknown).
+    """
+    flagged = []
+
+    for model, runs in frame[frame["status"] == "success"].groupby("model", sort=True):
+        if len(runs) < recent + 2:
+            continue
+
+        now = runs.tail(recent)
+        before = runs.iloc[-(recent + baseline):-recent]
+        if before["seconds"].median() <= 0:
+            continue
+
+        time_growth = now["seconds"].median() / before["seconds"].median()
+        input_now, input_before = now["input"].median(), before["input"].median()
+        input_growth = (
+            input_now / input_before
+            if pd.notna(input_now) and pd.notna(input_before) and input_before > 0
+            else None
+        )
+
+        excess = time_growth / (input_growth or 1.0)
+        if now["seconds"].median() >= min_seconds and excess >= ratio:
+            flagged.append({
+                "model": model,
+                "baseline_s": round(before["seconds"].median(), 3),
+                "recent_s": round(now["seconds"].median(), 3),
+                "time_growth": round(time_growth, 2),
+                "input_growth": round(input_growth, 2) if input_growth else None,
+                "excess": round(excess, 2),
+            })
+
+    return pd.DataFrame(
+        flagged,
+        columns=["model", "baseline_s", "recent_s", "time_growth", "input_growth", "excess"],
+    ).sort_values("excess", ascending=False)
+
+
+def build_report(history: dict, recent: int, baseline: int) -> dict:
+    frame = history_frame(history)
+    parents = latest_parents(history)
+    frame["input"] = input_sizes(frame, parents)
+
+    latest_run = frame["run"].max()
+    latest = frame[frame["run"] == latest_run]
+    latest_record = history[latest["invocation_id"].iloc[0]]
+    path, path_seconds = critical_path(
+        dict(zip(latest["model"], latest["seconds"])), latest_record["parents"] or parents
+    )
+
+    return {
+        "runs": int(frame["run"].nunique()),
+        "latest": {
+            "invocation_id": latest_record["invocation_id"],
+            "generated_at": latest_record["generated_at"],
+            "elapsed_seconds": latest_record["elapsed_seconds"],
+            "model_seconds": round(latest["seconds"].sum(), 3),
+            "critical_path_seconds": path_seconds,
+            "critical_path": [{"model": m, "seconds": s} for m, s in path],
+        },
+        "models": model_summary(frame, {m for m, _ in path}).reset_index(),
+        "regressions": find_regressions(frame, recent, baseline),
+    }
+
+
+# -----------------------------------------------------------
+# OUTPUT
+# -----------------------------------------------------------
+def print_report(report: dict):
+    latest = report["latest"]
+    print(f"\n📊 {report['runs']} run(s) profiled; latest {latest['invocation_id']} ({latest['generated_at']})")
+    if latest["elapsed_seconds"]:
+        print(
+            f"   wall {latest['elapsed_seconds']:.2f}s, "
+            f"{latest['model_seconds']:.2f}s summed over models, "
+            f"critical path {latest['critical_path_seconds']:.2f}s"
+        )
+
+    print("\n⏱️ Per-model history (successful runs, * = on the latest critical path)")
+    with pd.option_context("display.width", 160, "display.max_rows", 200):
+        models = report["models"].copy()
+        models["model"] = models["model"] + models["critical"].map({True: " *", False: ""})
+        print(models.drop(columns="critical").to_string(index=False, float_format="%.2f"))
+
+    print("\n🧵 Critical path (latest run)")
+    for step in latest["critical_path"]:
+        print(f"   {step['seconds']:>8.2f}s  {step['model']}")
+
+    regressions = report["regressions"]
+    if regressions.empty:
+        print("\n✅ No model's runtime outgrew its input")
+    else:
+        print("\n🚨 Runtime grew faster than input")
+        print(regressions.to_string(index=False))
+
+
+def save_report(report: dict, path: str):
+    payload = {
+        **report,
+        "models": report["models"].to_dict(orient="records"),
+        "regressions": report["regressions"].to_dict(orient="records"),
+    }
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2, default=str)
+    logging.info(f"💾 Report → {path}")
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Profile dbt runs over time: per-model timing, the DAG's "
+            "critical path and models whose runtime outgrew their input."
+        )
+    )
+    parser.add_argument("--project-dir", default=DEFAULT_PROJECT_DIR)
+    parser.add_argument("--target-dir", help="dbt artifacts (default: <project>/target)")
+    parser.add_argument("--log-file", action="append",
+                        help="dbt file log(s) to backfill from (default: <project>/logs/dbt.log)")
+    parser.add_argument("--history", help="run history JSONL (default: <project>/logs/run_history.jsonl)")
+    parser.add_argument("--no-record", action="store_true",
+                        help="report on the stored history without adding the current artifacts")
+    parser.add_argument("--recent", type=int, default=DEFAULT_RECENT_RUNS)
+    parser.add_argument("--baseline", type=int, default=DEFAULT_BASELINE_RUNS)
+    parser.add_argument("--json", help="also write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    target_dir = args.target_dir or os.path.join(args.project_dir, "target")
+    history_path = args.history or os.path.join(args.project_dir, "logs", "run_history.jsonl")
+    log_files = args.log_file or [os.path.join(args.project_dir, "logs", "dbt.log")]
+
+    history = load_history(history_path)
+
+    if not args.no_record:
+        added = 0
+        for log_file in log_files:
+            if os.path.exists(log_file):
+                added += merge_records(history, records_from_log(log_file))
+
+        run_results = _read_json(os.path.join(target_dir, "run_results.json"))
+        if run_results:
+            record = record_from_run_results(
+                run_results, _read_json(os.path.join(target_dir, "manifest.json"))
+            )
+            if record:
+                added += merge_records(history, [record])
+
+        save_history(history_path, history)
+        logging.info(f"📝 {added} new run(s) recorded → {history_path}")
+
+    if not history:
+        raise SystemExit("No dbt runs recorded yet — run dbt, then this profiler.")
+
+    report = build_report(history, args.recent, args.baseline)
+    print_report(report)
+    if args.json:
+        save_report(report, args.json)
@@ -0,0 +1,248 @@
+import sys
+import json
+import math
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, MOMENTUM_LAGS, VOLATILITY_WINDOW, compute_features
+from feature_state import FeatureState
+
+# -----------------------------------------------------------
+# LOGGING
+# -----------------------------------------------------------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+# -----------------------------------------------------------
+# PARITY SETTINGS
+# -----------------------------------------------------------
+RTOL = 1e-9
+ATOL = 1e-12
+MAX_REPORTED_MISMATCHES = 10
+
+# column names used by stg_stockpricedata / int_* models
+WAREHOUSE_COLUMNS = {
+    "TICKER": "ticker",
+    "TRADING_DATE": "date",
+    "CLOSE_PRICE": "close",
+    "DAILY_RETURN": "daily_return",
+    "ONE_MONTH_RETURN": "one_month_return",
+    "THREE_MONTH_RETURN": "three_month_return",
+    "SIX_MONTH_RETURN": "six_month_return",
+    "DAILY_VOLATILITY": "daily_volatility",
+}
+
+
+# -----------------------------------------------------------
+# ROW-BY-ROW REFERENCE (LITERAL SQL SEMANTICS, None = NULL)
+# -----------------------------------------------------------
+def _nullif_zero(value):
+    return None if value is None or value == 0 else value
+
+
+def _ratio_minus_one(close, previous):
+    previous = _nullif_zero(previous)
+    if close is None or previous is None:
+        return None
+    return close / previous - 1
+
+
+def _stddev_samp(values):
+    values = [v for v in values if v is not None]
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def sql_reference(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deliberately naive: evaluates each window expression of the dbt
+    models one row at a time, per ticker ordered by date.
+    """
+    rows = []
+    ordered = prices.sort_values(["ticker", "date"], kind="stable")
+
+    for ticker, history in ordered.groupby("ticker", observed=True, sort=True):
+        closes = [None if pd.isna(c) else float(c) for c in history["close"]]
+        dates = list(history["date"])
+        returns = []
+
+        for i, close in enumerate(closes):
+            row = {"ticker": ticker, "date": dates[i], "close": close}
+
+            row["daily_return"] = _ratio_minus_one(close, closes[i - 1] if i >= 1 else None)
+            returns.append(row["daily_return"])
+
+            for column, periods in MOMENTUM_LAGS.items():
+                previous = closes[i - periods] if i >= periods else None
+                row[column] = _ratio_minus_one(close, previous)
+
+            window = returns[max(0, i - (VOLATILITY_WINDOW - 1)): i + 1]
+            row["daily_volatility"] = _stddev_samp(window)
+            rows.append(row)
+
+    return pd.DataFrame(rows).astype({c: "float64" for c in ["close", *FEATURE_COLUMNS]})
+
+
+# -----------------------------------------------------------
+# INCREMENTAL REPLAY (ROLLING STATE, ONE DAY AT A TIME)
+# -----------------------------------------------------------
+def incremental_replay(prices: pd.DataFrame, seed_fraction: float):
+    """
+    Seeds a FeatureState from the first `seed_fraction` of the trading
+    days, then feeds the remaining days one at a time, round-tripping the
+    state through JSON between days as the daily runs do through S3.
+    Returns (replayed feature rows, cutoff date).
+    """
+    dates = np.sort(prices["date"].unique())
+    cutoff = dates[int(len(dates) * seed_fraction)]
+
+    state = FeatureState()
+    state.apply(prices[prices["date"] <= cutoff])
+
+    outputs = []
+    for day in dates[dates > cutoff]:
+        state = FeatureState.from_dict(json.loads(json.dumps(state.to_dict())))
+        features, _ = state.apply(prices[prices["date"] == day])
+        outputs.append(features)
+
+    return pd.concat(outputs, ignore_index=True), cutoff
+
+
+# -----------------------------------------------------------
+# INPUTS
+# -----------------------------------------------------------
+def synthetic_prices(tickers: int, bars: int, seed: int) -> pd.DataFrame:
+    """
+    Random walks plus the edge cases the SQL has to handle: NULL and zero
+    closes, flat prices, one- and two-bar tickers, unsorted input rows.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+
+    for t in range(tickers):
+        n = {0: 1, 1: 2}.get(t, bars)
+        dates = pd.bdate_range("2020-01-01", periods=n)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+        if t == 2:
+            close[:] = 42.0
+        if n > 10 and t % 3 == 0:
+            close[rng.choice(n, size=max(1, n // 50), replace=False)] = np.nan
+        if n > 10 and t % 5 == 0:
+            close[rng.integers(1, n)] = 0.0
+
+        frames.append(pd.DataFrame({"ticker": f"T{t:04d}", "date": dates, "close": close}))
+
+    prices = pd.concat(frames, ignore_index=True)
+    return prices.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def read_table(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+
+    df = df.rename(columns={k: v for k, v in WAREHOUSE_COLUMNS.items() if k in df})
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+# -----------------------------------------------------------
+# COMPARISON
+# -----------------------------------------------------------
+def compare(actual: pd.DataFrame, expected: pd.DataFrame, label: str) -> int:
+    merged = expected.merge(
+        actual,
+        on=["ticker", "date"],
+        how="outer",
+        suffixes=("_expected", "_actual"),
+        indicator=True,
+    )
+    unmatched = merged[merged["_merge"] != "both"]
+    mismatches = len(unmatched)
+    if mismatches:
+        logging.error(f"❌ {label}: {mismatches} (ticker, date) rows present on one side only")
+
+    merged = merged[merged["_merge"] == "both"]
+    for column in FEATURE_COLUMNS:
+        if f"{column}_expected" not in merged:
+            continue
+
+        e = merged[f"{column}_expected"].to_numpy(dtype=np.float64)
+        a = merged[f"{column}_actual"].to_numpy(dtype=np.float64)
+        same = np.isclose(a, e, rtol=RTOL, atol=ATOL, equal_nan=True)
+        bad = merged.loc[~same, ["ticker", "date", f"{column}_expected", f"{column}_actual"]]
+
+        if bad.empty:
+            logging.info(f"✅ {label}: {column} matches on {len(merged)} rows")
+            continue
+
+        mismatches += len(bad)
+        logging.error(f"❌ {label}: {column} differs on {len(bad)} rows")
+        for row in bad.head(MAX_REPORTED_MISMATCHES).itertuples(index=False):
+            logging.error(f"   {row}")
+
+    return mismatches
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Check the NumPy feature engine against the SQL semantics of "
+            "int_stock_stats / int_price_momentum / int_quality_factors."
+        )
+    )
+    parser.add_argument("--prices", help="CSV/Parquet price file (default: synthetic)")
+    parser.add_argument(
+        "--warehouse-export",
+        help="CSV/Parquet export of the dbt feature columns to compare against as well",
+    )
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--seed-fraction",
+        type=float,
+        default=0.8,
+        help="share of trading days used to seed the rolling state before replay",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    prices = read_table(args.prices) if args.prices else synthetic_prices(
+        args.tickers, args.bars, args.seed
+    )
+    logging.info(f"📈 {len(prices)} price rows for {prices['ticker'].nunique()} tickers")
+
+    features = compute_features(prices)
+    mismatches = compare(features, sql_reference(prices), "engine vs SQL reference")
+
+    replayed, cutoff = incremental_replay(prices, args.seed_fraction)
+    mismatches += compare(
+        replayed, features[features["date"] > cutoff], "rolling state vs engine"
+    )
+
+    if args.warehouse_export:
+        # exports may cover a subset of rows (int_quality_factors holds one
+        # as-of snapshot per ticker), so only compare the rows they contain
+        warehouse = read_table(args.warehouse_export)
+        exported = features.merge(warehouse[["ticker", "date"]], on=["ticker", "date"])
+        mismatches += compare(exported, warehouse, "engine vs warehouse")
+
+    if mismatches:
+        sys.exit(f"💥 Feature parity failed: {mismatches} mismatches")
+
+    logging.info("🎉 Feature engine matches the SQL semantics")
@@ -1,13 +1,62 @@
 import os
 import re
+import json
+import sys
+import time
 import asyncio
 import aiohttp
 import pandas as pd
 import boto3
 import logging
+from collections import Counter
 from datetime import datetime, timedelta, date
 from aiohttp import ClientSession, ClientTimeout
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from alphavantage import RequestScheduler
+from run_metrics import RunMetrics
+from response_cache import ResponseCache
+from fetch_planner import (
+    SERIES_KEY,
+    FetchPlan,
+    dividend_restatement,
+    escalate,
+    needs_full_refetch,
+    plan_fetch,
+)
+from price_parser import close_before, parse_time_series
+from output_writers import write_csv_object, write_parquet_partitions
+from write_pipeline import BackgroundWriter
+from validation import VALIDATION_MODE, validate_batch, write_quarantine
+from sharding import Shard
+from feature_state import (
+    feature_state_exists,
+    rebuild_feature_state_from_files,
+    update_feature_state,
+)
+from ingest_state import (
+    QUARANTINE_LEDGER_KEY,
+    find_journal_end_dates,
+    load_api_calls_today,
+    load_journal,
+    load_manifest,
+    load_quarantine_ledger,
+    load_registry,
+    rebuild_manifest_from_listing,
+    read_price_objects,
+    rebuild_registry_from_files,
+    record_api_calls,
+    ticker_stats_from_frame,
+    update_journal,
+    update_manifest,
+    update_quarantine_ledger,
+    update_registry,
+)
 
 # -----------------------------------------------------------
 # LOGGING
@@ -31,10 +80,35 @@ if not S3_BUCKET_NAME:
 if not ALPHAVANTAGE_API_KEY:
     raise ValueError("Missing ALPHAVANTAGE_API_KEY environment variable")
 
+# -----------------------------------------------------------
+# OPTIONAL SETTINGS
+# -----------------------------------------------------------
+# "csv" (default, what Snowpipe/stg_stockpricedata load) or "parquet"
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv").lower()
+PARQUET_TICKER_BUCKETS = int(os.getenv("PARQUET_TICKER_BUCKETS", "0"))
+# finished tickers are uploaded + journaled in batches of this size
+JOURNAL_BATCH_TICKERS = int(os.getenv("JOURNAL_BATCH_TICKERS", "50"))
+# full batches allowed to wait for the upload thread before fetching
+# pauses; bounds peak memory to roughly (this + 3) batches
+WRITE_QUEUE_BATCHES = int(os.getenv("WRITE_QUEUE_BATCHES", "2"))
+# 1 = extend the rolling feature state with each batch and write the new
+# feature rows (returns, momentum, volatility) under stock_features/
+COMPUTE_FEATURES = os.getenv("COMPUTE_FEATURES", "0") == "1"
+# SHARD_COUNT > 1 splits the universe across that many workers, each run
+# with its own SHARD_INDEX (and its own ALPHAVANTAGE_API_KEY, so its own
+# quota). Shards only write their own files + journal; `--merge-shards`
+# then folds them into the shared manifest/registry/feature state.
+SHARD = Shard.from_env()
+# a price jump held back with the same close on this many days is taken
+# as genuine on the next run (0 = only bars acknowledged in the ledger)
+QUARANTINE_CONFIRM_RUNS = int(os.getenv("QUARANTINE_CONFIRM_RUNS", "3"))
+
 # -----------------------------------------------------------
 # INTERNAL CONSTANTS (NOT ENV VARS)
 # -----------------------------------------------------------
 S3_PREFIX = "stock_prices/"
+PARQUET_PREFIX = "stock_prices_parquet/"
+FEATURE_PREFIX = "stock_features/"
 DATE_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2})")
 FALLBACK_START_DATE = date(2020, 1, 1)
 BOOTSTRAP_TICKER = "AAPL"  # used only if S3 is empty
@@ -49,80 +123,135 @@ s3_client = boto3.client(
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
 )
 
+# -----------------------------------------------------------
+# RUN METRICS (JSON RUN REPORT + OPTIONAL PROMETHEUS TEXTFILE)
+# -----------------------------------------------------------
+metrics = RunMetrics("stock_prices", shard=SHARD.label)
+
 # -----------------------------------------------------------
 # DISCOVER LAST LOADED DATE FROM S3
 # -----------------------------------------------------------
-def get_last_loaded_date_from_s3() -> date:
-    paginator = s3_client.get_paginator("list_objects_v2")
-    latest_date = None
-
-    for page in paginator.paginate(
-        Bucket=S3_BUCKET_NAME,
-        Prefix=S3_PREFIX,
-    ):
-        for obj in page.get("Contents", []):
-            match = DATE_REGEX.search(obj["Key"])
-            if match:
-                parsed_date = datetime.strptime(
-                    match.group(1), "%Y-%m-%d"
-                ).date()
-                if not latest_date or parsed_date > latest_date:
-                    latest_date = parsed_date
-
-    if latest_date:
-        logging.info(f"📦 Last loaded S3 data date: {latest_date}")
-        return latest_date
+def rebuild_manifest():
+    """
+    Repair path only: lists every object under the CSV and Parquet
+    prefixes and rewrites the watermark manifest from the dated keys.
+    """
+    return rebuild_manifest_from_listing(
+        s3_client, S3_BUCKET_NAME, (S3_PREFIX, PARQUET_PREFIX), DATE_REGEX
+    )
+
+
+def load_watermarks():
+    # One GET, regardless of how much history sits in the bucket
+    with metrics.stage("load_manifest"):
+        manifest = load_manifest(s3_client, S3_BUCKET_NAME)
+
+        if manifest is None:
+            logging.warning("⚠️ No watermark manifest found — rebuilding from listing")
+            metrics.incr("state_rebuilds")
+            manifest = rebuild_manifest()
+
+    return manifest
+
+
+def get_last_loaded_date_from_s3(manifest) -> date:
+    if manifest.last_loaded_date:
+        logging.info(f"📦 Last loaded S3 data date: {manifest.last_loaded_date}")
+        return manifest.last_loaded_date
 
     logging.warning("⚠️ No dated objects found in S3")
     return FALLBACK_START_DATE
 
 
 # -----------------------------------------------------------
-# DISCOVER TICKERS DYNAMICALLY FROM S3 DATA
+# DISCOVER TICKERS FROM THE TICKER REGISTRY
 # -----------------------------------------------------------
-def discover_tickers_from_s3() -> list[str]:
+def rebuild_registry():
     """
-    Reads a small sample of existing S3 files to infer tickers dynamically.
+    Repair path only: scans the date/ticker columns of every stored
+    price file and rewrites the ticker registry.
     """
-    paginator = s3_client.get_paginator("list_objects_v2")
-    tickers = set()
+    return rebuild_registry_from_files(
+        s3_client, S3_BUCKET_NAME, (S3_PREFIX, PARQUET_PREFIX), date.today()
+    )
 
-    for page in paginator.paginate(
-        Bucket=S3_BUCKET_NAME,
-        Prefix=S3_PREFIX,
-    ):
-        for obj in page.get("Contents", []):
-            if obj["Key"].endswith(".csv"):
-                response = s3_client.get_object(
-                    Bucket=S3_BUCKET_NAME,
-                    Key=obj["Key"],
-                )
-                df = pd.read_csv(response["Body"], nrows=500)
-                if "ticker" in df.columns:
-                    tickers.update(df["ticker"].dropna().unique())
 
-            if tickers:
-                break
+def load_ticker_registry():
+    # One small GET; the full scan only runs when the registry is missing
+    with metrics.stage("load_registry"):
+        registry = load_registry(s3_client, S3_BUCKET_NAME)
 
-        if tickers:
-            break
+        if registry is None:
+            logging.warning("⚠️ No ticker registry found — rebuilding from S3 files")
+            metrics.incr("state_rebuilds")
+            registry = rebuild_registry()
 
-    if tickers:
-        ticker_list = sorted(tickers)
-        logging.info(f"📈 Discovered {len(ticker_list)} tickers dynamically")
-        return ticker_list
+    return registry
 
-    logging.warning(
-        "⚠️ No existing ticker data found — using bootstrap ticker"
+
+def discover_tickers_from_s3(registry) -> list[str]:
+    """
+    Returns every active ticker in the persisted registry, sorted.
+    """
+    ticker_list = registry.active_tickers()
+    if not ticker_list:
+        logging.warning(
+            "⚠️ No existing ticker data found — using bootstrap ticker"
+        )
+        ticker_list = [BOOTSTRAP_TICKER]
+    else:
+        logging.info(f"📈 Discovered {len(ticker_list)} tickers from registry")
+
+    if SHARD.enabled:
+        ticker_list = SHARD.select(ticker_list)
+        logging.info(f"🧩 Shard {SHARD.label}: {len(ticker_list)} tickers")
+    return ticker_list
+
+
+# -----------------------------------------------------------
+# ROLLING FEATURE STATE
+# -----------------------------------------------------------
+def rebuild_feature_state(exclude=()):
+    """
+    Bootstrap/repair path: seeds every ticker's rolling feature state
+    from the full stored price history.
+    """
+    return rebuild_feature_state_from_files(
+        s3_client, S3_BUCKET_NAME, (S3_PREFIX, PARQUET_PREFIX), exclude=exclude
+    )
+
+
+def ensure_feature_state(pending_keys=lambda: ()):
+    # without a seeded history, momentum would restart from the new bars;
+    # `pending_keys()` lists uploaded files whose features are still due
+    if not feature_state_exists(s3_client, S3_BUCKET_NAME):
+        logging.warning("⚠️ No feature state found — rebuilding from S3 files")
+        with metrics.stage("feature_state_rebuild"):
+            rebuild_feature_state(exclude=set(pending_keys()))
+
+
+def write_batch_features(batch_df, file_date, file_label):
+    features, paths = update_feature_state(s3_client, S3_BUCKET_NAME, batch_df)
+    for path, count in paths.items():
+        metrics.incr(f"feature_tickers_{path}", count)
+
+    if features.empty:
+        return
+
+    s3_key = f"{FEATURE_PREFIX}{file_date}_stock_features_{file_label}.csv"
+    body = features.to_csv(index=False).encode("utf-8")
+    s3_client.put_object(
+        Bucket=S3_BUCKET_NAME, Key=s3_key, Body=body, ContentType="text/csv"
     )
-    return [BOOTSTRAP_TICKER]
+    metrics.incr("feature_rows", len(features))
+    metrics.incr("s3_bytes_out", len(body))
 
 
 # -----------------------------------------------------------
 # DETERMINE API DATE WINDOW
 # -----------------------------------------------------------
-def determine_api_date_window():
-    last_loaded_date = get_last_loaded_date_from_s3()
+def determine_api_date_window(manifest):
+    last_loaded_date = get_last_loaded_date_from_s3(manifest)
     start_date = last_loaded_date + timedelta(days=1)
     end_date = date.today()
 
@@ -134,85 +263,639 @@ def determine_api_date_window():
     return start_date, end_date
 
 
+# -----------------------------------------------------------
+# FETCH PLANNING
+# -----------------------------------------------------------
+def plan_ticker_fetches(tickers, manifest, registry, end_date) -> list[FetchPlan]:
+    plans = []
+
+    for ticker in tickers:
+        high_water = manifest.ticker_high_water.get(ticker)
+        if not high_water and ticker in registry.tickers:
+            high_water = registry.tickers[ticker].last_date
+
+        plans.append(
+            plan_fetch(ticker, high_water, end_date, FALLBACK_START_DATE)
+        )
+
+    by_reason = Counter(plan.reason for plan in plans)
+    for reason, count in by_reason.items():
+        metrics.incr(f"plans_{reason}", count)
+    logging.info(f"🗺️ Fetch plan: {dict(by_reason)}")
+    return plans
+
+
 # -----------------------------------------------------------
 # API CALL
 # -----------------------------------------------------------
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-async def fetch_stock_data(session, ticker, start_date, end_date):
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=TIME_SERIES_DAILY_ADJUSTED"
-        f"&symbol={ticker}"
-        f"&apikey={ALPHAVANTAGE_API_KEY}"
-        f"&outputsize=full"
+# Throttling is handled (globally) by the scheduler; tenacity only
+# retries transport-level failures, with exponential backoff.
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, max=30),
+    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError)),
+    before_sleep=lambda _: metrics.incr("fetch_retries"),
+    reraise=True,
+)
+async def fetch_time_series_body(session, scheduler, ticker, outputsize) -> bytes:
+    """The undecoded response; see decode_time_series."""
+    return await scheduler.fetch_body(
+        session,
+        function="TIME_SERIES_DAILY_ADJUSTED",
+        symbol=ticker,
+        outputsize=outputsize,
     )
 
-    async with session.get(url) as response:
-        response.raise_for_status()
-        data = await response.json()
 
-        if "Time Series (Daily)" not in data:
-            raise ValueError(f"Invalid API response for {ticker}")
+def decode_time_series(body: bytes, ticker) -> dict:
+    data = json.loads(body)
+
+    if SERIES_KEY not in data:
+        raise ValueError(f"Invalid API response for {ticker}")
+
+    return data[SERIES_KEY]
+
 
-        df = (
-            pd.DataFrame.from_dict(
-                data["Time Series (Daily)"], orient="index"
+async def fetch_time_series(session, scheduler, ticker, outputsize) -> dict:
+    body = await fetch_time_series_body(session, scheduler, ticker, outputsize)
+    return decode_time_series(body, ticker)
+
+
+async def fetch_stock_data(session, scheduler, plan, end_date, ticker_dtype):
+    series = await fetch_time_series(
+        session, scheduler, plan.ticker, plan.outputsize
+    )
+
+    if plan.outputsize == "compact":
+        reason = needs_full_refetch(plan, series)
+        if reason:
+            logging.info(f"🔄 {plan.ticker}: {reason} — refetching full history")
+            metrics.incr(f"full_refetches_{reason}")
+            plan = escalate(plan, reason, FALLBACK_START_DATE)
+            series = await fetch_time_series(
+                session, scheduler, plan.ticker, plan.outputsize
             )
-            .reset_index()
-            .rename(columns={"index": "date"})
+        else:
+            restated = dividend_restatement(plan, series)
+            if restated:
+                metrics.incr("dividend_restatements")
+                plan = restated
+
+    with metrics.stage("parse"):
+        df = parse_time_series(
+            series, plan.ticker, plan.start_date, end_date, ticker_dtype
+        )
+
+    # the bar before the window seeds the validation jump check
+    return df, close_before(series, plan.start_date)
+
+
+# -----------------------------------------------------------
+# BATCH OUTPUT + PROGRESS JOURNAL
+# -----------------------------------------------------------
+def batch_label(batch_number, shard=SHARD) -> str:
+    """Batch suffix of the output keys; shards never overwrite each other."""
+    if shard.enabled:
+        return f"{shard.label}_{batch_number:03d}"
+    return f"{batch_number:03d}"
+
+
+def upload_batch(batch_df, file_date, batch_number) -> list[str]:
+    label = batch_label(batch_number)
+
+    if OUTPUT_FORMAT == "parquet":
+        return write_parquet_partitions(
+            batch_df,
+            s3_client,
+            S3_BUCKET_NAME,
+            PARQUET_PREFIX,
+            file_label=f"{file_date}_{label}",
+            ticker_buckets=PARQUET_TICKER_BUCKETS,
+            metrics=metrics,
+        )
+
+    s3_key = f"{S3_PREFIX}{file_date}_stock_prices_{label}.csv"
+    write_csv_object(batch_df, s3_client, S3_BUCKET_NAME, s3_key, metrics=metrics)
+    return [s3_key]
+
+
+def commit_batch(frames: dict, start_date, end_date, batch_number, known=None,
+                 previous_closes=None, ledger=None):
+    """
+    Uploads one batch of finished tickers, then records it in the
+    manifest, the registry and the window's progress journal. Tickers
+    with no new bars are journaled too so a rerun skips them; tickers
+    whose bars were all quarantined are not. A shard records the batch
+    in its own journal only (see merge_shards). `known`
+    (TickerRegistry.covered at the start of the run) keeps re-sent bars
+    out of the registry's row counts; `previous_closes` maps ticker ->
+    close of the bar before its frame, for the validation jump check;
+    `ledger` (the QuarantineLedger at the start of the run) supplies the
+    jumps to let through and tracks held-back tickers across runs.
+
+    Runs on the BackgroundWriter thread, one batch at a time.
+    """
+    non_empty = [df for df in frames.values() if not df.empty]
+    s3_keys, ticker_stats, held_out, bad = [], {}, set(), None
+
+    if non_empty:
+        with metrics.stage("concat"):
+            batch_df = pd.concat(non_empty, ignore_index=True)
+
+        with metrics.stage("validate"):
+            batch_df, bad = validate_and_quarantine(
+                batch_df, end_date, batch_number, previous_closes,
+                ledger.accepted_jumps(QUARANTINE_CONFIRM_RUNS) if ledger else None,
+            )
+        held_out = set(bad["ticker"].astype(str)) - set(batch_df["ticker"].astype(str))
+
+    if non_empty and not batch_df.empty:
+        with metrics.stage("upload"):
+            s3_keys = upload_batch(batch_df, end_date.strftime("%Y-%m-%d"), batch_number)
+
+        metrics.incr("rows_emitted", len(batch_df))
+        metrics.incr("files_written", len(s3_keys))
+        ticker_stats = ticker_stats_from_frame(batch_df, known)
+
+        if not SHARD.enabled:
+            with metrics.stage("state_update"):
+                record_shared_state(s3_keys, ticker_stats)
+
+        if COMPUTE_FEATURES and not SHARD.enabled:
+            with metrics.stage("features"):
+                write_batch_features(
+                    batch_df, end_date.strftime("%Y-%m-%d"), batch_label(batch_number)
+                )
+
+        logging.info(
+            f"✅ Batch {batch_number}: uploaded {len(batch_df)} rows "
+            f"for {len(frames)} tickers to {len(s3_keys)} object(s)"
+        )
+
+    if held_out:
+        # left out of the journal, and their high-water marks stay put,
+        # so the next run fetches and checks these bars again
+        metrics.incr("tickers_quarantined", len(held_out))
+        logging.warning(
+            f"🚧 Batch {batch_number}: nothing uploaded for {len(held_out)} "
+            f"quarantined tickers {sorted(held_out)}"
+        )
+
+    if ledger is not None and VALIDATION_MODE == "quarantine":
+        record_quarantine(ledger, frames, bad)
+
+    completed = sorted(set(frames) - held_out)
+    with metrics.stage("state_update"):
+        update_journal(
+            s3_client,
+            S3_BUCKET_NAME,
+            start_date,
+            end_date,
+            lambda journal: journal.record_batch(completed, s3_keys, ticker_stats),
+            shard=SHARD.label,
+        )
+
+
+def validate_and_quarantine(batch_df, end_date, batch_number, previous_closes=None,
+                            accepted_jumps=None):
+    """
+    Returns (rows fit to upload, failing rows); failing rows go to
+    quarantine/.
+    """
+    batch_df, bad, report = validate_batch(
+        batch_df, previous_closes=previous_closes, accepted_jumps=accepted_jumps
+    )
+
+    for rule, count in report.failures.items():
+        metrics.incr(f"validation_{rule}", count)
+
+    if not bad.empty:
+        metrics.incr("rows_quarantined", len(bad))
+        metrics.incr("rows_held_back", report.rows_held_back)
+        write_quarantine(
+            bad, report, s3_client, S3_BUCKET_NAME,
+            end_date.strftime("%Y-%m-%d"), batch_label(batch_number), metrics=metrics,
+        )
+    return batch_df, bad
+
+
+def record_quarantine(ledger, frames, bad):
+    """
+    Carries held-back tickers over in the quarantine ledger, releases the
+    ones that loaded cleanly, and alerts on tickers stuck for more than
+    one run (they stay stuck until the bar changes, is confirmed on
+    QUARANTINE_CONFIRM_RUNS days, or is acknowledged in the ledger).
+    """
+    flagged = {}
+    if bad is not None and not bad.empty:
+        earliest = bad.sort_values("date").groupby("ticker", observed=True).head(1)
+        flagged = {
+            str(row.ticker): (row.date, row.close, row.failed_checks.split(";"))
+            for row in earliest.itertuples()
+        }
+    cleared = [ticker for ticker in frames if ticker in ledger.tickers and ticker not in flagged]
+    if not flagged and not cleared:
+        return
+
+    with metrics.stage("state_update"):
+        ledger_now = update_quarantine_ledger(
+            s3_client,
+            S3_BUCKET_NAME,
+            lambda ledger: ledger.record_run(flagged, cleared, date.today()),
+        )
+
+    for ticker in cleared:
+        logging.info(f"🔓 {ticker} released from quarantine")
+
+    stuck = {ticker: ledger_now.tickers[ticker] for ticker in flagged}
+    stuck = {ticker: entry for ticker, entry in stuck.items() if entry.runs > 1}
+    if stuck:
+        metrics.incr("tickers_stuck", len(stuck))
+    for ticker, entry in stuck.items():
+        logging.error(
+            f"⛔ {ticker}: bar {entry.date} held back on {entry.runs} runs "
+            f"({', '.join(entry.checks)}) — if the move is genuine, add "
+            f"\"{ticker}\": \"{entry.date}\" to acknowledged in {QUARANTINE_LEDGER_KEY}"
+        )
+
+
+def record_shared_state(s3_keys, ticker_stats):
+    """Folds uploaded files into the watermark manifest and ticker registry."""
+    ticker_dates = {ticker: last for ticker, (_, last, _) in ticker_stats.items()}
+    update_manifest(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda manifest: manifest.record_load(None, s3_keys, ticker_dates),
+    )
+    update_registry(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda registry: registry.record_rows(ticker_stats),
+    )
+
+
+async def fetch_isolated(session, scheduler, plan, end_date, ticker_dtype):
+    """One ticker's failure is returned, never raised into the run."""
+    started = time.monotonic()
+    try:
+        df, previous_close = await fetch_stock_data(
+            session, scheduler, plan, end_date, ticker_dtype
+        )
+        return plan.ticker, df, previous_close, None
+    except Exception as exc:
+        return plan.ticker, None, None, f"{type(exc).__name__}: {exc}"
+    finally:
+        # includes time queued behind the rate limiter
+        metrics.observe("ticker_seconds", time.monotonic() - started)
+
+
+async def fetch_worker(session, scheduler, plans, end_date, ticker_dtype, results):
+    """
+    Pulls plans from the shared iterator until it is exhausted. Waiting on
+    the bounded `results` queue is what pauses fetching while the writer
+    catches up.
+    """
+    for plan in plans:
+        await results.put(
+            await fetch_isolated(session, scheduler, plan, end_date, ticker_dtype)
         )
 
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
-        df["ticker"] = ticker
 
-        return df
+def log_run_summary(loaded: int, failures: dict):
+    if not failures:
+        logging.info(f"🎉 All {loaded} tickers loaded for this window")
+        return
+
+    logging.warning(
+        f"⚠️ {loaded} tickers loaded, {len(failures)} failed — "
+        "rerun the same window to retry only the failures"
+    )
+    for ticker, error in sorted(failures.items()):
+        logging.warning(f"   ❌ {ticker}: {error}")
 
 
 # -----------------------------------------------------------
-# MAIN
+# SHARD MERGE
 # -----------------------------------------------------------
-async def main():
-    start_date, end_date = determine_api_date_window()
+def read_batch_prices(s3_keys):
+    frames = list(read_price_objects(
+        s3_client, S3_BUCKET_NAME, s3_keys,
+        ("date", "ticker", "close", "split_coefficient"),
+    ))
+    if not frames:
+        return None
+
+    prices = pd.concat(frames, ignore_index=True)
+    prices["ticker"] = prices["ticker"].astype(str)
+    prices["date"] = pd.to_datetime(prices["date"])
+    return prices
+
+
+def merge_shard_journal(shard, start_date, end_date):
+    """
+    Folds the batches of one shard journal that are not merged yet into
+    the shared state. Safe to rerun: merged batches are skipped and
+    already-applied feature bars are replayed as no-ops.
+    """
+    journal = load_journal(
+        s3_client, S3_BUCKET_NAME, start_date, end_date, shard=shard.label
+    )
+    first_unmerged = journal.merged_batches
+    s3_keys, ticker_stats = journal.unmerged()
+
+    if s3_keys:
+        record_shared_state(s3_keys, ticker_stats)
+
+    if COMPUTE_FEATURES:
+        for batch_number in range(first_unmerged, len(journal.batches)):
+            prices = read_batch_prices(journal.batches[batch_number])
+            if prices is not None:
+                write_batch_features(
+                    prices, end_date.strftime("%Y-%m-%d"),
+                    batch_label(batch_number, shard),
+                )
+
+    merged = len(journal.batches)
+    if merged > first_unmerged:
+        def mark_merged(journal):
+            journal.merged_batches = max(journal.merged_batches, merged)
+
+        journal = update_journal(
+            s3_client, S3_BUCKET_NAME, start_date, end_date, mark_merged,
+            shard=shard.label,
+        )
+        metrics.incr("batches_merged", merged - first_unmerged)
+        logging.info(
+            f"🧩 {shard.label} {start_date} → {end_date}: merged "
+            f"{merged - first_unmerged} batch(es), {len(ticker_stats)} tickers"
+        )
+
+    return journal
+
+
+def merge_shards():
+    """
+    Final step of a sharded run: folds every shard's journaled batches
+    into the manifest, registry and feature state, then advances the
+    watermark once every shard finished the window without failures.
+    """
+    if not SHARD.enabled:
+        raise ValueError("--merge-shards needs SHARD_COUNT > 1")
+
+    manifest = load_watermarks()
+    start_date, _ = determine_api_date_window(manifest)
     if not start_date:
         return
+    metrics.set_context(start_date=str(start_date), shards=SHARD.count)
+
+    # a shard may have started after midnight: merge every window it
+    # opened from start_date, and judge it by its latest one
+    windows = [
+        (shard, end_date)
+        for shard in SHARD.siblings()
+        for end_date in find_journal_end_dates(
+            s3_client, S3_BUCKET_NAME, start_date, shard.label
+        )
+    ]
+
+    if COMPUTE_FEATURES:
+        ensure_feature_state(lambda: [
+            key
+            for shard, end_date in windows
+            for key in load_journal(
+                s3_client, S3_BUCKET_NAME, start_date, end_date, shard=shard.label
+            ).unmerged()[0]
+        ])
+
+    latest = {}
+    with metrics.stage("merge"):
+        for shard, end_date in windows:
+            latest[shard.label] = (
+                end_date, merge_shard_journal(shard, start_date, end_date)
+            )
 
-    tickers = discover_tickers_from_s3()
+    incomplete = sorted(
+        shard.label
+        for shard in SHARD.siblings()
+        if shard.label not in latest
+        or not latest[shard.label][1].finished_at
+        or latest[shard.label][1].failed
+    )
+    metrics.incr("shards_incomplete", len(incomplete))
 
-    timeout = ClientTimeout(total=60)
-    async with ClientSession(timeout=timeout) as session:
-        tasks = [
-            fetch_stock_data(session, ticker, start_date, end_date)
-            for ticker in tickers
-        ]
-        results = await asyncio.gather(*tasks)
+    if not latest:
+        logging.warning(f"⚠️ No shard journals found for window starting {start_date}")
+        return
 
-    final_df = pd.concat(results, ignore_index=True)
+    end_date = min(end for end, _ in latest.values())
+    metrics.set_context(end_date=str(end_date))
 
-    if final_df.empty:
+    update_registry(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda registry: registry.mark_stale_as_delisted(end_date),
+    )
+
+    if incomplete:
+        # keep the window open; rerun the listed shards, then merge again
+        logging.warning(f"⚠️ Shards not finished cleanly: {', '.join(incomplete)}")
+        return
+
+    if not any(any(journal.batches) for _, journal in latest.values()):
         logging.info("⚠️ API returned no new rows — exiting")
         return
 
-    file_date = end_date.strftime("%Y-%m-%d")
-    local_file = "/tmp/stock_prices.csv"
-    s3_key = f"{S3_PREFIX}{file_date}_stock_prices.csv"
+    update_manifest(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda manifest: manifest.record_load(end_date, [], {}),
+    )
+    logging.info(f"📝 Manifest advanced to {end_date} ({SHARD.count} shards merged)")
 
-    final_df.to_csv(local_file, index=False)
 
-    s3_client.upload_file(
-        local_file,
-        S3_BUCKET_NAME,
-        s3_key,
+# -----------------------------------------------------------
+# MAIN
+# -----------------------------------------------------------
+async def ingest_window():
+    manifest = load_watermarks()
+    start_date, end_date = determine_api_date_window(manifest)
+    if not start_date:
+        return
+    metrics.set_context(start_date=str(start_date), end_date=str(end_date))
+
+    registry = load_ticker_registry()
+    tickers = discover_tickers_from_s3(registry)
+    if COMPUTE_FEATURES and not SHARD.enabled:
+        ensure_feature_state()
+    plans = plan_ticker_fetches(tickers, manifest, registry, end_date)
+    # one shared categorical keeps ticker typed through each batch concat
+    ticker_dtype = pd.CategoricalDtype(tickers)
+
+    journal = load_journal(
+        s3_client, S3_BUCKET_NAME, start_date, end_date, shard=SHARD.label
     )
+    pending = [plan for plan in plans if plan.ticker not in journal.completed]
+    metrics.set_context(tickers=len(tickers), pending=len(pending))
+    if journal.completed:
+        logging.info(
+            f"⏯️ Resuming window: {len(journal.completed)} tickers already "
+            f"loaded, {len(pending)} remaining"
+        )
+
+    scheduler = RequestScheduler(
+        ALPHAVANTAGE_API_KEY,
+        calls_made_today=load_api_calls_today(s3_client, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY),
+        cache=ResponseCache(),
+        metrics=metrics,
+    )
+    timeout = ClientTimeout(total=60)
+    connector = aiohttp.TCPConnector(limit=scheduler.max_concurrency)
+
+    batch_number = len(journal.batches)
+    known = registry.covered()
+    ledger = load_quarantine_ledger(s3_client, S3_BUCKET_NAME)
+    accepted = ledger.accepted_jumps(QUARANTINE_CONFIRM_RUNS)
+    if accepted:
+        logging.info(f"🔓 Letting through confirmed/acknowledged price jumps: {accepted}")
+    batch, previous_closes, failures = {}, {}, {}
+
+    # fetch workers -> bounded results queue -> batches -> upload thread;
+    # uploads and state writes overlap with the fetches still in flight
+    results = asyncio.Queue(maxsize=JOURNAL_BATCH_TICKERS)
+    writer = BackgroundWriter(
+        lambda job: commit_batch(job[0], start_date, end_date, job[1], known, job[2], ledger),
+        WRITE_QUEUE_BATCHES,
+    )
+
+    with metrics.stage("fetch_and_write"):
+        async with ClientSession(timeout=timeout, connector=connector) as session:
+            plan_iter = iter(pending)
+            workers = [
+                asyncio.create_task(
+                    fetch_worker(session, scheduler, plan_iter, end_date, ticker_dtype, results)
+                )
+                for _ in range(min(scheduler.max_concurrency, len(pending)))
+            ]
+
+            try:
+                for _ in range(len(pending)):
+                    ticker, df, previous_close, error = await results.get()
+
+                    if error:
+                        failures[ticker] = error
+                        metrics.incr("tickers_failed")
+                        logging.warning(f"❌ {ticker}: {error}")
+                        continue
+
+                    metrics.incr("tickers_loaded")
+                    batch[ticker] = df
+                    previous_closes[ticker] = previous_close
+                    if len(batch) >= JOURNAL_BATCH_TICKERS:
+                        await writer.put((batch, batch_number, previous_closes))
+                        batch, previous_closes = {}, {}
+                        batch_number += 1
+
+                if batch:
+                    await writer.put((batch, batch_number, previous_closes))
+                await writer.close()
+            except BaseException:
+                for worker in workers:
+                    worker.cancel()
+                await writer.abort()
+                raise
+            finally:
+                record_api_calls(
+                    s3_client, S3_BUCKET_NAME, ALPHAVANTAGE_API_KEY, scheduler.calls_made
+                )
 
     logging.info(
-        f"✅ Uploaded {len(final_df)} rows to "
-        f"s3://{S3_BUCKET_NAME}/{s3_key}"
+        f"📡 {scheduler.calls_made} API calls, "
+        f"{scheduler.throttle_count} throttled, "
+        f"{scheduler.cache.hits} served from cache"
     )
 
+    def close_journal(journal):
+        journal.record_failures(failures)
+        journal.finish()
+
+    journal = update_journal(
+        s3_client,
+        S3_BUCKET_NAME,
+        start_date,
+        end_date,
+        close_journal,
+        shard=SHARD.label,
+    )
+    log_run_summary(len(journal.completed), failures)
+
+    if SHARD.enabled:
+        # the merge step delists and advances the watermark for all shards
+        logging.info(f"🧩 Shard {SHARD.label} done — run --merge-shards once all shards finish")
+        return
+
+    # tickers that keep failing eventually age out of the universe here
+    update_registry(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda registry: registry.mark_stale_as_delisted(end_date),
+    )
+
+    if failures:
+        # keep the window open so a rerun resumes from the same journal
+        return
+
+    if not any(journal.batches):
+        logging.info("⚠️ API returned no new rows — exiting")
+        return
+
+    update_manifest(
+        s3_client,
+        S3_BUCKET_NAME,
+        lambda manifest: manifest.record_load(end_date, [], {}),
+    )
+    logging.info(f"📝 Manifest advanced to {end_date}")
+
+
+async def main():
+    try:
+        await ingest_window()
+    except BaseException:
+        metrics.publish(s3_client, S3_BUCKET_NAME, status="failed")
+        raise
+
+    status = "partial" if metrics.counters.get("tickers_failed") else "success"
+    metrics.publish(s3_client, S3_BUCKET_NAME, status=status)
+
+
+def merge_main():
+    metrics.job = "stock_prices_merge"
+    metrics.shard = None  # the merge covers every shard
+    try:
+        merge_shards()
+    except BaseException:
+        metrics.publish(s3_client, S3_BUCKET_NAME, status="failed")
+        raise
+
+    status = "partial" if metrics.counters.get("shards_incomplete") else "success"
+    metrics.publish(s3_client, S3_BUCKET_NAME, status=status)
+
 
 # -----------------------------------------------------------
 # ENTRY POINT
 # -----------------------------------------------------------
+REPAIR_COMMANDS = {
+    "--rebuild-manifest": rebuild_manifest,
+    "--rebuild-registry": rebuild_registry,
+    "--rebuild-feature-state": rebuild_feature_state,
+}
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    repairs = [flag for flag in sys.argv[1:] if flag in REPAIR_COMMANDS]
+
+    for flag in repairs:
+        REPAIR_COMMANDS[flag]()
+
+    if "--merge-shards" in sys.argv[1:]:
+        merge_main()
+    elif not repairs:
+        asyncio.run(main())
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+# -----------------------------------------------------------
+# SCHEDULER SETTINGS (OVERRIDABLE VIA ENV)
+# -----------------------------------------------------------
+ALPHAVANTAGE_URL = os.getenv(
+    "ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/query"
+)
+
+AV_CALLS_PER_MINUTE = int(os.getenv("AV_CALLS_PER_MINUTE", "75"))
+AV_CALLS_PER_DAY = int(os.getenv("AV_CALLS_PER_DAY", "0"))  # 0 = no daily cap
+# calls that may go out back-to-back; the rest are spaced at the per-minute rate
+AV_BURST = int(os.getenv("AV_BURST", "5"))
+AV_MAX_CONCURRENCY = int(os.getenv("AV_MAX_CONCURRENCY", "8"))
+AV_THROTTLE_BACKOFF_SECONDS = float(os.getenv("AV_THROTTLE_BACKOFF_SECONDS", "15"))
+AV_MAX_THROTTLE_RETRIES = int(os.getenv("AV_MAX_THROTTLE_RETRIES", "5"))
+
+# AlphaVantage signals throttling with an HTTP 200 and one of these keys
+THROTTLE_KEYS = ("Note", "Information")
+THROTTLE_MARKERS = ("call frequency", "rate limit", "requests per", "sparingly")
+# ...unless the notice is about the daily allowance: backing off cannot help
+DAILY_LIMIT_MARKERS = ("per day", "daily")
+# key that only a real answer carries; notices, errors and the empty {}
+# OVERVIEW returns for unknown symbols are never cached
+DATA_KEYS = {
+    "TIME_SERIES_DAILY_ADJUSTED": "Time Series (Daily)",
+    "OVERVIEW": "Symbol",
+}
+NOTICE_KEYS = ("Error Message", *THROTTLE_KEYS)
+# notices are a few hundred bytes; larger bodies are data and are handed
+# back undecoded (see RequestScheduler.fetch_body)
+NOTICE_MAX_BYTES = 4096
+
+
+class AlphaVantageThrottled(Exception):
+    """Raised when a call is still throttled after every backoff attempt."""
+
+
+class DailyQuotaExhausted(Exception):
+    """
+    Raised once the configured AV_CALLS_PER_DAY budget is spent, or as
+    soon as the API itself reports the key's daily limit reached.
+    """
+
+
+# -----------------------------------------------------------
+# THROTTLE PAYLOAD DETECTION
+# -----------------------------------------------------------
+def throttle_message(data) -> str | None:
+    """
+    Returns the AlphaVantage throttle message if the payload is one,
+    otherwise None. Premium-endpoint notices are not treated as throttles.
+    """
+    if not isinstance(data, dict):
+        return None
+
+    for key in THROTTLE_KEYS:
+        message = data.get(key)
+        if message and any(m in message.lower() for m in THROTTLE_MARKERS):
+            return message
+
+    return None
+
+
+def decode_small(body: bytes):
+    """The decoded payload if `body` is small enough to be a notice, else None."""
+    if len(body) > NOTICE_MAX_BYTES:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def is_cacheable(params: dict, body: bytes) -> bool:
+    """True if `body` is a real answer to `params`, worth caching."""
+    data_key = DATA_KEYS.get(params.get("function"))
+    if data_key:
+        # a byte search, so full-history bodies are never decoded here
+        return f'"{data_key}"'.encode("utf-8") in body
+
+    data = decode_small(body)
+    if data is None:
+        return len(body) > NOTICE_MAX_BYTES
+    return isinstance(data, dict) and bool(data) and not any(key in data for key in NOTICE_KEYS)
+
+
+# -----------------------------------------------------------
+# TOKEN BUCKET
+# -----------------------------------------------------------
+class TokenBucket:
+    """
+    Token bucket: `rate_per_minute` tokens refill continuously and at most
+    `burst` can be banked. It starts with only that burst, so no window of
+    a minute (the first one included) sees much more than the rate.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: int = AV_BURST):
+        self.capacity = float(max(1, min(burst, rate_per_minute)))
+        self.refill_per_second = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated_at) * self.refill_per_second,
+        )
+        self.updated_at = now
+
+    def drain(self):
+        """Empties the bucket so the next calls wait for a fresh refill."""
+        self._refill()
+        self.tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.refill_per_second)
+
+
+# -----------------------------------------------------------
+# SHARED REQUEST SCHEDULER
+# -----------------------------------------------------------
+class RequestScheduler:
+    """
+    Single gateway for every AlphaVantage call made by the ingest scripts.
+
+    - per-minute token bucket plus an optional per-day cap, which also
+      counts `calls_made_today` spent by earlier runs on the same key
+    - bounded number of requests in flight
+    - one global backoff window shared by all coroutines whenever the API
+      answers with its HTTP-200 "Note"/"Information" throttle payload
+    - an optional ResponseCache consulted before any quota is spent
+    - optional RunMetrics fed with call/throttle/byte counters and
+      per-request latency
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        calls_per_minute: int = AV_CALLS_PER_MINUTE,
+        calls_per_day: int = AV_CALLS_PER_DAY,
+        calls_made_today: int = 0,
+        max_concurrency: int = AV_MAX_CONCURRENCY,
+        backoff_seconds: float = AV_THROTTLE_BACKOFF_SECONDS,
+        max_throttle_retries: int = AV_MAX_THROTTLE_RETRIES,
+        base_url: str = ALPHAVANTAGE_URL,
+        cache=None,
+        metrics=None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.calls_per_day = calls_per_day
+        self.calls_made_today = calls_made_today
+        self.max_concurrency = max_concurrency
+        self.backoff_seconds = backoff_seconds
+        self.max_throttle_retries = max_throttle_retries
+        self.cache = cache
+        self.metrics = metrics
+
+        self.calls_made = 0
+        self.throttle_count = 0
+
+        self._bucket = TokenBucket(calls_per_minute)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._resume_at = 0.0
+        self._consecutive_throttles = 0
+        self._daily_limit_message = None
+
+    # -------------------------------------------------------
+    # quota + backoff bookkeeping
+    # -------------------------------------------------------
+    async def _wait_for_backoff(self):
+        delay = self._resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._resume_at - time.monotonic()
+
+    async def _acquire_quota(self):
+        if self._daily_limit_message:
+            # the API already refused this key for today
+            raise DailyQuotaExhausted(self._daily_limit_message)
+        if self.calls_per_day and self.calls_made_today + self.calls_made >= self.calls_per_day:
+            raise DailyQuotaExhausted(
+                f"Daily quota of {self.calls_per_day} calls reached "
+                f"({self.calls_made_today} spent by earlier runs today)"
+            )
+        await self._bucket.acquire()
+        self.calls_made += 1
+        self._count("api_calls")
+
+    def _count(self, name, amount=1):
+        if self.metrics is not None:
+            self.metrics.incr(name, amount)
+
+    def _trigger_backoff(self):
+        self.throttle_count += 1
+        now = time.monotonic()
+        if now < self._resume_at:
+            # another coroutine already opened this backoff window
+            return self._resume_at - now
+
+        self._consecutive_throttles += 1
+        delay = self.backoff_seconds * 2 ** (self._consecutive_throttles - 1)
+        self._resume_at = now + delay
+        self._bucket.drain()
+        return delay
+
+    # -------------------------------------------------------
+    # public API
+    # -------------------------------------------------------
+    async def fetch_body(self, session, **params) -> bytes:
+        """
+        Performs GET <base_url>?<params>&apikey=... under the shared quota
+        and returns the raw response body. Only notice-sized bodies are
+        decoded here (to spot throttles); data is left to the caller,
+        which may decode it in another process.
+        """
+        label = f"{params.get('function')}:{params.get('symbol', '')}"
+
+        if self.cache is not None:
+            cached = self.cache.get(params)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+
+        request_params = {**params, "apikey": self.api_key}
+
+        for attempt in range(self.max_throttle_retries + 1):
+            async with self._semaphore:
+                await self._wait_for_backoff()
+                await self._acquire_quota()
+
+                started = time.monotonic()
+                try:
+                    async with session.get(self.base_url, params=request_params) as response:
+                        response.raise_for_status()
+                        body = await response.read()
+                except Exception:
+                    self._count("api_transport_errors")
+                    raise
+
+                self._count("api_bytes_in", len(body))
+                if self.metrics is not None:
+                    self.metrics.observe("api_request_seconds", time.monotonic() - started)
+
+            message = throttle_message(decode_small(body))
+            if message and any(m in message.lower() for m in DAILY_LIMIT_MARKERS):
+                self._count("api_daily_limit")
+                self._daily_limit_message = f"AlphaVantage daily limit reached: {message}"
+                raise DailyQuotaExhausted(self._daily_limit_message)
+            if message is None:
+                self._consecutive_throttles = 0
+                if self.cache is not None and is_cacheable(params, body):
+                    self.cache.put(params, body)
+                return body
+
+            delay = self._trigger_backoff()
+            self._count("api_throttled")
+            logging.warning(
+                f"🐢 Throttled on {label} "
+                f"(attempt {attempt + 1}) — pausing all calls {delay:.1f}s"
+            )
+
+        raise AlphaVantageThrottled(
+            f"{label} still throttled after {self.max_throttle_retries} retries"
+        )
+
+    async def fetch_json(self, session, **params) -> dict:
+        """fetch_body, decoded."""
+        return json.loads(await self.fetch_body(session, **params))
@@ -0,0 +1,367 @@
+"""
+Offline scale benchmark for the dbt model DAG on the local DuckDB profile.
+
+Builds a synthetic RAW layer (synthetic_warehouse.py) at the requested
+scale, runs every model with --full-refresh, delivers the next daily
+load(s) and runs the models again incrementally. No Snowflake credits.
+
+    pip install -r requirements-dev.txt   # duckdb + dbt-duckdb
+    python Python_Scripts/benchmarks/dbt_benchmark.py --tickers 5000 --years 25
+
+By default each model runs in its own dbt process, in DAG order, so the
+peak RSS reported per model is that model's (dbt-duckdb executes in
+process). --memory run does one dbt run per phase instead: realistic
+thread overlap, but only one peak RSS for the whole run.
+
+Results are saved under benchmarks/results/ and compared with the
+previous run that used the same settings.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+from dataclasses import asdict
+
+import duckdb
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from DbtRunProfilerScript import DEFAULT_PROJECT_DIR, critical_path, node_name, parent_map
+from synthetic_warehouse import WarehouseConfig, append_daily_loads, build_warehouse
+
+# -----------------------------------------------------------
+# BENCHMARK SETTINGS
+# -----------------------------------------------------------
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# the database file name is the catalog the sources point at
+DB_FILE_NAME = "stock_data.duckdb"
+PHASES = ("full_refresh", "incremental")
+REPORTED_METRICS = ("seconds", "peak_rss_mb")
+RSS_POLL_SECONDS = 0.02
+
+
+# -----------------------------------------------------------
+# DBT INVOCATIONS
+# -----------------------------------------------------------
+def vm_hwm_mb(pid) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class DbtRunner:
+    """Runs dbt against the local_duckdb profile with artifacts kept in work_dir."""
+
+    def __init__(self, project_dir, work_dir, threads=None):
+        self.executable = shutil.which("dbt")
+        if self.executable is None:
+            raise SystemExit("dbt is not on PATH — pip install dbt-duckdb")
+
+        self.project_dir = project_dir
+        self.target_dir = os.path.join(work_dir, "target")
+        self.log_path = os.path.join(work_dir, "dbt_output.log")
+        self.threads = threads
+        self.env = {**os.environ, "DBT_DUCKDB_PATH": os.path.join(work_dir, DB_FILE_NAME)}
+
+    def invoke(self, *args) -> dict:
+        """
+        Runs one dbt command; returns its wall time and peak RSS. The
+        child's VmHWM is polled because its ru_maxrss starts from this
+        (much larger) process's footprint at exec; ru_maxrss is only the
+        fallback where /proc does not exist.
+        """
+        command = [
+            self.executable, *args,
+            "--project-dir", self.project_dir,
+            "--profiles-dir", os.path.join(self.project_dir, "local_duckdb"),
+            "--target-path", self.target_dir,
+        ]
+        if self.threads and args[0] == "run":
+            command += ["--threads", str(self.threads)]
+
+        started = time.perf_counter()
+        with open(self.log_path, "a") as log:
+            log.write(f"\n$ {' '.join(command)}\n")
+            log.flush()
+            child = subprocess.Popen(command, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+
+            peak = None
+            while True:
+                peak = vm_hwm_mb(child.pid) or peak
+                pid, status, usage = os.wait4(child.pid, os.WNOHANG)
+                if pid:
+                    break
+                time.sleep(RSS_POLL_SECONDS)
+            child.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - started
+
+        if child.returncode != 0:
+            raise SystemExit(f"dbt {' '.join(args)} failed — see {self.log_path}")
+
+        if peak is None:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {"wall_seconds": round(wall, 3), "peak_rss_mb": round(peak, 1)}
+
+    def artifact(self, name) -> dict:
+        with open(os.path.join(self.target_dir, name)) as fh:
+            return json.load(fh)
+
+
+def dag_models(manifest: dict) -> tuple[list[str], dict, dict]:
+    """(models in dependency order, model -> parent models, model -> materialization)."""
+    nodes = {uid: node for uid, node in manifest["nodes"].items() if uid.startswith("model.")}
+    names = {node_name(uid) for uid in nodes}
+    parents = {
+        model: [p for p in upstream if p in names]
+        for model, upstream in parent_map(manifest).items()
+        if model in names
+    }
+    materialized = {node_name(uid): node["config"]["materialized"] for uid, node in nodes.items()}
+    relations = {node_name(uid): node.get("relation_name") for uid, node in nodes.items()}
+
+    # Kahn's algorithm, ties broken by name so the order is stable
+    order, remaining = [], dict(parents)
+    while remaining:
+        ready = sorted(m for m, ups in remaining.items() if not set(ups) & remaining.keys())
+        order.extend(ready)
+        for model in ready:
+            del remaining[model]
+
+    return order, parents, {"materialized": materialized, "relations": relations}
+
+
+def model_results(run_results: dict) -> dict[str, dict]:
+    return {
+        node_name(result["unique_id"]): {
+            "status": result["status"],
+            "seconds": round(result["execution_time"], 3),
+        }
+        for result in run_results.get("results", [])
+        if result["unique_id"].startswith("model.")
+    }
+
+
+def table_rows(db_path, relations, materialized) -> dict[str, int]:
+    """Row counts of the model tables (views would be executed by count(*), so skipped)."""
+    rows = {}
+    with duckdb.connect(db_path, read_only=True) as con:
+        for model, relation in relations.items():
+            if relation and materialized.get(model) != "view":
+                rows[model] = con.execute(f"select count(*) from {relation}").fetchone()[0]
+    return rows
+
+
+# -----------------------------------------------------------
+# ONE PHASE: FULL REFRESH OR INCREMENTAL
+# -----------------------------------------------------------
+def run_phase(dbt: DbtRunner, phase, order, parents, meta, memory_mode) -> dict:
+    flags = ["--full-refresh"] if phase == "full_refresh" else []
+    started = time.perf_counter()
+    models, peak = {}, 0.0
+
+    if memory_mode == "model":
+        for model in order:
+            usage = dbt.invoke("run", "--select", model, *flags)
+            result = model_results(dbt.artifact("run_results.json")).get(model, {})
+            models[model] = {**result, "peak_rss_mb": usage["peak_rss_mb"]}
+            peak = max(peak, usage["peak_rss_mb"])
+            print(
+                f"{phase:>13} {model:<32} {result.get('seconds', 0.0):>8.2f}s "
+                f"{usage['peak_rss_mb']:>8.1f} MB peak RSS"
+            )
+    else:
+        usage = dbt.invoke("run", *flags)
+        models = model_results(dbt.artifact("run_results.json"))
+        peak = usage["peak_rss_mb"]
+
+    wall = time.perf_counter() - started
+    seconds = {model: result["seconds"] for model, result in models.items()}
+    path, path_seconds = critical_path(seconds, parents)
+
+    rows = table_rows(dbt.env["DBT_DUCKDB_PATH"], meta["relations"], meta["materialized"])
+    for model, result in models.items():
+        result["materialized"] = meta["materialized"].get(model)
+        result["rows"] = rows.get(model)
+
+    return {
+        "phase": phase,
+        "wall_seconds": round(wall, 3),
+        "dbt_seconds": round(sum(seconds.values()), 3),
+        "peak_rss_mb": peak,
+        "critical_path": [model for model, _ in path],
+        "critical_path_seconds": path_seconds,
+        "models": models,
+    }
+
+
+def print_phase(result):
+    print(
+        f"\n{result['phase']}: {result['dbt_seconds']:.2f}s in models "
+        f"({result['wall_seconds']:.2f}s wall), critical path {result['critical_path_seconds']:.2f}s, "
+        f"peak RSS {result['peak_rss_mb']:.1f} MB"
+    )
+    ranked = sorted(result["models"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for model, stats in ranked:
+        rss = f"{stats['peak_rss_mb']:>8.1f} MB" if stats.get("peak_rss_mb") is not None else ""
+        rows = f"{stats['rows']:>12,}" if stats.get("rows") is not None else " " * 12
+        marker = "*" if model in result["critical_path"] else " "
+        print(f"  {marker} {model:<32} {stats['materialized'] or '':<12} {stats['seconds']:>8.2f}s {rows} rows {rss}")
+
+
+# -----------------------------------------------------------
+# SUITE
+# -----------------------------------------------------------
+def run_suite(args) -> dict:
+    run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    work_dir = args.work_dir or os.path.join(args.results_dir, f"dbt_work_{run_id}")
+    os.makedirs(work_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, DB_FILE_NAME)
+
+    config = WarehouseConfig(
+        tickers=args.tickers,
+        years=args.years,
+        end_date=args.end_date,
+        seed=args.seed,
+        duplicate_rate=args.duplicate_rate,
+    )
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    generated = build_warehouse(db_path, config)
+
+    dbt = DbtRunner(args.project_dir, work_dir, threads=args.threads)
+    if not os.path.isdir(os.path.join(args.project_dir, "dbt_packages")):
+        dbt.invoke("deps")
+    parse = dbt.invoke("parse")
+    order, parents, meta = dag_models(dbt.artifact("manifest.json"))
+    print(f"📐 {len(order)} models, dbt parse {parse['wall_seconds']:.1f}s / {parse['peak_rss_mb']:.1f} MB")
+
+    phases = [run_phase(dbt, "full_refresh", order, parents, meta, args.memory)]
+    print_phase(phases[-1])
+
+    appended = append_daily_loads(db_path, args.incremental_loads)
+    phases.append(run_phase(dbt, "incremental", order, parents, meta, args.memory))
+    print_phase(phases[-1])
+
+    if not args.keep_work_dir and not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "run_id": run_id,
+        "settings": {
+            "warehouse": asdict(config),
+            "incremental_loads": args.incremental_loads,
+            "threads": args.threads,
+            "memory": args.memory,
+        },
+        "generated": generated,
+        "appended": appended,
+        "dbt_parse": parse,
+        "phases": phases,
+    }
+
+
+# -----------------------------------------------------------
+# RESULT HISTORY + REGRESSION COMPARISON
+# -----------------------------------------------------------
+def previous_report(results_dir, settings):
+    if not os.path.isdir(results_dir):
+        return None
+
+    for name in sorted(os.listdir(results_dir), reverse=True):
+        if not (name.startswith("dbt_") and name.endswith(".json")):
+            continue
+        with open(os.path.join(results_dir, name)) as fh:
+            report = json.load(fh)
+        if report.get("settings") == settings:
+            return report
+
+    return None
+
+
+def compare(report, previous):
+    if previous is None:
+        print("No previous run with identical settings — nothing to compare.")
+        return
+
+    print(f"\nΔ vs run {previous['run_id']}:")
+    before = {phase["phase"]: phase for phase in previous["phases"]}
+
+    for phase in report["phases"]:
+        old_phase = before.get(phase["phase"])
+        if not old_phase:
+            continue
+
+        totals = [
+            f"{metric} {(phase[metric] - old_phase[metric]) / old_phase[metric] * 100:+.1f}%"
+            for metric in ("dbt_seconds", "critical_path_seconds", "peak_rss_mb")
+            if old_phase.get(metric)
+        ]
+        print(f"{phase['phase']:>13} {'(all models)':<32} " + ", ".join(totals))
+
+        for model, stats in phase["models"].items():
+            old = old_phase["models"].get(model)
+            if not old:
+                continue
+
+            deltas = []
+            for metric in REPORTED_METRICS:
+                if old.get(metric) and stats.get(metric) is not None:
+                    change = (stats[metric] - old[metric]) / old[metric] * 100
+                    deltas.append(f"{metric} {change:+.1f}%")
+            if deltas:
+                print(f"{phase['phase']:>13} {model:<32} " + ", ".join(deltas))
+
+
+def save_report(report, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"dbt_{report['run_id']}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\n💾 Saved {path}")
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    defaults = WarehouseConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tickers", type=int, default=defaults.tickers)
+    parser.add_argument("--years", type=float, default=defaults.years)
+    parser.add_argument("--end-date", help="last bar of the full-refresh build (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--duplicate-rate", type=float, default=defaults.duplicate_rate)
+    parser.add_argument("--incremental-loads", type=int, default=1,
+                        help="daily loads delivered between the full-refresh and incremental runs")
+    parser.add_argument("--threads", type=int, help="override the profile's threads")
+    parser.add_argument("--memory", choices=("model", "run"), default="model",
+                        help="model = one dbt process per model (per-model peak RSS), run = one per phase")
+    parser.add_argument("--project-dir", default=DEFAULT_PROJECT_DIR)
+    parser.add_argument("--work-dir", help="keep the warehouse and dbt artifacts here")
+    parser.add_argument("--keep-work-dir", action="store_true")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    report = run_suite(args)
+    previous = previous_report(args.results_dir, report["settings"])
+    save_report(report, args.results_dir)
+    compare(report, previous)
@@ -0,0 +1,197 @@
+"""
+Local stand-in for the AlphaVantage API used by ingest_benchmark.py:
+deterministic TIME_SERIES_DAILY_ADJUSTED and OVERVIEW payloads served by
+aiohttp, with optional latency and throttle notices. Install the
+benchmark dependencies with `pip install -r requirements-dev.txt`.
+"""
+import json
+import zlib
+import asyncio
+import threading
+import numpy as np
+from dataclasses import dataclass
+from datetime import date
+from aiohttp import web
+
+# -----------------------------------------------------------
+# FAKE SERVER SETTINGS
+# -----------------------------------------------------------
+@dataclass
+class FakeApiConfig:
+    full_bars: int = 5000          # bars returned for outputsize=full
+    compact_bars: int = 100        # bars returned for outputsize=compact
+    latency_ms: float = 0.0        # added to every response
+    throttle_every: int = 0        # every Nth call gets a "Note" payload; 0 = never
+    split_every: int = 0           # every Nth ticker shows a split in its latest bar
+
+
+THROTTLE_PAYLOAD = {
+    "Note": (
+        "Thank you for using Alpha Vantage! Our standard API call frequency "
+        "is 75 calls per minute."
+    )
+}
+
+
+# -----------------------------------------------------------
+# SYNTHETIC PAYLOADS (DETERMINISTIC PER SYMBOL)
+# -----------------------------------------------------------
+def _seed(symbol: str) -> int:
+    return zlib.crc32(symbol.encode("utf-8"))
+
+
+def synthetic_time_series(symbol: str, bars: int, split_every: int = 0) -> dict:
+    rng = np.random.default_rng(_seed(symbol))
+    end = np.datetime64(date.today(), "D")
+    start = np.busday_offset(end, -(bars - 1), roll="backward")
+    dates = np.arange(start, end + 1, dtype="datetime64[D]")
+    dates = dates[np.is_busday(dates)][-bars:]
+
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+    open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, len(dates)))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, len(dates)))
+    volume = rng.integers(100_000, 50_000_000, len(dates))
+
+    split_last = split_every and _seed(symbol) % split_every == 0
+
+    series = {}
+    for i in range(len(dates) - 1, -1, -1):
+        series[str(dates[i])] = {
+            "1. open": f"{open_[i]:.4f}",
+            "2. high": f"{high[i]:.4f}",
+            "3. low": f"{low[i]:.4f}",
+            "4. close": f"{close[i]:.4f}",
+            "5. adjusted close": f"{close[i]:.4f}",
+            "6. volume": str(volume[i]),
+            "7. dividend amount": "0.0000",
+            "8. split coefficient": "2.0" if split_last and i == len(dates) - 1 else "1.0",
+        }
+
+    return {
+        "Meta Data": {"2. Symbol": symbol},
+        "Time Series (Daily)": series,
+    }
+
+
+def synthetic_overview(symbol: str) -> dict:
+    rng = np.random.default_rng(_seed(symbol))
+    return {
+        "Symbol": symbol,
+        "AssetType": "Common Stock",
+        "Name": f"{symbol} Holdings Inc",
+        "Exchange": "NYSE",
+        "Currency": "USD",
+        "Country": "USA",
+        "Sector": ["TECHNOLOGY", "ENERGY", "FINANCE", "HEALTHCARE"][_seed(symbol) % 4],
+        "Industry": "SYNTHETIC",
+        "MarketCapitalization": str(int(rng.integers(1e9, 3e12))),
+        "EBITDA": str(int(rng.integers(1e8, 1e11))),
+        "PERatio": f"{rng.uniform(5, 60):.2f}",
+        "EPS": f"{rng.uniform(-2, 20):.2f}",
+        "RevenueTTM": str(int(rng.integers(1e9, 5e11))),
+        "GrossProfitTTM": str(int(rng.integers(1e8, 1e11))),
+        "ReturnOnEquityTTM": f"{rng.uniform(-0.2, 0.6):.4f}",
+        "ProfitMargin": f"{rng.uniform(-0.1, 0.4):.4f}",
+        "Beta": f"{rng.uniform(0.3, 2.0):.3f}",
+    }
+
+
+# -----------------------------------------------------------
+# HTTP SERVER
+# -----------------------------------------------------------
+class FakeAlphaVantage:
+    """
+    Local stand-in for https://www.alphavantage.co/query. Counts calls
+    and response bytes so the benchmark can report bytes parsed.
+
+    Rendering a full-history payload takes tens of milliseconds on the
+    server's single loop; prerender() builds the bodies up front so the
+    timed run measures the client, not the stand-in.
+    """
+
+    def __init__(self, config: FakeApiConfig, host="127.0.0.1", port=0):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.calls = 0
+        self.throttled = 0
+        self.bytes_served = 0
+        self._bodies = {}
+        self._runner = None
+        self._thread = None
+        self._loop = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/query"
+
+    async def handle(self, request):
+        self.calls += 1
+        call_number = self.calls
+        params = request.query
+
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+
+        if self.config.throttle_every and call_number % self.config.throttle_every == 0:
+            self.throttled += 1
+            body = json.dumps(THROTTLE_PAYLOAD).encode("utf-8")
+        else:
+            key = (params.get("function"), params["symbol"], params.get("outputsize"))
+            body = self._bodies.get(key) or self._render(*key)
+
+        self.bytes_served += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    def _render(self, function, symbol, outputsize) -> bytes:
+        if function == "OVERVIEW":
+            payload = synthetic_overview(symbol)
+        else:
+            bars = (
+                self.config.compact_bars
+                if outputsize == "compact"
+                else self.config.full_bars
+            )
+            payload = synthetic_time_series(symbol, bars, self.config.split_every)
+
+        return json.dumps(payload).encode("utf-8")
+
+    def prerender(self, function, symbols, outputsize=None):
+        """Caches response bodies for `symbols`; call before timing a run."""
+        for symbol in symbols:
+            key = (function, symbol, outputsize)
+            if key not in self._bodies:
+                self._bodies[key] = self._render(*key)
+
+    def clear_prerendered(self):
+        self._bodies.clear()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/query", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self):
+        """Serves from a daemon thread so callers can stay synchronous."""
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,400 @@
+"""
+Offline throughput benchmark for StockDataApiCallScript and CompanyInfoScript.
+
+Runs both ingest scripts against a local fake AlphaVantage server and a
+local S3-compatible endpoint (moto's server, or any endpoint passed with
+--s3-endpoint such as MinIO). No real quota or S3 requests are spent.
+
+    pip install -r requirements-dev.txt   # moto[server] for the local S3
+    python Python_Scripts/benchmarks/ingest_benchmark.py --universes 50,500,5000
+
+Each (script, universe) case runs in a fresh subprocess so peak RSS is
+per case. Results are saved under benchmarks/results/ and compared with
+the previous run that used the same settings.
+
+With --shards N the prices case runs as N concurrent shard processes,
+each with its own --calls-per-minute quota (like one API key per shard),
+followed by the --merge-shards step.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import subprocess
+from datetime import date, datetime, timedelta
+
+import boto3
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_alphavantage import FakeAlphaVantage, FakeApiConfig
+
+# -----------------------------------------------------------
+# BENCHMARK SETTINGS
+# -----------------------------------------------------------
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_UNIVERSES = "50,500,5000"
+CASES = ("prices", "overviews")
+REPORTED_METRICS = ("wall_seconds", "tickers_per_second", "peak_rss_mb", "bytes_parsed")
+
+
+def synthetic_universe(size: int) -> list[str]:
+    return [f"S{i:05d}" for i in range(size)]
+
+
+def peak_rss_mb() -> float:
+    # Linux: VmHWM is per address space, so unlike ru_maxrss it does not
+    # inherit the (large, prerendered) parent's footprint across exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def format_bytes(count: int) -> str:
+    # overview payloads are a few hundred bytes each; MB alone reads 0.0
+    for unit in ("B", "KB", "MB"):
+        if count < 1000:
+            return f"{count:.1f} {unit}"
+        count /= 1000
+    return f"{count:.1f} GB"
+
+
+# -----------------------------------------------------------
+# CHILD PROCESS: RUN ONE CASE
+# -----------------------------------------------------------
+def run_case(case: str, universe: int) -> dict:
+    """
+    Runs one script's main() and returns its run report (stage timers,
+    counters, latency histograms) plus throughput and peak RSS.
+    """
+    started = time.perf_counter()
+
+    if case == "prices":
+        import StockDataApiCallScript as script
+        asyncio.run(script.main())
+    elif case == "merge_shards":
+        import StockDataApiCallScript as script
+        script.merge_main()
+    else:
+        import CompanyInfoScript as script
+        tickers = synthetic_universe(universe)
+        script.fetch_sp500_tickers = lambda: tickers
+        script.main()
+
+    wall = time.perf_counter() - started
+    report = script.metrics.to_dict()
+    return {
+        "case": case,
+        "universe": universe,
+        "wall_seconds": round(wall, 3),
+        "tickers_per_second": round(universe / wall, 2) if wall else None,
+        "rows_emitted": report["counters"].get("rows_emitted", 0),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stage_seconds": {
+            name: stage["seconds"] for name, stage in report["stages"].items()
+        },
+        "ticker_seconds": {
+            k: v
+            for k, v in report["histograms"].get("ticker_seconds", {}).items()
+            if k.startswith("p")
+        },
+        "counters": report["counters"],
+    }
+
+
+# -----------------------------------------------------------
+# PARENT PROCESS: ORCHESTRATION
+# -----------------------------------------------------------
+def start_s3_stand_in(endpoint):
+    if endpoint:
+        return endpoint, None
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        sys.exit(
+            "No S3 stand-in available: pip install 'moto[server]' "
+            "or pass --s3-endpoint for a running MinIO/localstack."
+        )
+
+    # moto's werkzeug server logs every request
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    return f"http://{host}:{port}", server
+
+
+def seed_price_state(s3, bucket, tickers, mode):
+    from ingest_state import (
+        MANIFEST_KEY,
+        REGISTRY_KEY,
+        Manifest,
+        TickerRegistry,
+        write_json_state,
+    )
+
+    # daily: high-water marks a few sessions back -> compact plans
+    # full: marks far outside the compact window -> full-history plans
+    lag_days = 4 if mode == "daily" else 400
+    high_water = date.today() - timedelta(days=lag_days)
+
+    registry = TickerRegistry()
+    registry.record_rows({t: (high_water, high_water, 1) for t in tickers})
+    manifest = Manifest(last_loaded_date=high_water)
+
+    write_json_state(s3, bucket, REGISTRY_KEY, registry.to_dict())
+    write_json_state(s3, bucket, MANIFEST_KEY, manifest.to_dict())
+
+
+def run_child(case, universe, env) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, __file__, "--run-case", case, "--universe", str(universe)],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def child_result(child, label) -> dict:
+    stdout, stderr = child.communicate()
+    if child.returncode != 0:
+        sys.stderr.write(stderr)
+        raise SystemExit(f"Benchmark case {label} failed")
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def run_sharded_prices(universe, env, shards) -> dict:
+    """Runs every shard concurrently, then the merge; one combined result."""
+    started = time.perf_counter()
+    children = [
+        run_child("prices", universe, {**env, "SHARD_INDEX": str(i), "SHARD_COUNT": str(shards)})
+        for i in range(shards)
+    ]
+    parts = [child_result(child, f"prices/{universe} shard {i}") for i, child in enumerate(children)]
+    fetched = time.perf_counter()
+    merge = child_result(
+        run_child("merge_shards", universe, {**env, "SHARD_COUNT": str(shards)}),
+        f"merge_shards/{universe}",
+    )
+    wall = time.perf_counter() - started
+
+    counters = {}
+    for part in parts:
+        for name, value in part["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+
+    return {
+        "case": "prices",
+        "universe": universe,
+        "shards": shards,
+        "wall_seconds": round(wall, 3),
+        "tickers_per_second": round(universe / wall, 2) if wall else None,
+        "rows_emitted": sum(part["rows_emitted"] for part in parts),
+        "peak_rss_mb": max(part["peak_rss_mb"] for part in parts + [merge]),
+        "stage_seconds": {
+            "shards": round(fetched - started, 3),
+            "merge": merge["wall_seconds"],
+        },
+        "shard_wall_seconds": [part["wall_seconds"] for part in parts],
+        "counters": counters,
+        "merge_counters": merge["counters"],
+    }
+
+
+def run_suite(args) -> dict:
+    api = FakeAlphaVantage(
+        FakeApiConfig(
+            full_bars=args.full_bars,
+            compact_bars=args.compact_bars,
+            latency_ms=args.latency_ms,
+            throttle_every=args.throttle_every,
+        )
+    ).start_in_thread()
+    s3_endpoint, s3_server = start_s3_stand_in(args.s3_endpoint)
+
+    credentials = {
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_REGION": "us-east-1",
+        "AWS_ENDPOINT_URL": s3_endpoint,
+    }
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=s3_endpoint,
+        region_name="us-east-1",
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+    )
+
+    results = []
+    run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+
+    for universe in args.universes:
+        for case in args.cases:
+            bucket = f"bench-{run_id}-{case}-{universe}"
+            s3.create_bucket(Bucket=bucket)
+            api.clear_prerendered()
+            if case == "prices":
+                seed_price_state(s3, bucket, synthetic_universe(universe), args.mode)
+                api.prerender(
+                    "TIME_SERIES_DAILY_ADJUSTED",
+                    synthetic_universe(universe),
+                    "compact" if args.mode == "daily" else "full",
+                )
+            else:
+                api.prerender("OVERVIEW", synthetic_universe(universe))
+
+            env = {
+                **os.environ,
+                **credentials,
+                "S3_BUCKET_NAME": bucket,
+                "ALPHAVANTAGE_API_KEY": "benchmark",
+                "ALPHAVANTAGE_BASE_URL": api.url,
+                "AV_CACHE_MODE": "off",
+                "AV_CALLS_PER_MINUTE": str(args.calls_per_minute),
+                "AV_MAX_CONCURRENCY": str(args.concurrency),
+                "AV_THROTTLE_BACKOFF_SECONDS": "0.5",
+                "OUTPUT_FORMAT": args.output_format,
+                "RUN_REPORT_S3": "0",
+                "RUN_REPORT_DIR": os.path.join(args.results_dir, "run_reports"),
+            }
+
+            calls_before, bytes_before = api.calls, api.bytes_served
+            if case == "prices" and args.shards > 1:
+                result = run_sharded_prices(universe, env, args.shards)
+            else:
+                result = child_result(run_child(case, universe, env), f"{case}/{universe}")
+            result["api_calls"] = api.calls - calls_before
+            result["bytes_parsed"] = api.bytes_served - bytes_before
+            results.append(result)
+            print(
+                f"{case:>9} {universe:>6} tickers: {result['wall_seconds']:>8.2f}s "
+                f"{result['tickers_per_second']:>8.1f} tickers/s "
+                f"{result['peak_rss_mb']:>7.1f} MB peak RSS "
+                f"{format_bytes(result['bytes_parsed']):>10} parsed"
+            )
+
+    api.stop()
+    if s3_server:
+        s3_server.stop()
+
+    return {
+        "run_id": run_id,
+        "settings": {
+            "mode": args.mode,
+            "full_bars": args.full_bars,
+            "compact_bars": args.compact_bars,
+            "latency_ms": args.latency_ms,
+            "throttle_every": args.throttle_every,
+            "calls_per_minute": args.calls_per_minute,
+            "concurrency": args.concurrency,
+            "output_format": args.output_format,
+            "shards": args.shards,
+        },
+        "results": results,
+    }
+
+
+# -----------------------------------------------------------
+# RESULT HISTORY + REGRESSION COMPARISON
+# -----------------------------------------------------------
+def previous_report(results_dir, settings):
+    if not os.path.isdir(results_dir):
+        return None
+
+    for name in sorted(os.listdir(results_dir), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(results_dir, name)) as fh:
+            report = json.load(fh)
+        if report.get("settings") == settings:
+            return report
+
+    return None
+
+
+def compare(report, previous):
+    if previous is None:
+        print("No previous run with identical settings — nothing to compare.")
+        return
+
+    print(f"\nΔ vs run {previous['run_id']}:")
+    before = {(r["case"], r["universe"]): r for r in previous["results"]}
+
+    for result in report["results"]:
+        old = before.get((result["case"], result["universe"]))
+        if not old:
+            continue
+
+        deltas = []
+        for metric in REPORTED_METRICS:
+            if old.get(metric):
+                change = (result[metric] - old[metric]) / old[metric] * 100
+                deltas.append(f"{metric} {change:+.1f}%")
+        print(f"{result['case']:>9} {result['universe']:>6}: " + ", ".join(deltas))
+
+
+def save_report(report, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"ingest_{report['run_id']}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\n💾 Saved {path}")
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--universes", default=DEFAULT_UNIVERSES,
+                        type=lambda v: [int(x) for x in v.split(",")])
+    parser.add_argument("--cases", default=",".join(CASES),
+                        type=lambda v: [c for c in v.split(",") if c in CASES])
+    parser.add_argument("--mode", choices=("daily", "full"), default="daily",
+                        help="daily = compact incremental fetches, full = full-history fetches")
+    parser.add_argument("--full-bars", type=int, default=5000)
+    parser.add_argument("--compact-bars", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--throttle-every", type=int, default=0)
+    parser.add_argument("--calls-per-minute", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output-format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="run the prices case as this many concurrent shards + merge")
+    parser.add_argument("--s3-endpoint", help="use an already running S3-compatible endpoint")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--run-case", choices=CASES + ("merge_shards",), help=argparse.SUPPRESS)
+    parser.add_argument("--universe", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.run_case:
+        # child process: keep stdout clean except for the JSON result line
+        logging.disable(logging.INFO)
+        print(json.dumps(run_case(args.run_case, args.universe)))
+    else:
+        report = run_suite(args)
+        previous = previous_report(args.results_dir, report["settings"])
+        save_report(report, args.results_dir)
+        compare(report, previous)
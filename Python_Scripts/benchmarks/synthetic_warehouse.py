@@ -0,0 +1,502 @@
+"""
+Synthetic RAW layer for load-testing the dbt models without Snowflake.
+
+Writes RAW.STOCK_PRICE_DATA_RAW and RAW.COMPANY_OVERVIEW_JSON_RAW into a
+DuckDB file shaped like the Snowpipe-loaded tables, at any scale:
+
+    pip install -r requirements-dev.txt   # duckdb
+    python Python_Scripts/benchmarks/synthetic_warehouse.py stock_data.duckdb --tickers 5000 --years 25
+    python Python_Scripts/benchmarks/synthetic_warehouse.py stock_data.duckdb --append 1
+
+Each ticker is a split-adjusted random walk with fat-tailed returns,
+real splits (forward and reverse, raw prices and volumes jump on the
+split bar), quarterly dividends, late listings, delistings, market
+holidays, missing bars and multi-day halts. History arrives the way the
+pipeline delivers it: one backfill load, then one load per trading day,
+and a share of bars is delivered again by a later file, some restated.
+
+Every ticker draws from its own seeded generator over a calendar that
+runs APPEND_HORIZON bars past the end date, so --append continues the
+same paths the build started and a config always yields the same data.
+"""
+import json
+import time
+import logging
+import argparse
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# GENERATOR SETTINGS
+# -----------------------------------------------------------
+PRICE_TABLE = "RAW.STOCK_PRICE_DATA_RAW"
+OVERVIEW_TABLE = "RAW.COMPANY_OVERVIEW_JSON_RAW"
+# generator config + last delivered load, read back by --append
+STATE_TABLE = "RAW.SYNTHETIC_WAREHOUSE_STATE"
+
+PRICE_COLUMNS = [
+    "DATE", "OPEN", "HIGH", "LOW", "CLOSE", "ADJUSTED_CLOSE", "VOLUME",
+    "DIVIDEND_AMOUNT", "SPLIT_COEFFICIENT", "TICKER", "LOAD_TIME",
+]
+# tickers generated and inserted together; bounds the generator's memory
+CHUNK_TICKERS = 250
+# bars generated past the end date for later daily appends
+APPEND_HORIZON = 260
+# daily price files land after the close, the overview run an hour later
+PRICE_LOAD_HOUR = 22
+OVERVIEW_LOAD_HOUR = 23
+
+# 0.1 = 1-for-10 reverse split
+SPLIT_RATIOS = np.array([2.0, 3.0, 1.5, 4.0, 0.1])
+SPLIT_WEIGHTS = np.array([0.55, 0.15, 0.1, 0.1, 0.1])
+SECTORS = (
+    "TECHNOLOGY", "FINANCIAL SERVICES", "HEALTHCARE", "INDUSTRIALS", "ENERGY",
+    "CONSUMER CYCLICAL", "CONSUMER DEFENSIVE", "UTILITIES", "REAL ESTATE",
+    "BASIC MATERIALS", "COMMUNICATION SERVICES",
+)
+EXCHANGES = ("NYSE", "NASDAQ")
+FISCAL_YEAR_ENDS = ("December", "December", "December", "June", "September", "March")
+
+
+@dataclass(frozen=True)
+class WarehouseConfig:
+    tickers: int = 500
+    years: float = 25.0
+    end_date: str | None = None       # last delivered bar; default: last business day
+    seed: int = 7
+    daily_loads: int = 20             # trailing bars loaded one file per day; older bars
+                                      # arrive together in the backfill load before them
+    overview_every: int = 5           # business days between overview runs
+    gap_rate: float = 0.002           # single missing bars
+    halt_rate: float = 0.0002         # start of a 5-20 bar trading halt
+    late_listing_share: float = 0.3   # tickers listing after the first date
+    delisted_share: float = 0.05
+    splits_per_decade: float = 0.8
+    dividend_share: float = 0.4
+    duplicate_rate: float = 0.002     # bars delivered again by a later daily file
+    restated_share: float = 0.5       # ... with a corrected close rather than identical
+
+    @classmethod
+    def from_json(cls, payload: str) -> "WarehouseConfig":
+        return cls(**json.loads(payload))
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+def ticker_symbol(index: int) -> str:
+    # same names as the ingest benchmark's synthetic universe
+    return f"S{index:05d}"
+
+
+def _fmt(value, digits=4) -> str:
+    return "None" if value is None or not np.isfinite(value) else f"{value:.{digits}f}"
+
+
+# -----------------------------------------------------------
+# CALENDAR + LOAD SCHEDULE
+# -----------------------------------------------------------
+class SyntheticWarehouse:
+    """
+    Deterministic price and overview history for config.tickers tickers.
+    Rows are addressed by the calendar index of the load that delivers
+    them, so any range of loads can be produced without the others.
+    """
+
+    def __init__(self, config: WarehouseConfig):
+        self.config = config
+
+        end = np.datetime64(config.end_date or date.today() - timedelta(days=1), "D")
+        start = end - np.timedelta64(int(config.years * 365.25), "D")
+        stop = end + np.timedelta64(APPEND_HORIZON * 7 // 5 + 14, "D")
+
+        years = range(start.astype(object).year, stop.astype(object).year + 1)
+        holidays = [
+            np.datetime64(f"{y}-{md}") for y in years for md in ("01-01", "07-04", "12-25")
+        ]
+        days = np.arange(start, stop + 1, dtype="datetime64[D]")
+        self.calendar = days[np.is_busday(days, holidays=holidays)]
+
+        self.end_index = int(np.searchsorted(self.calendar, end, side="right")) - 1
+        self.calendar = self.calendar[: self.end_index + 1 + APPEND_HORIZON]
+        if not 1 <= config.daily_loads <= self.end_index:
+            raise ValueError(f"daily_loads must be between 1 and {self.end_index}")
+
+        # bars before the daily window are all delivered by its backfill load
+        self.backfill_index = self.end_index - config.daily_loads
+
+        self.load_times = self.calendar.astype("datetime64[s]") + np.timedelta64(PRICE_LOAD_HOUR, "h")
+
+    def load_index(self, bar_index: np.ndarray) -> np.ndarray:
+        return np.maximum(bar_index, self.backfill_index)
+
+    def is_overview_load(self, index: int) -> bool:
+        return index >= self.backfill_index and (index - self.backfill_index) % self.config.overview_every == 0
+
+    # -------------------------------------------------------
+    # one ticker's full path
+    # -------------------------------------------------------
+    def ticker_path(self, index: int) -> dict:
+        cfg = self.config
+        rng = np.random.default_rng([cfg.seed, index])
+        n = len(self.calendar)
+
+        start = int(rng.integers(0, int(self.end_index * 0.8))) if rng.random() < cfg.late_listing_share else 0
+        end = n
+        if rng.random() < cfg.delisted_share and start + 250 < self.end_index:
+            end = int(rng.integers(start + 250, self.end_index))
+        m = end - start
+
+        # missing bars and halts; the walk keeps moving underneath them
+        keep = rng.random(m) >= cfg.gap_rate
+        for halt in np.flatnonzero(rng.random(m) < cfg.halt_rate):
+            keep[halt : halt + int(rng.integers(5, 21))] = False
+        keep[0] = True
+
+        volatility = rng.uniform(0.01, 0.03)
+        drift = rng.normal(0.0003, 0.0003)
+        returns = np.clip(drift + volatility * rng.standard_t(4, m) / np.sqrt(2), -0.35, 0.35)
+        adjusted = rng.uniform(10, 150) * np.exp(np.cumsum(returns))
+
+        # raw prices before a split are `ratio` times their adjusted value
+        split = np.ones(m)
+        splits = min(rng.poisson(cfg.splits_per_decade * m / 2610), m - 1)
+        if splits:
+            split[rng.choice(np.arange(1, m), splits, replace=False)] = rng.choice(
+                SPLIT_RATIOS, splits, p=SPLIT_WEIGHTS
+            )
+        later_splits = np.append(np.cumprod(split[::-1])[::-1][1:], 1.0)
+
+        close = adjusted * later_splits
+        open_ = close * (1 + rng.normal(0, 0.006, m))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.015, m))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.015, m))
+        volume = np.maximum(rng.lognormal(np.log(rng.uniform(2e5, 2e7)), 0.5, m) / later_splits, 1)
+
+        dividend = np.zeros(m)
+        dividend_yield = rng.uniform(0.005, 0.05) if rng.random() < cfg.dividend_share else 0.0
+        if dividend_yield:
+            paid = np.arange(int(rng.integers(0, 63)), m, 63)
+            dividend[paid] = np.round(close[paid] * dividend_yield / 4, 4)
+
+        # redeliveries: a later daily file (1-5 loads on) repeats the bar
+        duplicate = rng.random(m) < cfg.duplicate_rate
+        redelivered_at = self.load_index(np.arange(start, end)) + rng.integers(1, 6, m)
+        restated = 1 + np.where(rng.random(m) < cfg.restated_share, rng.normal(0, 0.003, m), 0.0)
+
+        return {
+            "index": index,
+            "ticker": ticker_symbol(index),
+            "start": start,
+            "end": end,
+            "keep": keep,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "adjusted": adjusted,
+            "volume": volume.astype(np.int64),
+            "dividend": dividend,
+            "dividend_yield": dividend_yield,
+            "split": split,
+            "duplicate": duplicate,
+            "redelivered_at": redelivered_at,
+            "restated": restated,
+            "profile": self._profile(rng),
+        }
+
+    def _profile(self, rng) -> dict:
+        return {
+            "sector": SECTORS[int(rng.integers(len(SECTORS)))],
+            "industry": int(rng.integers(6)),
+            "exchange": EXCHANGES[int(rng.integers(len(EXCHANGES)))],
+            "fiscal_year_end": FISCAL_YEAR_ENDS[int(rng.integers(len(FISCAL_YEAR_ENDS)))],
+            "cik": int(rng.integers(1_000, 2_000_000)),
+            "shares": float(rng.lognormal(np.log(3e8), 1.0)),
+            "pe": float(rng.uniform(8, 45)),
+            "unprofitable": bool(rng.random() < 0.12),
+            "price_to_sales": float(rng.uniform(0.5, 12)),
+            "gross_margin": float(rng.uniform(0.15, 0.8)),
+            "operating_margin": float(rng.uniform(-0.1, 0.4)),
+            "book_to_price": float(rng.uniform(0.05, 1.2)),
+            "beta": float(rng.normal(1.0, 0.35)),
+            "growth": float(rng.normal(0.06, 0.15)),
+        }
+
+    # -------------------------------------------------------
+    # rows delivered by loads lo < load <= hi
+    # -------------------------------------------------------
+    def price_rows(self, path: dict, lo: int, hi: int) -> pd.DataFrame:
+        bars = np.arange(path["start"], path["end"])
+        loaded = self.load_index(bars)
+
+        first = path["keep"] & (loaded > lo) & (loaded <= hi)
+        again = (
+            path["keep"] & path["duplicate"]
+            & (path["redelivered_at"] > lo) & (path["redelivered_at"] <= hi)
+            & (path["redelivered_at"] < len(self.calendar))
+        )
+
+        parts = []
+        for mask, load, factor in (
+            (first, loaded, 1.0),
+            (again, path["redelivered_at"], path["restated"]),
+        ):
+            if not mask.any():
+                continue
+            factor = factor[mask] if isinstance(factor, np.ndarray) else factor
+            close = path["close"][mask] * factor
+            parts.append(pd.DataFrame({
+                "DATE": self.calendar[bars[mask]],
+                "OPEN": np.round(path["open"][mask], 4),
+                "HIGH": np.round(np.maximum(path["high"][mask], close), 4),
+                "LOW": np.round(np.minimum(path["low"][mask], close), 4),
+                "CLOSE": np.round(close, 4),
+                "ADJUSTED_CLOSE": np.round(path["adjusted"][mask] * factor, 4),
+                "VOLUME": path["volume"][mask],
+                "DIVIDEND_AMOUNT": path["dividend"][mask],
+                "SPLIT_COEFFICIENT": path["split"][mask],
+                "TICKER": path["ticker"],
+                "LOAD_TIME": self.load_times[load[mask]],
+            }))
+
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=PRICE_COLUMNS)
+
+    def overview_docs(self, path: dict, lo: int, hi: int) -> list[tuple]:
+        docs = []
+        for index in range(max(lo + 1, path["start"]), min(hi, path["end"] - 1) + 1):
+            if self.is_overview_load(index):
+                load_time = self.calendar[index].astype("datetime64[s]") + np.timedelta64(OVERVIEW_LOAD_HOUR, "h")
+                stamp = pd.Timestamp(load_time).strftime("%Y-%m-%d_%H%M%S")
+                docs.append((
+                    json.dumps(self._overview(path, index)),
+                    f"company_overview_json/overview_{stamp}.json",
+                    load_time,
+                ))
+        return docs
+
+    def _overview(self, path: dict, index: int) -> dict:
+        """AlphaVantage OVERVIEW document as of calendar[index], strings throughout."""
+        p = path["profile"]
+        rng = np.random.default_rng([self.config.seed, path["index"], index])
+        bar = index - path["start"]
+        close = path["close"][: bar + 1]
+        price = close[-1]
+        as_of = pd.Timestamp(self.calendar[index])
+
+        market_cap = p["shares"] * price
+        revenue = market_cap / p["price_to_sales"] * rng.uniform(0.97, 1.03)
+        eps = -abs(price / p["pe"]) * 0.3 if p["unprofitable"] else price / (p["pe"] * rng.uniform(0.9, 1.1))
+        pe = price / eps if eps > 0 else None
+        book = price * p["book_to_price"]
+        latest_quarter = (as_of - pd.offsets.QuarterEnd(1)).date()
+        dividend_per_share = price * path["dividend_yield"]
+
+        return {
+            "Symbol": path["ticker"],
+            "AssetType": "Common Stock",
+            "Name": f"{path['ticker']} Holdings Inc",
+            "Description": f"Synthetic {p['sector'].lower()} company.",
+            "CIK": str(p["cik"]),
+            "Exchange": p["exchange"],
+            "Currency": "USD",
+            "Country": "USA",
+            "Sector": p["sector"],
+            "Industry": f"{p['sector']} {p['industry']}",
+            "Address": f"{path['index']} MARKET ST, NEW YORK, NY, US",
+            "FiscalYearEnd": p["fiscal_year_end"],
+            "LatestQuarter": str(latest_quarter),
+            "MarketCapitalization": str(int(market_cap)),
+            "EBITDA": str(int(revenue * (p["operating_margin"] + 0.05))),
+            "PERatio": _fmt(pe, 2),
+            "PEGRatio": _fmt(pe / (p["growth"] * 100) if pe and p["growth"] > 0 else None, 3),
+            "BookValue": _fmt(book, 2),
+            "DividendPerShare": _fmt(dividend_per_share, 2) if dividend_per_share else "None",
+            "DividendYield": _fmt(path["dividend_yield"], 4),
+            "EPS": _fmt(eps, 2),
+            "RevenuePerShareTTM": _fmt(revenue / p["shares"], 2),
+            "ProfitMargin": _fmt(eps * p["shares"] / revenue, 3),
+            "OperatingMarginTTM": _fmt(p["operating_margin"] * rng.uniform(0.9, 1.1), 3),
+            "ReturnOnAssetsTTM": _fmt(eps / book * 0.4, 3),
+            "ReturnOnEquityTTM": _fmt(eps / book, 3),
+            "RevenueTTM": str(int(revenue)),
+            "GrossProfitTTM": str(int(revenue * p["gross_margin"])),
+            "DilutedEPSTTM": _fmt(eps * 0.98, 2),
+            "QuarterlyEarningsGrowthYOY": _fmt(p["growth"] + rng.normal(0, 0.1), 3),
+            "QuarterlyRevenueGrowthYOY": _fmt(p["growth"] + rng.normal(0, 0.05), 3),
+            "AnalystTargetPrice": _fmt(price * rng.uniform(0.9, 1.3), 2),
+            "TrailingPE": _fmt(pe, 2),
+            "ForwardPE": _fmt(pe / (1 + p["growth"]) if pe else None, 2),
+            "PriceToSalesRatioTTM": _fmt(market_cap / revenue, 3),
+            "PriceToBookRatio": _fmt(price / book, 3),
+            "EVToRevenue": _fmt(market_cap * 1.1 / revenue, 3),
+            "EVToEBITDA": _fmt(market_cap * 1.1 / (revenue * (p["operating_margin"] + 0.05)), 3),
+            "Beta": _fmt(p["beta"], 3),
+            "52WeekHigh": _fmt(close[-252:].max(), 2),
+            "52WeekLow": _fmt(close[-252:].min(), 2),
+            "50DayMovingAverage": _fmt(close[-50:].mean(), 2),
+            "200DayMovingAverage": _fmt(close[-200:].mean(), 2),
+            "SharesOutstanding": str(int(p["shares"])),
+            "DividendDate": str((as_of + pd.offsets.MonthEnd(1)).date()) if dividend_per_share else "None",
+            "ExDividendDate": str((as_of + pd.offsets.MonthBegin(1)).date()) if dividend_per_share else "None",
+        }
+
+    # -------------------------------------------------------
+    # chunked generation
+    # -------------------------------------------------------
+    def chunks(self, lo: int, hi: int):
+        """(price rows, overview docs) per CHUNK_TICKERS tickers for loads lo < load <= hi."""
+        for first in range(0, self.config.tickers, CHUNK_TICKERS):
+            prices, docs = [], []
+            for index in range(first, min(first + CHUNK_TICKERS, self.config.tickers)):
+                path = self.ticker_path(index)
+                prices.append(self.price_rows(path, lo, hi))
+                docs.extend(self.overview_docs(path, lo, hi))
+            yield pd.concat(prices, ignore_index=True), docs
+
+
+# -----------------------------------------------------------
+# DUCKDB WRITERS
+# -----------------------------------------------------------
+def _insert_prices(con, frame: pd.DataFrame):
+    if frame.empty:
+        return
+    con.register("price_chunk", frame[PRICE_COLUMNS])
+    con.execute(f"""
+        insert into {PRICE_TABLE}
+        select cast(DATE as date), OPEN, HIGH, LOW, CLOSE, ADJUSTED_CLOSE, VOLUME,
+               DIVIDEND_AMOUNT, SPLIT_COEFFICIENT, TICKER, cast(LOAD_TIME as timestamp)
+        from price_chunk
+    """)
+    con.unregister("price_chunk")
+
+
+def _insert_overviews(con, docs: list[tuple]):
+    if not docs:
+        return
+    frame = pd.DataFrame(docs, columns=["RAW", "METADATA$FILENAME", "LOAD_TIME"])
+    con.register("overview_chunk", frame)
+    con.execute(f"""
+        insert into {OVERVIEW_TABLE}
+        select cast(RAW as json), "METADATA$FILENAME", cast(LOAD_TIME as timestamp)
+        from overview_chunk
+    """)
+    con.unregister("overview_chunk")
+
+
+def _write_loads(con, warehouse: SyntheticWarehouse, lo: int, hi: int) -> dict:
+    """
+    Inserts loads lo < load <= hi. Backfill rows go in chunk by chunk;
+    daily-file rows are held back and inserted in LOAD_TIME order, so the
+    table is laid out the way Snowpipe appends it.
+    """
+    price_rows, overview_rows, daily = 0, 0, []
+
+    for prices, docs in warehouse.chunks(lo, hi):
+        backfill = prices["LOAD_TIME"] == warehouse.load_times[warehouse.backfill_index]
+        _insert_prices(con, prices[backfill])
+        daily.append(prices[~backfill])
+        _insert_overviews(con, docs)
+        price_rows += len(prices)
+        overview_rows += len(docs)
+
+    _insert_prices(con, pd.concat(daily, ignore_index=True).sort_values("LOAD_TIME", kind="stable"))
+    con.execute(f"update {STATE_TABLE} set LAST_LOAD_INDEX = {hi}")
+    return {"price_rows": price_rows, "overview_rows": overview_rows}
+
+
+def build_warehouse(db_path: str, config: WarehouseConfig) -> dict:
+    """(Re)creates the RAW tables with every load up to config.end_date."""
+    started = time.perf_counter()
+    warehouse = SyntheticWarehouse(config)
+
+    with duckdb.connect(db_path) as con:
+        con.execute("create schema if not exists RAW")
+        con.execute(f"""
+            create or replace table {PRICE_TABLE} (
+                DATE date, OPEN double, HIGH double, LOW double, CLOSE double,
+                ADJUSTED_CLOSE double, VOLUME bigint, DIVIDEND_AMOUNT double,
+                SPLIT_COEFFICIENT double, TICKER varchar, LOAD_TIME timestamp
+            )
+        """)
+        con.execute(f"""
+            create or replace table {OVERVIEW_TABLE} (
+                RAW json, "METADATA$FILENAME" varchar, LOAD_TIME timestamp
+            )
+        """)
+        con.execute(f"create or replace table {STATE_TABLE} (CONFIG varchar, LAST_LOAD_INDEX integer)")
+        con.execute(f"insert into {STATE_TABLE} values (?, -1)", [config.to_json()])
+
+        stats = _write_loads(con, warehouse, -1, warehouse.end_index)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["last_load"] = str(warehouse.calendar[warehouse.end_index])
+    logging.info(
+        f"🏗️ Built {db_path}: {stats['price_rows']:,} price rows, "
+        f"{stats['overview_rows']:,} overview docs in {stats['seconds']:.1f}s"
+    )
+    return stats
+
+
+def append_daily_loads(db_path: str, days: int = 1) -> dict:
+    """Delivers the next `days` daily loads of the warehouse built in db_path."""
+    started = time.perf_counter()
+
+    with duckdb.connect(db_path) as con:
+        payload, last = con.execute(f"select CONFIG, LAST_LOAD_INDEX from {STATE_TABLE}").fetchone()
+        warehouse = SyntheticWarehouse(WarehouseConfig.from_json(payload))
+        hi = last + days
+        if hi >= len(warehouse.calendar):
+            raise ValueError(f"only {APPEND_HORIZON} daily loads can be appended after the build")
+
+        stats = _write_loads(con, warehouse, last, hi)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["last_load"] = str(warehouse.calendar[hi])
+    logging.info(
+        f"➕ Appended {days} daily load(s) through {stats['last_load']}: "
+        f"{stats['price_rows']:,} price rows, {stats['overview_rows']:,} overview docs"
+    )
+    return stats
+
+
+# -----------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------
+def parse_args():
+    defaults = WarehouseConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("db_path", help="DuckDB file; name it stock_data.duckdb for the dbt profile")
+    parser.add_argument("--tickers", type=int, default=defaults.tickers)
+    parser.add_argument("--years", type=float, default=defaults.years)
+    parser.add_argument("--end-date", help="last bar of the build (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--daily-loads", type=int, default=defaults.daily_loads)
+    parser.add_argument("--duplicate-rate", type=float, default=defaults.duplicate_rate)
+    parser.add_argument("--append", type=int, metavar="DAYS",
+                        help="deliver the next DAYS daily loads into an existing build")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    if args.append:
+        append_daily_loads(args.db_path, args.append)
+    else:
+        build_warehouse(
+            args.db_path,
+            WarehouseConfig(
+                tickers=args.tickers,
+                years=args.years,
+                end_date=args.end_date,
+                seed=args.seed,
+                daily_loads=args.daily_loads,
+                duplicate_rate=args.duplicate_rate,
+            ),
+        )
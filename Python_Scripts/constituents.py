@@ -0,0 +1,201 @@
+import io
+import os
+import json
+import logging
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+
+from ingest_state import STATE_PREFIX, read_json_state, update_json_state
+
+# -----------------------------------------------------------
+# CONSTITUENTS SOURCE SETTINGS (OVERRIDABLE VIA ENV)
+# -----------------------------------------------------------
+SP500_CONSTITUENTS_URL = os.getenv(
+    "SP500_CONSTITUENTS_URL",
+    "https://datahub.io/core/s-and-p-500-companies/r/constituents.csv",
+)
+CONSTITUENTS_TIMEOUT_SECONDS = float(os.getenv("CONSTITUENTS_TIMEOUT_SECONDS", "10"))
+CONSTITUENTS_SNAPSHOT_PATH = os.getenv(
+    "CONSTITUENTS_SNAPSHOT_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "sp500", "constituents.json"),
+)
+# durable copy for runners whose local disk does not survive the run
+CONSTITUENTS_STATE_KEY = f"{STATE_PREFIX}sp500_constituents.json"
+# a list that shrinks below this is treated as a broken download
+MIN_CONSTITUENTS = int(os.getenv("MIN_CONSTITUENTS", "400"))
+
+
+class ConstituentsUnavailable(Exception):
+    """Raised when the source is unreachable and no snapshot exists."""
+
+
+# -----------------------------------------------------------
+# SNAPSHOT + DIFF
+# -----------------------------------------------------------
+@dataclass
+class ConstituentsSnapshot:
+    tickers: list[str]
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: str | None = None
+    changed_at: str | None = None
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "ConstituentsSnapshot":
+        return cls(**payload)
+
+    def to_dict(self) -> dict:
+        return vars(self)
+
+
+@dataclass
+class ConstituentsDiff:
+    """`added`/`removed` against the previous snapshot (initial: no snapshot)."""
+
+    added: list[str]
+    removed: list[str]
+    initial: bool = False
+
+    @classmethod
+    def between(cls, previous: list[str] | None, current: list[str]) -> "ConstituentsDiff":
+        if previous is None:
+            return cls(added=sorted(current), removed=[], initial=True)
+
+        before, after = set(previous), set(current)
+        return cls(added=sorted(after - before), removed=sorted(before - after))
+
+
+def parse_constituents(body: bytes) -> list[str]:
+    df = pd.read_csv(io.BytesIO(body))
+    tickers = sorted(set(df["Symbol"].dropna().astype(str).str.strip().str.upper()))
+
+    if len(tickers) < MIN_CONSTITUENTS:
+        raise ValueError(f"only {len(tickers)} constituents in download")
+    return tickers
+
+
+# -----------------------------------------------------------
+# CONDITIONAL-GET PROVIDER WITH SNAPSHOT FALLBACK
+# -----------------------------------------------------------
+class ConstituentsProvider:
+    """
+    Returns the current S&P 500 universe and how it changed since the
+    previous run.
+
+    The source is fetched with If-None-Match / If-Modified-Since, so an
+    unchanged list costs one empty 304. The last good list is kept as a
+    snapshot (locally and, when an S3 client is given, under _state/) and
+    is what the run falls back to when the source is slow or unreachable.
+    """
+
+    def __init__(self, s3_client=None, bucket=None, url=SP500_CONSTITUENTS_URL,
+                 timeout=CONSTITUENTS_TIMEOUT_SECONDS,
+                 snapshot_path=CONSTITUENTS_SNAPSHOT_PATH):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.url = url
+        self.timeout = timeout
+        self.snapshot_path = snapshot_path
+        # "downloaded", "not_modified" or "snapshot" after refresh()
+        self.source = None
+
+    # -------------------------------------------------------
+    # snapshot storage
+    # -------------------------------------------------------
+    def load_snapshot(self) -> ConstituentsSnapshot | None:
+        payload = None
+
+        if self.s3_client is not None:
+            payload, _ = read_json_state(self.s3_client, self.bucket, CONSTITUENTS_STATE_KEY)
+
+        if payload is None and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as fh:
+                payload = json.load(fh)
+
+        return ConstituentsSnapshot.from_dict(payload) if payload else None
+
+    def save_snapshot(self, snapshot: ConstituentsSnapshot):
+        if self.s3_client is not None:
+            update_json_state(
+                self.s3_client, self.bucket, CONSTITUENTS_STATE_KEY,
+                lambda _payload: snapshot.to_dict(),
+            )
+
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            with open(self.snapshot_path, "w") as fh:
+                json.dump(snapshot.to_dict(), fh, indent=1)
+        except OSError as exc:
+            logging.warning(f"⚠️ Could not write constituents snapshot: {exc}")
+
+    # -------------------------------------------------------
+    # remote fetch
+    # -------------------------------------------------------
+    def _download(self, previous: ConstituentsSnapshot | None):
+        """Returns (body, etag, last_modified); body is None on a 304."""
+        request = urllib.request.Request(self.url)
+        if previous is not None and previous.etag:
+            request.add_header("If-None-Match", previous.etag)
+        if previous is not None and previous.last_modified:
+            request.add_header("If-Modified-Since", previous.last_modified)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return (
+                    response.read(),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304:
+                return None, previous.etag, previous.last_modified
+            raise
+
+    def refresh(self) -> tuple[list[str], ConstituentsDiff]:
+        """Returns (tickers, diff vs the previous snapshot)."""
+        previous = self.load_snapshot()
+        now = datetime.utcnow().isoformat()
+
+        try:
+            body, etag, last_modified = self._download(previous)
+            tickers = parse_constituents(body) if body is not None else previous.tickers
+        except (OSError, ValueError, KeyError, pd.errors.ParserError) as exc:
+            # URLError, timeouts and socket errors are all OSErrors
+            if previous is None:
+                raise ConstituentsUnavailable(
+                    f"{self.url} unavailable and no snapshot to fall back to: {exc}"
+                ) from exc
+
+            self.source = "snapshot"
+            logging.warning(
+                f"⚠️ Constituents source unavailable ({type(exc).__name__}: {exc}) — "
+                f"using snapshot from {previous.fetched_at}"
+            )
+            return list(previous.tickers), ConstituentsDiff([], [])
+
+        self.source = "downloaded" if body is not None else "not_modified"
+        diff = ConstituentsDiff.between(previous.tickers if previous else None, tickers)
+
+        snapshot = ConstituentsSnapshot(
+            tickers=tickers,
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=now,
+            changed_at=previous.changed_at if previous else now,
+            added=previous.added if previous else [],
+            removed=previous.removed if previous else [],
+        )
+        if not diff.initial and (diff.added or diff.removed):
+            snapshot.changed_at = now
+            snapshot.added, snapshot.removed = diff.added, diff.removed
+            logging.info(f"🔀 S&P 500 changes: +{diff.added} -{diff.removed}")
+
+        self.save_snapshot(snapshot)
+        logging.info(f"📋 {len(tickers)} constituents ({self.source})")
+        return tickers, diff
@@ -0,0 +1,339 @@
+import math
+import logging
+import numpy as np
+import pandas as pd
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from botocore.exceptions import ClientError
+
+from features import FEATURE_COLUMNS, MOMENTUM_LAGS, VOLATILITY_WINDOW, compute_features
+from ingest_state import (
+    MISSING_KEY_CODES,
+    STATE_PREFIX,
+    iso_date,
+    read_json_state,
+    read_price_files,
+    update_json_state,
+)
+
+# -----------------------------------------------------------
+# ROLLING FEATURE STATE LOCATION + SHAPE
+# -----------------------------------------------------------
+FEATURE_STATE_KEY = f"{STATE_PREFIX}feature_state.json"
+
+# closes kept per ticker: enough for the longest momentum lag
+CLOSE_HISTORY = max(MOMENTUM_LAGS.values())
+# the sliding Welford sums are recomputed from the buffered returns this
+# often so floating-point drift cannot build up across daily runs
+WELFORD_RESEED_EVERY = VOLATILITY_WINDOW
+
+
+def _nan_to_none(values):
+    return [None if math.isnan(v) else v for v in values]
+
+
+def _none_to_nan(values):
+    return [math.nan if v is None else float(v) for v in values]
+
+
+# -----------------------------------------------------------
+# PER-TICKER ROLLING STATE
+# -----------------------------------------------------------
+@dataclass
+class TickerFeatureState:
+    """
+    Everything needed to extend one ticker's features by one bar:
+    the last CLOSE_HISTORY closes, the last VOLATILITY_WINDOW daily
+    returns, and sliding Welford sums (count/mean/m2) over the non-NULL
+    returns in that window. NULLs are stored as NaN.
+    """
+
+    last_date: str
+    closes: deque = field(default_factory=lambda: deque(maxlen=CLOSE_HISTORY))
+    returns: deque = field(default_factory=lambda: deque(maxlen=VOLATILITY_WINDOW))
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    updates_since_reseed: int = 0
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "TickerFeatureState":
+        return cls(
+            last_date=payload["last_date"],
+            closes=deque(_none_to_nan(payload["closes"]), maxlen=CLOSE_HISTORY),
+            returns=deque(_none_to_nan(payload["returns"]), maxlen=VOLATILITY_WINDOW),
+            count=payload["count"],
+            mean=payload["mean"],
+            m2=payload["m2"],
+            updates_since_reseed=payload.get("updates_since_reseed", 0),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "last_date": self.last_date,
+            "closes": _nan_to_none(self.closes),
+            "returns": _nan_to_none(self.returns),
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "updates_since_reseed": self.updates_since_reseed,
+        }
+
+    @classmethod
+    def seed(cls, features: pd.DataFrame) -> "TickerFeatureState":
+        """Builds the state from one ticker's fully computed feature rows."""
+        state = cls(last_date=iso_date(features["date"].iloc[-1]))
+        state.closes.extend(features["close"].to_numpy()[-CLOSE_HISTORY:].tolist())
+        state.returns.extend(features["daily_return"].to_numpy()[-VOLATILITY_WINDOW:].tolist())
+        state.reseed()
+        return state
+
+    # -------------------------------------------------------
+    # sliding Welford over the returns window
+    # -------------------------------------------------------
+    def reseed(self):
+        present = [r for r in self.returns if not math.isnan(r)]
+        self.count = len(present)
+        self.mean = sum(present) / self.count if present else 0.0
+        self.m2 = sum((r - self.mean) ** 2 for r in present)
+        self.updates_since_reseed = 0
+
+    def _add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    @property
+    def volatility(self) -> float:
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    # -------------------------------------------------------
+    # one new bar
+    # -------------------------------------------------------
+    def _period_return(self, close, periods):
+        if len(self.closes) < periods:
+            return math.nan
+        previous = self.closes[-periods]
+        if math.isnan(close) or math.isnan(previous) or previous == 0:
+            return math.nan
+        return close / previous - 1
+
+    def advance(self, trading_date: str, close: float) -> dict:
+        """Appends one bar in O(1) and returns its feature values."""
+        row = {"daily_return": self._period_return(close, 1)}
+        for column, periods in MOMENTUM_LAGS.items():
+            row[column] = self._period_return(close, periods)
+
+        if len(self.returns) == self.returns.maxlen and not math.isnan(self.returns[0]):
+            self._remove(self.returns[0])
+        self.returns.append(row["daily_return"])
+        if not math.isnan(row["daily_return"]):
+            self._add(row["daily_return"])
+
+        self.updates_since_reseed += 1
+        if self.updates_since_reseed >= WELFORD_RESEED_EVERY:
+            self.reseed()
+
+        self.closes.append(close)
+        self.last_date = trading_date
+        row["daily_volatility"] = self.volatility
+        return row
+
+
+def _has_new_split(rows: pd.DataFrame, last_date: str) -> bool:
+    if "split_coefficient" not in rows:
+        return False
+    new = rows[rows["date"] > pd.Timestamp(last_date)]
+    return bool((new["split_coefficient"].fillna(1.0) != 1.0).any())
+
+
+def _restatement_reason(rows: pd.DataFrame, last_date: str) -> str:
+    return "split" if _has_new_split(rows, last_date) else "restated history"
+
+
+def _is_replay(state: "TickerFeatureState", rows: pd.DataFrame, dates: list[str]) -> bool:
+    """
+    True when the bars at/before state.last_date are bars already
+    applied: they end on last_date, fit in the stored closes and carry
+    the same closes. Anything else is a restatement.
+    """
+    overlap = sum(d <= state.last_date for d in dates)
+    if dates[overlap - 1] != state.last_date or overlap > len(state.closes):
+        return False
+
+    closes = rows["close"].to_numpy(dtype=np.float64, na_value=np.nan)[:overlap]
+    stored = np.array(list(state.closes)[-overlap:], dtype=np.float64)
+    return bool(np.allclose(closes, stored, rtol=1e-9, atol=0.0, equal_nan=True))
+
+
+# -----------------------------------------------------------
+# FEATURE STATE FOR THE WHOLE UNIVERSE
+# -----------------------------------------------------------
+@dataclass
+class FeatureState:
+    tickers: dict[str, TickerFeatureState] = field(default_factory=dict)
+    updated_at: str | None = None
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "FeatureState":
+        return cls(
+            tickers={
+                ticker: TickerFeatureState.from_dict(entry)
+                for ticker, entry in payload.get("tickers", {}).items()
+            },
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "tickers": {
+                ticker: entry.to_dict()
+                for ticker, entry in sorted(self.tickers.items())
+            },
+            "updated_at": self.updated_at,
+        }
+
+    def apply(self, prices: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+        """
+        Extends every ticker in `prices` (ticker, date, close,
+        split_coefficient — one parse_time_series frame or a batch of
+        them) and returns (feature rows, counts by path).
+
+        - unknown ticker: seeded from the rows given
+        - bars after the ticker's last_date only: advanced bar by bar,
+          O(new rows)
+        - bars at/before last_date that match the stored closes: a
+          replayed batch from a resumed run, or the compact window
+          re-emitted after a dividend; already-applied bars are skipped
+        - any other bars at/before last_date, or a new bar with a split
+          coefficient: a restated history (the fetch planner refetches
+          full history after a split), so the state is discarded,
+          rebuilt from the rows given and every given row is re-emitted
+        """
+        outputs, paths = [], {"seeded": 0, "advanced": 0, "rebuilt": 0, "replayed": 0}
+        prices = prices.sort_values(["ticker", "date"], kind="stable")
+
+        for ticker, rows in prices.groupby("ticker", observed=True, sort=True):
+            ticker = str(ticker)
+            dates = [iso_date(d) for d in rows["date"]]
+            state = self.tickers.get(ticker)
+
+            overlaps = state is not None and dates[0] <= state.last_date
+            split = state is not None and _has_new_split(rows, state.last_date)
+
+            if overlaps and not split and _is_replay(state, rows, dates):
+                # a resumed run re-applying a batch: keep only unseen bars
+                paths["replayed"] += 1
+                keep = [d > state.last_date for d in dates]
+                rows, dates = rows[keep], [d for d in dates if d > state.last_date]
+                overlaps = False
+
+            if state is None or overlaps or split:
+                if state is not None:
+                    paths["rebuilt"] += 1
+                    logging.info(
+                        f"♻️ {ticker}: {_restatement_reason(rows, state.last_date)} — "
+                        "rebuilding feature state"
+                    )
+                else:
+                    paths["seeded"] += 1
+                features = compute_features(rows)
+                self.tickers[ticker] = TickerFeatureState.seed(features)
+                outputs.append(features)
+                continue
+
+            if not dates:
+                continue
+
+            paths["advanced"] += 1
+            closes = rows["close"].to_numpy(dtype=np.float64, na_value=np.nan)
+            advanced = [state.advance(d, float(c)) for d, c in zip(dates, closes)]
+            frame = pd.DataFrame(advanced, columns=FEATURE_COLUMNS)
+            frame.insert(0, "close", closes)
+            frame.insert(0, "date", rows["date"].to_numpy())
+            frame.insert(0, "ticker", ticker)
+            outputs.append(frame)
+
+        self.updated_at = datetime.utcnow().isoformat()
+        if not outputs:
+            return pd.DataFrame(columns=["ticker", "date", "close", *FEATURE_COLUMNS]), paths
+
+        features = pd.concat(outputs, ignore_index=True)
+        features["ticker"] = features["ticker"].astype(str)
+        return features, paths
+
+
+def feature_state_exists(s3_client, bucket) -> bool:
+    try:
+        s3_client.head_object(Bucket=bucket, Key=FEATURE_STATE_KEY)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in MISSING_KEY_CODES:
+            return False
+        raise
+    return True
+
+
+def load_feature_state(s3_client, bucket) -> FeatureState:
+    payload, _ = read_json_state(s3_client, bucket, FEATURE_STATE_KEY)
+    return FeatureState.from_dict(payload) if payload else FeatureState()
+
+
+def update_feature_state(s3_client, bucket, prices: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Atomically applies `prices` to the persisted feature state and
+    returns the feature rows for the new bars.
+    """
+    result = {}
+
+    def mutate(payload):
+        state = FeatureState.from_dict(payload) if payload else FeatureState()
+        result["features"], result["paths"] = state.apply(prices)
+        return state.to_dict()
+
+    update_json_state(s3_client, bucket, FEATURE_STATE_KEY, mutate)
+    return result["features"], result["paths"]
+
+
+def rebuild_feature_state_from_files(s3_client, bucket, prefixes, exclude=()) -> FeatureState:
+    """
+    Repair/bootstrap path: reads the close column of every stored price
+    file under `prefixes` (bar the `exclude` keys, which are about to be
+    applied) and seeds every ticker from its full history.
+    """
+    frames = list(read_price_files(
+        s3_client, bucket, prefixes, ("date", "ticker", "close"), exclude=exclude
+    ))
+    state = FeatureState()
+
+    if frames:
+        prices = pd.concat(frames, ignore_index=True)
+        prices["ticker"] = prices["ticker"].astype(str)
+        prices["date"] = pd.to_datetime(prices["date"])
+        # a bar can sit in both a daily file and a backfill file
+        prices = prices.drop_duplicates(["ticker", "date"], keep="last")
+
+        features = compute_features(prices)
+        for ticker, rows in features.groupby("ticker", sort=True):
+            state.tickers[ticker] = TickerFeatureState.seed(rows)
+
+    state.updated_at = datetime.utcnow().isoformat()
+
+    def replace(_payload):
+        return state.to_dict()
+
+    update_json_state(s3_client, bucket, FEATURE_STATE_KEY, replace)
+    logging.info(f"🛠️ Rebuilt feature state for {len(state.tickers)} tickers")
+    return state
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# -----------------------------------------------------------
+# FEATURE DEFINITIONS (MIRROR THE dbt INTERMEDIATE MODELS)
+# -----------------------------------------------------------
+# int_stock_stats:      DAILY_RETURN = close / nullif(lag(close), 0) - 1
+# int_price_momentum:   *_RETURN    = close / nullif(lag(close, n), 0) - 1
+# int_quality_factors:  DAILY_VOLATILITY = stddev(DAILY_RETURN) over the
+#                       30 latest rows up to its as-of date (the rolling
+#                       window below, read at one row per ticker)
+# Lags count rows per ticker ordered by date, not calendar days.
+MOMENTUM_LAGS = {
+    "one_month_return": 21,
+    "three_month_return": 63,
+    "six_month_return": 126,
+}
+VOLATILITY_WINDOW = 30
+# rows per strided block in rolling_stddev (~rows x window x 8 bytes)
+ROLLING_CHUNK_ROWS = 262_144
+
+FEATURE_COLUMNS = ["daily_return", *MOMENTUM_LAGS, "daily_volatility"]
+
+
+# -----------------------------------------------------------
+# CONTIGUOUS PER-TICKER LAYOUT
+# -----------------------------------------------------------
+def sort_by_ticker(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Orders rows by (ticker, date) so every ticker's history is one
+    contiguous slice of each column array.
+    """
+    return prices.sort_values(["ticker", "date"], kind="stable", ignore_index=True)
+
+
+def group_offsets(tickers) -> np.ndarray:
+    """
+    For rows already sorted by ticker, returns each row's offset within
+    its ticker (0 for the first bar, 1 for the second, ...).
+    """
+    codes, _ = pd.factorize(tickers)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+# -----------------------------------------------------------
+# VECTORISED WINDOW PRIMITIVES
+# -----------------------------------------------------------
+def lag(values: np.ndarray, offsets: np.ndarray, periods: int) -> np.ndarray:
+    """SQL lag(values, periods) over (partition by ticker order by date)."""
+    lagged = np.full(len(values), np.nan)
+    if periods < len(values):
+        lagged[periods:] = values[:-periods]
+    lagged[offsets < periods] = np.nan
+    return lagged
+
+
+def period_return(close: np.ndarray, offsets: np.ndarray, periods: int) -> np.ndarray:
+    """close / nullif(lag(close, periods), 0) - 1, NULL-propagating."""
+    previous = lag(close, offsets, periods)
+    previous[previous == 0] = np.nan
+    return close / previous - 1
+
+
+def rolling_stddev(
+    values: np.ndarray, offsets: np.ndarray, window: int, chunk_rows: int = ROLLING_CHUNK_ROWS
+) -> np.ndarray:
+    """
+    Sample standard deviation over the current row and up to `window - 1`
+    preceding rows of the same ticker, ignoring NULLs; NULL when fewer than
+    two non-NULL values are in the frame (Snowflake STDDEV semantics).
+
+    Works on a strided (rows x window) view, `chunk_rows` rows at a time,
+    with a two-pass mean/variance per frame. Running prefix sums would be
+    O(rows) but lose ~1e-11 of precision over long histories, which breaks
+    parity on flat prices.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    padded = np.concatenate((np.full(window - 1, np.nan), values))
+    frames = sliding_window_view(padded, window)
+    # column j of a frame holds the value `window - 1 - j` rows back
+    rows_back = np.arange(window - 1, -1, -1)
+
+    for start in range(0, n, chunk_rows):
+        stop = min(n, start + chunk_rows)
+        frame = frames[start:stop].copy()
+        frame[rows_back > offsets[start:stop, None]] = np.nan
+
+        count = np.count_nonzero(~np.isnan(frame), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(frame, axis=1) / count
+            squares = np.nansum((frame - mean[:, None]) ** 2, axis=1)
+            out[start:stop] = np.where(count >= 2, np.sqrt(squares / (count - 1)), np.nan)
+
+    return out
+
+
+# -----------------------------------------------------------
+# FEATURE ENGINE
+# -----------------------------------------------------------
+def compute_features(prices: pd.DataFrame, price_column: str = "close") -> pd.DataFrame:
+    """
+    Computes every feature for every ticker in one batched pass.
+
+    `prices` needs ticker, date and `price_column` (the frames built by
+    price_parser.parse_time_series qualify). Returns ticker, date, close
+    and FEATURE_COLUMNS, ordered by (ticker, date).
+    """
+    frame = sort_by_ticker(prices[["ticker", "date", price_column]])
+    close = frame[price_column].to_numpy(dtype=np.float64, na_value=np.nan)
+    offsets = group_offsets(frame["ticker"])
+
+    daily_return = period_return(close, offsets, 1)
+    features = {
+        "ticker": frame["ticker"],
+        "date": frame["date"],
+        "close": close,
+        "daily_return": daily_return,
+    }
+    for column, periods in MOMENTUM_LAGS.items():
+        features[column] = period_return(close, offsets, periods)
+    features["daily_volatility"] = rolling_stddev(daily_return, offsets, VOLATILITY_WINDOW)
+
+    return pd.DataFrame(features)
+
+
+def latest_features(features: pd.DataFrame) -> pd.DataFrame:
+    """Most recent feature row per ticker."""
+    return features.groupby("ticker", observed=True, sort=True).tail(1).reset_index(drop=True)
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+import numpy as np
+
+# -----------------------------------------------------------
+# PLANNER SETTINGS
+# -----------------------------------------------------------
+# outputsize=compact returns the latest 100 daily bars
+COMPACT_BARS = 100
+# leave room for exchange holidays, which busday_count does not know about
+COMPACT_SAFETY_BARS = 5
+
+SERIES_KEY = "Time Series (Daily)"
+DIVIDEND_FIELD = "7. dividend amount"
+SPLIT_FIELD = "8. split coefficient"
+
+
+# -----------------------------------------------------------
+# FETCH PLAN
+# -----------------------------------------------------------
+@dataclass(frozen=True)
+class FetchPlan:
+    ticker: str
+    outputsize: str        # "compact" | "full"
+    start_date: date       # first trading date to keep from the payload
+    reason: str            # "incremental" | "new_ticker" | "gap" | "split" | "dividend"
+
+
+def bars_since(high_water: date, end_date: date) -> int:
+    """Weekdays strictly after `high_water`, up to and including `end_date`."""
+    return int(
+        np.busday_count(high_water + timedelta(days=1), end_date + timedelta(days=1))
+    )
+
+
+def plan_fetch(ticker, high_water: str | None, end_date: date, history_start: date) -> FetchPlan:
+    """
+    compact when the ticker's high-water mark is still inside the last
+    100 bars, full for new tickers and for gaps that compact cannot cover.
+    """
+    if not high_water:
+        return FetchPlan(ticker, "full", history_start, "new_ticker")
+
+    hwm = date.fromisoformat(high_water)
+    start_date = hwm + timedelta(days=1)
+
+    if bars_since(hwm, end_date) >= COMPACT_BARS - COMPACT_SAFETY_BARS:
+        return FetchPlan(ticker, "full", start_date, "gap")
+
+    return FetchPlan(ticker, "compact", start_date, "incremental")
+
+
+# -----------------------------------------------------------
+# RESTATEMENT / GAP DETECTION ON A COMPACT PAYLOAD
+# -----------------------------------------------------------
+def _bars_after(series: dict, high_water: str):
+    return ((d, bar) for d, bar in series.items() if d > high_water)
+
+
+def needs_full_refetch(plan: FetchPlan, series: dict) -> str | None:
+    """
+    Inspects a compact payload and returns the reason a full fetch is
+    required, or None if the compact bars are sufficient.
+
+    A split after the high-water mark rescales every earlier adjusted
+    close by its ratio, so the whole kept history is restated.
+    """
+    high_water = (plan.start_date - timedelta(days=1)).isoformat()
+
+    if series and min(series) > high_water:
+        return "gap"
+
+    for _, bar in _bars_after(series, high_water):
+        if float(bar.get(SPLIT_FIELD, 1.0)) != 1.0:
+            return "split"
+
+    return None
+
+
+def dividend_restatement(plan: FetchPlan, series: dict) -> FetchPlan | None:
+    """
+    A dividend after the high-water mark moves the adjusted closes before
+    it by (1 - dividend / close), typically well under 1%. Rather than a
+    full refetch of every payer each quarter, the bars the compact payload
+    already carries (freshly adjusted) are re-emitted; older bars keep
+    their previous adjustment until a split or a backfill restates them.
+    """
+    high_water = (plan.start_date - timedelta(days=1)).isoformat()
+
+    for _, bar in _bars_after(series, high_water):
+        if float(bar.get(DIVIDEND_FIELD, 0.0)) != 0.0:
+            return replace(plan, start_date=date.fromisoformat(min(series)), reason="dividend")
+
+    return None
+
+
+def escalate(plan: FetchPlan, reason: str, history_start: date) -> FetchPlan:
+    """Turns a compact plan into a full one after inspecting its payload."""
+    if reason == "split":
+        # adjusted closes changed everywhere: re-emit the kept history
+        return replace(plan, outputsize="full", start_date=history_start, reason=reason)
+    return replace(plan, outputsize="full", reason=reason)
@@ -0,0 +1,695 @@
+import io
+import re
+import json
+import hashlib
+import logging
+import pandas as pd
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+from botocore.exceptions import BotoCoreError, ClientError
+
+from price_parser import TIME_SERIES_FIELDS
+
+# -----------------------------------------------------------
+# STATE OBJECT LOCATIONS
+# -----------------------------------------------------------
+# Kept outside stock_prices/ so Snowpipe never picks them up.
+STATE_PREFIX = "_state/"
+MANIFEST_KEY = f"{STATE_PREFIX}stock_prices_manifest.json"
+REGISTRY_KEY = f"{STATE_PREFIX}ticker_registry.json"
+JOURNAL_PREFIX = f"{STATE_PREFIX}journal/"
+# calls spent per API key per UTC day, shared by every run on that key
+API_USAGE_KEY = f"{STATE_PREFIX}alphavantage_usage.json"
+# tickers whose bars are held back by validation, plus operator sign-offs
+QUARANTINE_LEDGER_KEY = f"{STATE_PREFIX}quarantine_ledger.json"
+
+# a ticker with no new bar for this long is considered delisted
+DELISTED_AFTER_DAYS = 30
+# the manifest keeps only this many most recent keys, so its startup GET
+# stays the same size; each window's journal lists all of its keys
+MANIFEST_RECENT_FILES = 200
+
+MISSING_KEY_CODES = ("NoSuchKey", "404")
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412")
+MAX_UPDATE_ATTEMPTS = 5
+
+# CSVs written before the columnar parser kept the AlphaVantage headers
+# ("4. close", ...); they are read under the current column names
+LEGACY_PRICE_HEADERS = {field: column for column, field, _ in TIME_SERIES_FIELDS}
+
+
+class StateConflict(Exception):
+    """Raised when a state object changed between our read and our write."""
+
+
+def iso_date(value) -> str:
+    """'YYYY-MM-DD' for a str, date, Timestamp or datetime64 value."""
+    return pd.Timestamp(value).date().isoformat()
+
+
+# -----------------------------------------------------------
+# GENERIC JSON STATE OBJECTS (ETAG-GUARDED)
+# -----------------------------------------------------------
+def read_json_state(s3_client, bucket, key):
+    """
+    Returns (payload, etag) for a JSON state object, or (None, None)
+    if it does not exist yet. Costs exactly one GET.
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in MISSING_KEY_CODES:
+            return None, None
+        raise
+
+    return json.loads(response["Body"].read()), response["ETag"]
+
+
+def write_json_state(s3_client, bucket, key, payload, etag=None):
+    """
+    Conditional PUT: only succeeds if the object is still at `etag`
+    (or still absent when `etag` is None). Returns the new ETag.
+    """
+    condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+
+    try:
+        response = s3_client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=json.dumps(payload, indent=1, sort_keys=True).encode("utf-8"),
+            ContentType="application/json",
+            **condition,
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in CONFLICT_CODES:
+            raise StateConflict(f"s3://{bucket}/{key} changed concurrently")
+        raise
+
+    return response["ETag"]
+
+
+def update_json_state(s3_client, bucket, key, mutate):
+    """
+    Atomic read-modify-write. `mutate(payload_or_None)` returns the new
+    payload; it is re-applied on a fresh read if another writer won.
+    """
+    for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+        payload, etag = read_json_state(s3_client, bucket, key)
+        new_payload = mutate(payload)
+        try:
+            write_json_state(s3_client, bucket, key, new_payload, etag)
+            return new_payload
+        except StateConflict:
+            logging.warning(
+                f"🔁 {key} changed underneath us — retrying ({attempt})"
+            )
+
+    raise StateConflict(f"Gave up updating s3://{bucket}/{key}")
+
+
+# -----------------------------------------------------------
+# ALPHAVANTAGE DAILY CALL LEDGER
+# -----------------------------------------------------------
+def _api_key_id(api_key) -> str:
+    # the key itself never lands in the bucket
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:12]
+
+
+def _utc_today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def load_api_calls_today(s3_client, bucket, api_key) -> int:
+    """Calls already spent today (UTC) on this key by earlier runs."""
+    payload, _ = read_json_state(s3_client, bucket, API_USAGE_KEY)
+    entry = (payload or {}).get(_api_key_id(api_key), {})
+    return entry.get("calls", 0) if entry.get("date") == _utc_today() else 0
+
+
+def record_api_calls(s3_client, bucket, api_key, calls):
+    """
+    Adds this run's calls to today's count for the key. Best effort:
+    callers run it in a `finally`, so a failed write is logged rather
+    than raised over the run's own exception.
+    """
+    if not calls:
+        return
+
+    key_id, today = _api_key_id(api_key), _utc_today()
+
+    def add(payload):
+        payload = payload or {}
+        entry = payload.get(key_id, {})
+        spent = entry.get("calls", 0) if entry.get("date") == today else 0
+        payload[key_id] = {"date": today, "calls": spent + calls}
+        return payload
+
+    try:
+        update_json_state(s3_client, bucket, API_USAGE_KEY, add)
+    except (BotoCoreError, ClientError, StateConflict) as exc:
+        logging.error(f"💥 Could not record {calls} API calls in {API_USAGE_KEY}: {exc}")
+
+
+# -----------------------------------------------------------
+# PRICE WATERMARK MANIFEST
+# -----------------------------------------------------------
+@dataclass
+class Manifest:
+    last_loaded_date: date | None = None
+    ticker_high_water: dict[str, str] = field(default_factory=dict)
+    files: list[str] = field(default_factory=list)
+    updated_at: str | None = None
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "Manifest":
+        last = payload.get("last_loaded_date")
+        return cls(
+            last_loaded_date=date.fromisoformat(last) if last else None,
+            ticker_high_water=dict(payload.get("ticker_high_water", {})),
+            files=list(payload.get("files", [])),
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "last_loaded_date": (
+                self.last_loaded_date.isoformat()
+                if self.last_loaded_date else None
+            ),
+            "ticker_high_water": self.ticker_high_water,
+            "files": self.files,
+            "updated_at": self.updated_at,
+        }
+
+    def record_load(self, loaded_date: date | None, s3_keys, ticker_dates: dict):
+        """
+        Folds one successful upload into the manifest. `ticker_dates`
+        maps ticker -> latest trading date contained in the upload.
+        Pass loaded_date=None to advance only the per-ticker marks.
+        """
+        if loaded_date and (
+            not self.last_loaded_date or loaded_date > self.last_loaded_date
+        ):
+            self.last_loaded_date = loaded_date
+
+        for ticker, trading_date in ticker_dates.items():
+            trading_date = iso_date(trading_date)
+            if trading_date > self.ticker_high_water.get(ticker, ""):
+                self.ticker_high_water[ticker] = trading_date
+
+        known = set(self.files)
+        self.files.extend(key for key in s3_keys if key not in known)
+        del self.files[:-MANIFEST_RECENT_FILES]
+
+        self.updated_at = datetime.utcnow().isoformat()
+
+
+def load_manifest(s3_client, bucket) -> Manifest | None:
+    payload, _ = read_json_state(s3_client, bucket, MANIFEST_KEY)
+    return Manifest.from_dict(payload) if payload is not None else None
+
+
+def update_manifest(s3_client, bucket, apply) -> Manifest:
+    """Atomically applies `apply(manifest)` to the stored manifest."""
+
+    def mutate(payload):
+        manifest = Manifest.from_dict(payload or {})
+        apply(manifest)
+        return manifest.to_dict()
+
+    return Manifest.from_dict(
+        update_json_state(s3_client, bucket, MANIFEST_KEY, mutate)
+    )
+
+
+def _list_keys(s3_client, bucket, prefixes):
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+
+def rebuild_manifest_from_listing(s3_client, bucket, prefixes, date_regex) -> Manifest:
+    """
+    Repair path: reconstructs the manifest from a full listing of every
+    prefix in `prefixes`. Per-ticker high-water marks are not recoverable
+    from key names alone and are left empty.
+    """
+    manifest = Manifest()
+    listed = []
+
+    for key in _list_keys(s3_client, bucket, prefixes):
+        match = date_regex.search(key)
+        if match:
+            loaded = date.fromisoformat(match.group(1))
+            if not manifest.last_loaded_date or loaded > manifest.last_loaded_date:
+                manifest.last_loaded_date = loaded
+            listed.append(key)
+
+    manifest.files = sorted(listed)[-MANIFEST_RECENT_FILES:]
+    manifest.updated_at = datetime.utcnow().isoformat()
+
+    def replace(_payload):
+        return manifest.to_dict()
+
+    update_json_state(s3_client, bucket, MANIFEST_KEY, replace)
+    logging.info(
+        f"🛠️ Rebuilt manifest from {len(listed)} listed objects"
+    )
+    return manifest
+
+
+# -----------------------------------------------------------
+# RESUMABLE PROGRESS JOURNAL
+# -----------------------------------------------------------
+@dataclass
+class ProgressJournal:
+    """
+    Durable record of one ingest window: which tickers already have their
+    rows in S3 (and in which batch file), and which failed and why.
+
+    In sharded runs each shard keeps its own journal, which doubles as the
+    shard manifest: `batch_stats` carries what the merge step folds into
+    the shared manifest/registry, `merged_batches` how much it already has.
+    """
+
+    start_date: str
+    end_date: str
+    completed: dict[str, str] = field(default_factory=dict)
+    failed: dict[str, str] = field(default_factory=dict)
+    batches: list[list[str]] = field(default_factory=list)
+    batch_stats: list[dict] = field(default_factory=list)
+    merged_batches: int = 0
+    finished_at: str | None = None
+    updated_at: str | None = None
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "ProgressJournal":
+        return cls(**payload)
+
+    def to_dict(self) -> dict:
+        return vars(self).copy()
+
+    def record_batch(self, tickers, s3_keys, ticker_stats=None):
+        """`ticker_stats`: ticker -> (first_date, last_date, row_count)."""
+        for ticker in tickers:
+            self.completed[ticker] = s3_keys[0] if s3_keys else ""
+            self.failed.pop(ticker, None)
+        self.batches.append(list(s3_keys))
+        self.batch_stats.append({
+            ticker: [iso_date(first), iso_date(last), int(count)]
+            for ticker, (first, last, count) in (ticker_stats or {}).items()
+        })
+        self.updated_at = datetime.utcnow().isoformat()
+
+    def record_failures(self, failures: dict):
+        for ticker, error in failures.items():
+            if ticker not in self.completed:
+                self.failed[ticker] = error
+        self.updated_at = datetime.utcnow().isoformat()
+
+    def finish(self):
+        """Marks the end of a run over the window (complete or not)."""
+        self.finished_at = datetime.utcnow().isoformat()
+        self.updated_at = self.finished_at
+
+    def unmerged(self) -> tuple[list[str], dict]:
+        """
+        Keys and combined ticker stats of the batches not yet merged:
+        ticker -> (first_date, last_date, row_count).
+        """
+        keys, stats = [], {}
+        for batch_keys, batch_stats in zip(
+            self.batches[self.merged_batches:],
+            self.batch_stats[self.merged_batches:],
+        ):
+            keys.extend(batch_keys)
+            for ticker, (first, last, count) in batch_stats.items():
+                if ticker in stats:
+                    old_first, old_last, old_count = stats[ticker]
+                    first, last = min(first, old_first), max(last, old_last)
+                    count += old_count
+                stats[ticker] = (first, last, count)
+        return keys, stats
+
+
+def journal_key(start_date: date, end_date: date, shard: str | None = None) -> str:
+    suffix = f"_{shard}" if shard else ""
+    return f"{JOURNAL_PREFIX}{start_date}_{end_date}{suffix}.json"
+
+
+def load_journal(s3_client, bucket, start_date: date, end_date: date,
+                 shard: str | None = None) -> ProgressJournal:
+    payload, _ = read_json_state(
+        s3_client, bucket, journal_key(start_date, end_date, shard)
+    )
+    if payload is None:
+        return ProgressJournal(str(start_date), str(end_date))
+    return ProgressJournal.from_dict(payload)
+
+
+def find_journal_end_dates(s3_client, bucket, start_date: date, shard: str) -> list[date]:
+    """End dates of the shard journals opened for windows starting at `start_date`."""
+    pattern = re.compile(
+        rf"{re.escape(JOURNAL_PREFIX)}{start_date}_(\d{{4}}-\d{{2}}-\d{{2}})_{re.escape(shard)}\.json$"
+    )
+    ends = set()
+    for key in _list_keys(s3_client, bucket, (f"{JOURNAL_PREFIX}{start_date}_",)):
+        match = pattern.match(key)
+        if match:
+            ends.add(date.fromisoformat(match.group(1)))
+    return sorted(ends)
+
+
+def update_journal(s3_client, bucket, start_date: date, end_date: date, apply,
+                   shard: str | None = None) -> ProgressJournal:
+    """Atomically applies `apply(journal)` to the window's (shard's) journal."""
+
+    def mutate(payload):
+        journal = (
+            ProgressJournal.from_dict(payload)
+            if payload else ProgressJournal(str(start_date), str(end_date))
+        )
+        apply(journal)
+        return journal.to_dict()
+
+    return ProgressJournal.from_dict(
+        update_json_state(
+            s3_client, bucket, journal_key(start_date, end_date, shard), mutate
+        )
+    )
+
+
+# -----------------------------------------------------------
+# QUARANTINE LEDGER
+# -----------------------------------------------------------
+@dataclass
+class QuarantineEntry:
+    date: str  # earliest failing bar; the ticker's high-water mark stops before it
+    close: float | None
+    checks: list[str]
+    runs: int = 1  # distinct days the same bar failed the same way
+    first_seen: str = ""
+    last_seen: str = ""
+
+
+@dataclass
+class QuarantineLedger:
+    tickers: dict[str, QuarantineEntry] = field(default_factory=dict)
+    # maintained by hand: ticker -> bar date whose price jump is genuine
+    acknowledged: dict[str, str] = field(default_factory=dict)
+    updated_at: str | None = None
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "QuarantineLedger":
+        return cls(
+            tickers={
+                ticker: QuarantineEntry(**entry)
+                for ticker, entry in payload.get("tickers", {}).items()
+            },
+            acknowledged=dict(payload.get("acknowledged", {})),
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "tickers": {
+                ticker: vars(entry)
+                for ticker, entry in sorted(self.tickers.items())
+            },
+            "acknowledged": dict(sorted(self.acknowledged.items())),
+            "updated_at": self.updated_at,
+        }
+
+    def accepted_jumps(self, confirm_runs: int) -> dict[str, str]:
+        """
+        ticker -> bar date whose implausible_jump is waived: acknowledged
+        bars, plus bars held back with an unchanged close on at least
+        `confirm_runs` days (0 = only acknowledged ones).
+        """
+        accepted = dict(self.acknowledged)
+        for ticker, entry in self.tickers.items():
+            if confirm_runs and entry.runs >= confirm_runs and entry.checks == ["implausible_jump"]:
+                accepted.setdefault(ticker, entry.date)
+        return accepted
+
+    def record_run(self, flagged: dict, cleared, run_date: date):
+        """
+        `flagged` maps ticker -> (date, close, checks) of its earliest
+        failing bar in this run; `cleared` lists tickers that loaded
+        without failures. A bar failing again on a later day with the
+        same close counts one more run; a different bar starts over.
+        """
+        today = iso_date(run_date)
+
+        for ticker, (bar_date, close, checks) in flagged.items():
+            bar_date = iso_date(bar_date)
+            close = None if close is None or pd.isna(close) else float(close)
+            entry = self.tickers.get(ticker)
+
+            if entry is None or entry.date != bar_date or entry.close != close:
+                self.tickers[ticker] = QuarantineEntry(
+                    bar_date, close, sorted(checks), first_seen=today, last_seen=today
+                )
+                continue
+
+            entry.checks = sorted(checks)
+            if today > entry.last_seen:
+                entry.runs += 1
+                entry.last_seen = today
+
+        for ticker in cleared:
+            self.tickers.pop(ticker, None)
+
+        self.updated_at = datetime.utcnow().isoformat()
+
+
+def load_quarantine_ledger(s3_client, bucket) -> QuarantineLedger:
+    payload, _ = read_json_state(s3_client, bucket, QUARANTINE_LEDGER_KEY)
+    return QuarantineLedger.from_dict(payload or {})
+
+
+def update_quarantine_ledger(s3_client, bucket, apply) -> QuarantineLedger:
+    """Atomically applies `apply(ledger)` to the stored quarantine ledger."""
+
+    def mutate(payload):
+        ledger = QuarantineLedger.from_dict(payload or {})
+        apply(ledger)
+        return ledger.to_dict()
+
+    return QuarantineLedger.from_dict(
+        update_json_state(s3_client, bucket, QUARANTINE_LEDGER_KEY, mutate)
+    )
+
+
+# -----------------------------------------------------------
+# TICKER REGISTRY
+# -----------------------------------------------------------
+@dataclass
+class TickerEntry:
+    first_date: str
+    last_date: str
+    row_count: int = 0
+    status: str = "active"
+    # set when onboarded before any rows exist (dates stay "" until then)
+    added_date: str | None = None
+
+
+@dataclass
+class TickerRegistry:
+    tickers: dict[str, TickerEntry] = field(default_factory=dict)
+    updated_at: str | None = None
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "TickerRegistry":
+        return cls(
+            tickers={
+                ticker: TickerEntry(**entry)
+                for ticker, entry in payload.get("tickers", {}).items()
+            },
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "tickers": {
+                ticker: vars(entry)
+                for ticker, entry in sorted(self.tickers.items())
+            },
+            "updated_at": self.updated_at,
+        }
+
+    def active_tickers(self) -> list[str]:
+        return sorted(
+            ticker
+            for ticker, entry in self.tickers.items()
+            if entry.status == "active"
+        )
+
+    def record_rows(self, ticker_stats: dict):
+        """
+        `ticker_stats` maps ticker -> (first_date, last_date, row_count)
+        for the rows contained in one upload.
+        """
+        for ticker, (first, last, count) in ticker_stats.items():
+            first, last = iso_date(first), iso_date(last)
+            entry = self.tickers.get(ticker)
+
+            if entry is None:
+                self.tickers[ticker] = TickerEntry(first, last, int(count))
+                continue
+
+            entry.first_date = min(entry.first_date, first) if entry.first_date else first
+            entry.last_date = max(entry.last_date, last)
+            entry.row_count += int(count)
+            entry.status = "active"
+
+        self.updated_at = datetime.utcnow().isoformat()
+
+    def covered(self) -> dict[str, tuple[str, str]]:
+        """ticker -> (first_date, last_date) whose rows are already counted."""
+        return {
+            ticker: (entry.first_date, entry.last_date)
+            for ticker, entry in self.tickers.items()
+            if entry.last_date
+        }
+
+    def onboard(self, tickers, as_of: date) -> list[str]:
+        """
+        Activates tickers that are unknown or delisted. New ones get empty
+        dates, so the fetch planner gives them a full-history fetch; known
+        ones resume from their last bar. Returns the tickers changed.
+        """
+        onboarded = []
+
+        for ticker in tickers:
+            entry = self.tickers.get(ticker)
+            if entry is not None and entry.status == "active":
+                continue
+
+            if entry is None:
+                self.tickers[ticker] = TickerEntry("", "", added_date=iso_date(as_of))
+            else:
+                entry.status = "active"
+                entry.added_date = iso_date(as_of)
+            onboarded.append(ticker)
+
+        if onboarded:
+            self.updated_at = datetime.utcnow().isoformat()
+        return onboarded
+
+    def mark_stale_as_delisted(self, as_of: date):
+        cutoff = (as_of - timedelta(days=DELISTED_AFTER_DAYS)).isoformat()
+
+        for ticker, entry in self.tickers.items():
+            # a freshly onboarded ticker gets the same grace period
+            last_seen = max(entry.last_date, entry.added_date or "")
+            if entry.status == "active" and last_seen < cutoff:
+                entry.status = "delisted"
+                logging.info(f"🪦 {ticker} marked delisted (last bar {entry.last_date or 'none'})")
+
+
+def load_registry(s3_client, bucket) -> TickerRegistry | None:
+    payload, _ = read_json_state(s3_client, bucket, REGISTRY_KEY)
+    return TickerRegistry.from_dict(payload) if payload is not None else None
+
+
+def update_registry(s3_client, bucket, apply) -> TickerRegistry:
+    """Atomically applies `apply(registry)` to the stored registry."""
+
+    def mutate(payload):
+        registry = TickerRegistry.from_dict(payload or {})
+        apply(registry)
+        return registry.to_dict()
+
+    return TickerRegistry.from_dict(
+        update_json_state(s3_client, bucket, REGISTRY_KEY, mutate)
+    )
+
+
+def ticker_stats_from_frame(df, known=None) -> dict:
+    """
+    ticker -> (first_date, last_date, row_count) for a price DataFrame.
+    `known` maps ticker -> (first_date, last_date) already counted (see
+    TickerRegistry.covered); re-sent bars inside that range do not count.
+    """
+    grouped = df.groupby("ticker", observed=True)["date"].agg(["min", "max", "size"])
+    stats = {
+        ticker: (row["min"], row["max"], row["size"])
+        for ticker, row in grouped.iterrows()
+    }
+
+    for ticker, (first, last, count) in stats.items():
+        covered_first, covered_last = (known or {}).get(ticker, ("", ""))
+        if not covered_last or first > pd.Timestamp(covered_last):
+            continue
+
+        dates = df.loc[df["ticker"] == ticker, "date"]
+        outside = (dates < pd.Timestamp(covered_first)) | (dates > pd.Timestamp(covered_last))
+        stats[ticker] = (first, last, int(outside.sum()))
+
+    return stats
+
+
+def _read_price_columns(s3_client, bucket, key, columns):
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+
+    if key.endswith(".parquet"):
+        return pd.read_parquet(io.BytesIO(body.read()), columns=list(columns))
+
+    df = pd.read_csv(body, usecols=lambda c: LEGACY_PRICE_HEADERS.get(c, c) in columns)
+    df = df.rename(columns=LEGACY_PRICE_HEADERS)
+
+    missing = set(columns) - set(df.columns)
+    if missing:
+        raise ValueError(
+            f"s3://{bucket}/{key} has no {', '.join(sorted(missing))} column(s)"
+        )
+    return df
+
+
+def read_price_objects(s3_client, bucket, keys, columns):
+    """
+    Yields `columns` of each listed CSV/Parquet price file. Legacy CSV
+    headers are mapped to the current names; a file still missing one
+    of `columns` raises instead of silently dropping its rows.
+    """
+    for key in keys:
+        if not key.endswith((".csv", ".parquet")):
+            continue
+
+        yield _read_price_columns(s3_client, bucket, key, columns)
+
+
+def read_price_files(s3_client, bucket, prefixes, columns, exclude=()):
+    """
+    Yields `columns` of every CSV and Parquet price file under `prefixes`
+    except the `exclude` keys (see read_price_objects). Repair paths only.
+    """
+    keys = (
+        key for key in _list_keys(s3_client, bucket, prefixes)
+        if key not in exclude
+    )
+    yield from read_price_objects(s3_client, bucket, keys, columns)
+
+
+def rebuild_registry_from_files(s3_client, bucket, prefixes, as_of: date) -> TickerRegistry:
+    """
+    Repair path: reads the date/ticker columns of every CSV and Parquet
+    file under `prefixes` so the rebuilt universe is complete, not sampled.
+    """
+    registry = TickerRegistry()
+
+    for df in read_price_files(s3_client, bucket, prefixes, ("date", "ticker")):
+        df["ticker"] = df["ticker"].astype(str)
+        registry.record_rows(ticker_stats_from_frame(df.dropna()))
+
+    registry.mark_stale_as_delisted(as_of)
+
+    def replace(_payload):
+        return registry.to_dict()
+
+    update_json_state(s3_client, bucket, REGISTRY_KEY, replace)
+    logging.info(f"🛠️ Rebuilt registry with {len(registry.tickers)} tickers")
+    return registry
@@ -0,0 +1,257 @@
+import io
+import zlib
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional; CSV needs none of this
+    pa = pc = pq = None
+
+# -----------------------------------------------------------
+# WRITER SETTINGS
+# -----------------------------------------------------------
+MULTIPART_PART_BYTES = 8 * 1024 * 1024  # S3 minimum is 5 MiB (except last part)
+CSV_CHUNK_ROWS = 100_000
+PARQUET_COMPRESSION = "zstd"
+PARQUET_TARGET_FILE_MB = 128
+PARQUET_ROW_GROUP_ROWS = 250_000
+# batches spanning more trading dates than this (full-history refetches,
+# backfills) are written under history/ instead of one file per date
+PARQUET_MAX_DATE_PARTITIONS = 10
+# rough on-disk / in-memory ratio for zstd-compressed OHLCV columns
+PARQUET_COMPRESSION_RATIO = 0.3
+
+
+# -----------------------------------------------------------
+# STREAMING MULTIPART UPLOAD (NO LOCAL TEMP FILE)
+# -----------------------------------------------------------
+class S3MultipartStream(io.RawIOBase):
+    """
+    Write-only file object that uploads to S3 as it is written: every
+    MULTIPART_PART_BYTES of buffered data becomes one multipart part.
+    The multipart upload is only opened once the first part fills, so a
+    body smaller than one part goes out as a single put_object.
+    close() completes the upload; abort() discards it.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_bytes=MULTIPART_PART_BYTES,
+                 content_type="application/octet-stream"):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_bytes = part_bytes
+        self.content_type = content_type
+        self.bytes_written = 0
+
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = None
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.bytes_written
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+
+        while len(self._buffer) >= self.part_bytes:
+            self._upload_part(bytes(self._buffer[: self.part_bytes]))
+            del self._buffer[: self.part_bytes]
+
+        return len(data)
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )["UploadId"]
+
+        number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self._buffer),
+                    ContentType=self.content_type,
+                )
+                self._buffer.clear()
+                return
+
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            super().close()
+
+    def abort(self):
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        self._buffer.clear()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and not self.closed:
+            self.abort()
+        else:
+            self.close()
+
+
+# -----------------------------------------------------------
+# STABLE TICKER HASHING
+# -----------------------------------------------------------
+def ticker_bucket(ticker: str, buckets: int) -> int:
+    """Stable (process-independent) hash bucket for a ticker."""
+    return zlib.crc32(ticker.encode("utf-8")) % buckets
+
+
+# -----------------------------------------------------------
+# STREAMED CSV OBJECT
+# -----------------------------------------------------------
+def write_csv_object(df, s3_client, bucket, key, metrics=None, chunk_rows=CSV_CHUNK_ROWS) -> str:
+    """
+    Streams `df` to s3://bucket/key as CSV through a multipart upload:
+    rows are encoded `chunk_rows` at a time, so neither a temp file nor
+    the whole CSV text is ever held.
+    """
+    with S3MultipartStream(s3_client, bucket, key, content_type="text/csv") as stream:
+        text = io.TextIOWrapper(io.BufferedWriter(stream), encoding="utf-8", newline="")
+        df.to_csv(text, index=False, chunksize=chunk_rows)
+        text.flush()
+        text.detach().detach()
+
+    if metrics is not None:
+        metrics.incr("s3_bytes_out", stream.bytes_written)
+    return key
+
+
+# -----------------------------------------------------------
+# PARTITIONED PARQUET WRITER
+# -----------------------------------------------------------
+def _price_table(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    index = table.schema.get_field_index("date")
+    return table.set_column(index, "date", pc.cast(table["date"], pa.date32()))
+
+
+def _write_parquet_files(table, s3_client, bucket, key_prefix, file_label,
+                        target_file_mb, compression, metrics) -> list[str]:
+    """Splits `table` into files of roughly `target_file_mb` and uploads them."""
+    est_row_bytes = max(1.0, table.nbytes / max(1, table.num_rows) * PARQUET_COMPRESSION_RATIO)
+    rows_per_file = max(1, int(target_file_mb * 1024 * 1024 / est_row_bytes))
+
+    keys = []
+    for file_number, offset in enumerate(range(0, table.num_rows, rows_per_file)):
+        key = f"{key_prefix}part-{file_label}-{file_number:03d}.parquet"
+
+        with S3MultipartStream(s3_client, bucket, key) as stream:
+            pq.write_table(
+                table.slice(offset, rows_per_file),
+                stream,
+                compression=compression,
+                row_group_size=PARQUET_ROW_GROUP_ROWS,
+            )
+
+        keys.append(key)
+        if metrics is not None:
+            metrics.incr("s3_bytes_out", stream.bytes_written)
+
+    return keys
+
+
+def write_parquet_partitions(
+    df,
+    s3_client,
+    bucket,
+    prefix,
+    file_label,
+    ticker_buckets=0,
+    target_file_mb=PARQUET_TARGET_FILE_MB,
+    compression=PARQUET_COMPRESSION,
+    max_date_partitions=PARQUET_MAX_DATE_PARTITIONS,
+    metrics=None,
+) -> list[str]:
+    """
+    Writes `df` as compressed Parquet under
+    <prefix>trading_date=YYYY-MM-DD/[bucket=NN/]part-<label>-<n>.parquet,
+    streaming every file to S3 from memory. A frame spanning more than
+    `max_date_partitions` trading dates (a full-history refetch or a
+    backfill) would shred into one tiny file per date, so it is written
+    instead as <prefix>history/[bucket=NN/]part-<label>-<n>.parquet,
+    coalesced into files of about `target_file_mb`. Re-running with the
+    same `file_label` overwrites the same keys. Returns the keys
+    written; bytes uploaded are counted on `metrics` when given.
+    """
+    if pq is None:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    group_columns = []
+    if df["date"].nunique() <= max_date_partitions:
+        group_columns.append("date")
+    if ticker_buckets:
+        df = df.assign(
+            bucket=df["ticker"].astype(str).map(
+                lambda t: ticker_bucket(t, ticker_buckets)
+            )
+        )
+        group_columns.append("bucket")
+
+    if not group_columns:
+        table = _price_table(df.sort_values(["ticker", "date"]))
+        keys = _write_parquet_files(
+            table, s3_client, bucket, f"{prefix}history/", file_label,
+            target_file_mb, compression, metrics,
+        )
+        logging.info(f"🧱 Wrote {len(keys)} Parquet file(s) under s3://{bucket}/{prefix}history/")
+        return keys
+
+    keys = []
+    for group, part in df.groupby(group_columns, observed=True, sort=True):
+        group = dict(zip(group_columns, group if isinstance(group, tuple) else (group,)))
+        if "date" in group:
+            partition = f"{prefix}trading_date={group['date']:%Y-%m-%d}/"
+        else:
+            partition = f"{prefix}history/"
+        if ticker_buckets:
+            partition += f"bucket={group['bucket']:02d}/"
+            part = part.drop(columns="bucket")
+
+        table = _price_table(part.sort_values(["ticker", "date"]))
+        keys += _write_parquet_files(
+            table, s3_client, bucket, partition, file_label,
+            target_file_mb, compression, metrics,
+        )
+
+    logging.info(f"🧱 Wrote {len(keys)} Parquet file(s) under s3://{bucket}/{prefix}")
+    return keys
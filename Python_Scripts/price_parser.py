@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# TIME SERIES FIELD LAYOUT
+# -----------------------------------------------------------
+# (output column, AlphaVantage field, dtype) in the order Snowpipe
+# expects the CSV columns: date, OHLC, adjusted close, volume,
+# dividend amount, split coefficient, ticker.
+PRICE_DTYPE = np.float64
+
+TIME_SERIES_FIELDS = [
+    ("open", "1. open", None),
+    ("high", "2. high", None),
+    ("low", "3. low", None),
+    ("close", "4. close", None),
+    ("adjusted_close", "5. adjusted close", None),
+    ("volume", "6. volume", np.int64),
+    ("dividend_amount", "7. dividend amount", None),
+    ("split_coefficient", "8. split coefficient", None),
+]
+
+OUTPUT_COLUMNS = (
+    ["date"] + [column for column, _, _ in TIME_SERIES_FIELDS] + ["ticker"]
+)
+
+
+# -----------------------------------------------------------
+# COLUMNAR PARSE
+# -----------------------------------------------------------
+def parse_time_series(
+    series: dict,
+    ticker: str,
+    start_date,
+    end_date,
+    ticker_dtype: pd.CategoricalDtype | None = None,
+    price_dtype=PRICE_DTYPE,
+) -> pd.DataFrame:
+    """
+    Converts a decoded "Time Series (Daily)" mapping into a typed frame.
+
+    Dates are filtered on the raw ISO keys before any bar is touched, so
+    only the requested window is ever materialised. Each field is then
+    decoded straight into one contiguous typed array.
+    """
+    lo, hi = start_date.isoformat(), end_date.isoformat()
+    dates = sorted(d for d in series if lo <= d <= hi)
+    bars = [series[d] for d in dates]
+    n = len(bars)
+
+    columns = {"date": np.array(dates, dtype="datetime64[D]").astype("datetime64[ns]")}
+
+    for column, field, dtype in TIME_SERIES_FIELDS:
+        columns[column] = np.fromiter(
+            (bar[field] for bar in bars), dtype=dtype or price_dtype, count=n
+        )
+
+    if ticker_dtype is None:
+        ticker_dtype = pd.CategoricalDtype([ticker])
+
+    columns["ticker"] = pd.Categorical.from_codes(
+        np.full(n, ticker_dtype.categories.get_loc(ticker), dtype=np.int32),
+        dtype=ticker_dtype,
+    )
+
+    return pd.DataFrame(columns, columns=OUTPUT_COLUMNS)
+
+
+
+def close_before(series: dict, before_date) -> float | None:
+    """Close of the latest bar dated before `before_date`, if the payload has one."""
+    cutoff = before_date.isoformat()
+    earlier = [d for d in series if d < cutoff]
+    return float(series[max(earlier)]["4. close"]) if earlier else None
@@ -0,0 +1,167 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+
+# -----------------------------------------------------------
+# CACHE SETTINGS (OVERRIDABLE VIA ENV)
+# -----------------------------------------------------------
+AV_CACHE_DIR = os.getenv(
+    "AV_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "alphavantage")
+)
+AV_CACHE_MAX_MB = int(os.getenv("AV_CACHE_MAX_MB", "512"))
+# "on" (read + write), "off" (bypass), "only" (offline: never call the API)
+AV_CACHE_MODE = os.getenv("AV_CACHE_MODE", "on").lower()
+
+# function -> (ttl seconds, whether the key includes the calendar day)
+CACHE_POLICIES = {
+    "OVERVIEW": (7 * 24 * 3600, False),
+    "TIME_SERIES_DAILY_ADJUSTED": (18 * 3600, True),
+}
+DEFAULT_POLICY = (3600, True)
+EVICT_TO_FRACTION = 0.9
+
+
+class CacheMiss(Exception):
+    """Raised in cache-only mode when a response is not cached."""
+
+
+# -----------------------------------------------------------
+# CONTENT-ADDRESSED RESPONSE CACHE
+# -----------------------------------------------------------
+class ResponseCache:
+    """
+    On-disk cache of raw AlphaVantage JSON responses.
+
+    Entries are gzip-compressed and addressed by a hash of
+    function/symbol/outputsize(/day). Freshness is judged from the
+    file's mtime against the function's TTL; recency of use is kept in
+    atime so eviction can drop the least recently used files first.
+    """
+
+    def __init__(self, directory=AV_CACHE_DIR, max_mb=AV_CACHE_MAX_MB, mode=AV_CACHE_MODE):
+        if mode not in ("on", "off", "only"):
+            raise ValueError(f"AV_CACHE_MODE must be on/off/only, got {mode!r}")
+
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    # -------------------------------------------------------
+    # keys + paths
+    # -------------------------------------------------------
+    @staticmethod
+    def cache_key(params: dict) -> str:
+        function = params.get("function", "")
+        _, by_day = CACHE_POLICIES.get(function, DEFAULT_POLICY)
+        parts = {
+            "function": function,
+            "symbol": params.get("symbol", ""),
+            "outputsize": params.get("outputsize", ""),
+        }
+        if by_day:
+            parts["day"] = datetime.utcnow().date().isoformat()
+
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    # -------------------------------------------------------
+    # read / write
+    # -------------------------------------------------------
+    def get(self, params: dict) -> bytes | None:
+        """Returns the cached response body, or None (CacheMiss in 'only' mode)."""
+        if self.mode == "off":
+            return None
+
+        path = self._path(self.cache_key(params))
+        ttl, _ = CACHE_POLICIES.get(params.get("function", ""), DEFAULT_POLICY)
+
+        try:
+            stat = os.stat(path)
+            fresh = time.time() - stat.st_mtime <= ttl
+            if fresh:
+                with open(path, "rb") as fh:
+                    body = gzip.decompress(fh.read())
+                # bump atime for LRU, keep mtime for TTL
+                os.utime(path, (time.time(), stat.st_mtime))
+                self.hits += 1
+                return body
+        except (OSError, EOFError):
+            pass
+
+        self.misses += 1
+        if self.mode == "only":
+            raise CacheMiss(
+                f"{params.get('function')}:{params.get('symbol', '')} not cached"
+            )
+        return None
+
+    def put(self, params: dict, body: bytes):
+        if self.mode != "on":
+            return
+
+        path = self._path(self.cache_key(params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size_before = self._current_size()
+
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        body = gzip.compress(body)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(body)
+        os.replace(tmp_path, path)
+
+        self._size = size_before - replaced + len(body)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    # -------------------------------------------------------
+    # LRU eviction
+    # -------------------------------------------------------
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        yield path, os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(stat.st_size for _, stat in self._entries())
+        return self._size
+
+    def _evict(self):
+        target = self.max_bytes * EVICT_TO_FRACTION
+        entries = sorted(self._entries(), key=lambda item: item[1].st_atime)
+        size = sum(stat.st_size for _, stat in entries)
+        evicted = 0
+
+        for path, stat in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+            evicted += 1
+
+        self._size = size
+        logging.info(f"🧹 Evicted {evicted} cached responses (LRU)")
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+
+from ingest_state import STATE_PREFIX
+
+# -----------------------------------------------------------
+# RUN REPORT SETTINGS (OVERRIDABLE VIA ENV)
+# -----------------------------------------------------------
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "/tmp/run_reports")
+# set to 0 to keep run reports local only
+RUN_REPORT_S3 = os.getenv("RUN_REPORT_S3", "1") == "1"
+# node_exporter textfile-collector directory; unset = no .prom file
+PROMETHEUS_TEXTFILE_DIR = os.getenv("PROMETHEUS_TEXTFILE_DIR")
+
+RUN_REPORT_PREFIX = f"{STATE_PREFIX}run_reports/"
+METRIC_PREFIX = "ingest"
+
+# seconds; covers a cache hit up to a throttled-and-retried full history
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+REPORTED_QUANTILES = (0.5, 0.9, 0.99)
+
+
+# -----------------------------------------------------------
+# HISTOGRAM
+# -----------------------------------------------------------
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus layout). Raw samples are kept
+    as well so the JSON report can carry exact quantiles; a run observes
+    at most a few thousand values per histogram.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.samples = []
+
+    def observe(self, value: float):
+        bisect.insort(self.samples, value)
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    @property
+    def sum(self) -> float:
+        return sum(self.samples)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        return self.samples[min(len(self.samples) - 1, int(q * len(self.samples)))]
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        counts = [
+            (str(bound), bisect.bisect_right(self.samples, bound))
+            for bound in self.buckets
+        ]
+        return counts + [("+Inf", self.count)]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.samples[0] if self.samples else None,
+            "max": self.samples[-1] if self.samples else None,
+            **{f"p{int(q * 100)}": self.quantile(q) for q in REPORTED_QUANTILES},
+            "buckets": dict(self.cumulative_counts()),
+        }
+
+
+# -----------------------------------------------------------
+# PER-RUN METRICS
+# -----------------------------------------------------------
+class RunMetrics:
+    """
+    Metrics for one ingest run:
+
+    - stage timers: wall time + call count per named stage
+    - counters: API calls, throttles, retries, bytes in/out, rows, ...
+    - histograms: per-ticker / per-request latencies
+
+    `publish()` writes a JSON run report (locally and to S3) and, when
+    PROMETHEUS_TEXTFILE_DIR is set, a Prometheus textfile. Recording is
+    thread-safe: batches are written from a worker thread while the event
+    loop keeps fetching. `shard` (e.g. s01of04) tags the report keys, the
+    textfile name and every series, so concurrent shards of one job never
+    overwrite each other.
+    """
+
+    def __init__(self, job: str, shard: str | None = None):
+        self.job = job
+        self.shard = shard
+        self.started_at = datetime.utcnow()
+        self.run_id = self.started_at.strftime("%Y%m%dT%H%M%S")
+        self.status = "running"
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.counters = defaultdict(float)
+        self.histograms = defaultdict(Histogram)
+        self.context = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------
+    # recording
+    # -------------------------------------------------------
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times a block. Repeated (non-overlapping) blocks with the same
+        name accumulate, e.g. one "upload" stage per batch.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stage_seconds[name] += elapsed
+                self.stage_calls[name] += 1
+
+    def incr(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def set_context(self, **values):
+        """Run-level facts (date window, ticker count, ...) for the report."""
+        self.context.update(values)
+
+    # -------------------------------------------------------
+    # reporting
+    # -------------------------------------------------------
+    @property
+    def _shard_suffix(self) -> str:
+        return f"_{self.shard}" if self.shard else ""
+
+    @property
+    def wall_seconds(self) -> float:
+        return time.perf_counter() - self._started
+
+    def to_dict(self) -> dict:
+        return {
+            "job": self.job,
+            "run_id": self.run_id,
+            "shard": self.shard,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "context": self.context,
+            "stages": {
+                name: {
+                    "seconds": round(self.stage_seconds[name], 6),
+                    "calls": self.stage_calls[name],
+                }
+                for name in self.stage_seconds
+            },
+            "counters": {
+                name: int(value) if float(value).is_integer() else value
+                for name, value in sorted(self.counters.items())
+            },
+            "histograms": {
+                name: histogram.to_dict()
+                for name, histogram in sorted(self.histograms.items())
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        job = f'job="{self.job}"'
+        if self.shard:
+            job += f',shard="{self.shard}"'
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds{{{job}}} {time.time():.0f}",
+            f"# TYPE {METRIC_PREFIX}_last_run_success gauge",
+            f"{METRIC_PREFIX}_last_run_success{{{job}}} {int(self.status == 'success')}",
+            f"# TYPE {METRIC_PREFIX}_run_wall_seconds gauge",
+            f"{METRIC_PREFIX}_run_wall_seconds{{{job}}} {self.wall_seconds:.6f}",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds gauge",
+        ]
+        for name, seconds in self.stage_seconds.items():
+            lines.append(
+                f'{METRIC_PREFIX}_stage_seconds{{{job},stage="{name}"}} {seconds:.6f}'
+            )
+
+        for name, value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric}{{{job}}} {value:.15g}"]
+
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram.cumulative_counts():
+                lines.append(f'{metric}_bucket{{{job},le="{bound}"}} {count}')
+            lines += [
+                f"{metric}_sum{{{job}}} {histogram.sum:.6f}",
+                f"{metric}_count{{{job}}} {histogram.count}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self):
+        stages = ", ".join(
+            f"{name} {seconds:.1f}s" for name, seconds in self.stage_seconds.items()
+        )
+        logging.info(f"⏱️ {self.job} {self.status} in {self.wall_seconds:.1f}s — {stages}")
+
+    def publish(self, s3_client=None, bucket=None, status="success") -> dict:
+        """
+        Finalises the run and writes its report. Never raises: a failed
+        metrics upload must not fail the ingest run it describes.
+        """
+        self.status = status
+        report = self.to_dict()
+        body = json.dumps(report, indent=2, default=str)
+        self.log_summary()
+
+        try:
+            os.makedirs(RUN_REPORT_DIR, exist_ok=True)
+            path = os.path.join(RUN_REPORT_DIR, f"{self.job}_{self.run_id}{self._shard_suffix}.json")
+            with open(path, "w") as fh:
+                fh.write(body)
+            logging.info(f"📊 Run report → {path}")
+
+            if RUN_REPORT_S3 and s3_client is not None and bucket:
+                key = (
+                    f"{RUN_REPORT_PREFIX}{self.job}/"
+                    f"{self.started_at:%Y-%m-%d}/{self.run_id}{self._shard_suffix}.json"
+                )
+                s3_client.put_object(
+                    Bucket=bucket,
+                    Key=key,
+                    Body=body.encode("utf-8"),
+                    ContentType="application/json",
+                )
+                logging.info(f"📊 Run report → s3://{bucket}/{key}")
+
+            if PROMETHEUS_TEXTFILE_DIR:
+                self.write_prometheus_textfile(PROMETHEUS_TEXTFILE_DIR)
+        except Exception as exc:
+            logging.warning(f"⚠️ Could not publish run report: {exc}")
+
+        return report
+
+    def write_prometheus_textfile(self, directory):
+        # write-then-rename so the collector never reads a partial file
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{METRIC_PREFIX}_{self.job}{self._shard_suffix}.prom")
+        with open(f"{path}.tmp", "w") as fh:
+            fh.write(self.to_prometheus())
+        os.replace(f"{path}.tmp", path)
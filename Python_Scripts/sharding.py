@@ -0,0 +1,55 @@
+import os
+from dataclasses import dataclass
+
+from output_writers import ticker_bucket
+
+
+# -----------------------------------------------------------
+# DETERMINISTIC TICKER SHARDS
+# -----------------------------------------------------------
+@dataclass(frozen=True)
+class Shard:
+    """
+    One worker's slice of the ticker universe. A ticker belongs to shard
+    crc32(ticker) % count, so every worker agrees on the split without
+    coordinating and a ticker stays on the same shard from run to run.
+    count=1 is the unsharded run.
+    """
+
+    index: int = 0
+    count: int = 1
+
+    def __post_init__(self):
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(
+                f"Invalid shard {self.index} of {self.count}: "
+                "need SHARD_COUNT >= 1 and 0 <= SHARD_INDEX < SHARD_COUNT"
+            )
+
+    @classmethod
+    def from_env(cls) -> "Shard":
+        return cls(
+            index=int(os.getenv("SHARD_INDEX", "0")),
+            count=int(os.getenv("SHARD_COUNT", "1")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    @property
+    def label(self) -> str | None:
+        """Tag for the shard's output keys and journal, e.g. s01of04."""
+        if not self.enabled:
+            return None
+        return f"s{self.index:02d}of{self.count:02d}"
+
+    def owns(self, ticker: str) -> bool:
+        return not self.enabled or ticker_bucket(ticker, self.count) == self.index
+
+    def select(self, tickers) -> list[str]:
+        return [ticker for ticker in tickers if self.owns(ticker)]
+
+    def siblings(self) -> list["Shard"]:
+        """Every shard of the same split, this one included."""
+        return [Shard(index, self.count) for index in range(self.count)]
@@ -0,0 +1,191 @@
+import os
+import json
+import logging
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# VALIDATION SETTINGS (OVERRIDABLE VIA ENV)
+# -----------------------------------------------------------
+# "quarantine" (default: failing rows are held back), "warn" (report
+# only, every row is uploaded) or "off"
+VALIDATION_MODE = os.getenv("VALIDATION_MODE", "quarantine").lower()
+# close-to-close ratio (either direction) treated as implausible unless
+# the bar carries a split; 1.9 catches unrecorded 2:1 splits and bad
+# prints while leaving room for real crashes and squeezes
+VALIDATION_MAX_JUMP_RATIO = float(os.getenv("VALIDATION_MAX_JUMP_RATIO", "1.9"))
+QUARANTINE_PREFIX = "quarantine/stock_prices/"
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "adjusted_close"]
+REQUIRED_COLUMNS = ["date", "ticker", *PRICE_COLUMNS, "volume"]
+# rule names, in report order
+RULES = ("null_field", "negative_value", "ohlc_inconsistent", "duplicate_key", "implausible_jump")
+
+
+# -----------------------------------------------------------
+# VECTORISED RULES
+# -----------------------------------------------------------
+def _is_jump(close, previous):
+    ratio = close / previous.where(previous > 0)
+    return (ratio > VALIDATION_MAX_JUMP_RATIO) | (ratio < 1 / VALIDATION_MAX_JUMP_RATIO)
+
+
+def _jump_without_split(df: pd.DataFrame, previous_closes=None, accepted_jumps=None) -> np.ndarray:
+    """
+    Per ticker, in date order: close moved beyond the ratio on a bar with
+    no split. `previous_closes` (ticker -> close of the bar before the
+    batch) seeds each ticker's first bar, so a daily one-bar batch is
+    checked too. The bar right after a one-bar spike is not flagged when
+    it is back in line with the bar before the spike. `accepted_jumps`
+    (ticker -> bar date, see QuarantineLedger.accepted_jumps) lists
+    moves known to be genuine; those bars are never flagged.
+    """
+    checked = df[["ticker", "date", "close", "split_coefficient"]].assign(
+        row=np.arange(len(df))
+    )
+    seeds = {
+        ticker: close
+        for ticker, close in (previous_closes or {}).items()
+        if close is not None
+    }
+    if seeds:
+        checked["ticker"] = checked["ticker"].astype(str)
+        seed_rows = pd.DataFrame({
+            "ticker": list(seeds),
+            "date": pd.Timestamp.min,
+            "close": list(seeds.values()),
+            "split_coefficient": 1.0,
+            "row": -1,
+        })
+        checked = pd.concat([seed_rows, checked], ignore_index=True)
+
+    ordered = checked.sort_values(["ticker", "date"], kind="stable")
+    by_ticker = ordered.groupby("ticker", observed=True)
+    close = ordered["close"]
+
+    split = ordered["split_coefficient"].fillna(1.0) != 1.0
+    jump = _is_jump(close, by_ticker["close"].shift(1)) & ~split
+
+    after_spike = jump.groupby(ordered["ticker"], observed=True).shift(1, fill_value=False)
+    back_in_line = ~_is_jump(close, by_ticker["close"].shift(2)) & by_ticker["close"].shift(2).notna()
+    jump &= ~(after_spike & back_in_line)
+
+    if accepted_jumps:
+        accepted_date = pd.to_datetime(ordered["ticker"].astype(str).map(accepted_jumps))
+        jump &= ~(ordered["date"] == accepted_date)
+
+    # seed rows only feed the comparisons
+    rows = ordered["row"].to_numpy()
+    in_batch = rows >= 0
+    result = np.zeros(len(df), dtype=bool)
+    result[rows[in_batch]] = jump.to_numpy()[in_batch]
+    return result
+
+
+def _after_first_failure(df: pd.DataFrame, failed: np.ndarray) -> np.ndarray:
+    """Rows dated after their ticker's earliest failing row."""
+    first_failed = df.loc[failed].groupby("ticker", observed=True)["date"].min()
+    cutoff = df["ticker"].map(first_failed)
+    return (df["date"] > cutoff).to_numpy()
+
+
+def rule_masks(df: pd.DataFrame, previous_closes=None, accepted_jumps=None) -> dict[str, np.ndarray]:
+    """rule -> boolean array (True = row fails), one column pass per rule."""
+    prices = df[PRICE_COLUMNS]
+    low, high = df["low"], df["high"]
+    body_low = np.minimum(df["open"], df["close"])
+    body_high = np.maximum(df["open"], df["close"])
+
+    return {
+        "null_field": df[REQUIRED_COLUMNS].isna().any(axis=1).to_numpy(),
+        "negative_value": ((prices < 0).any(axis=1) | (df["volume"] < 0)).to_numpy(),
+        "ohlc_inconsistent": ((low > body_low) | (high < body_high) | (low > high)).to_numpy(),
+        "duplicate_key": df.duplicated(["ticker", "date"], keep="first").to_numpy(),
+        "implausible_jump": _jump_without_split(df, previous_closes, accepted_jumps),
+    }
+
+
+# -----------------------------------------------------------
+# BATCH VALIDATION + REPORT
+# -----------------------------------------------------------
+@dataclass
+class ValidationReport:
+    rows_checked: int = 0
+    rows_failed: int = 0
+    rows_held_back: int = 0
+    failures: dict[str, int] = field(default_factory=dict)
+    tickers: dict[str, list[str]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return vars(self)
+
+
+def validate_batch(df: pd.DataFrame, mode=VALIDATION_MODE, previous_closes=None,
+                   accepted_jumps=None):
+    """
+    Checks one batch of parsed bars before it is uploaded. Returns
+    (rows to upload, failing rows with a `failed_checks` column, report).
+    In "warn" mode failing rows are reported but still uploaded.
+
+    In "quarantine" mode a ticker's bars after its first failing bar are
+    held back as well (not uploaded, not quarantined), so its high-water
+    mark stops before the bad date and the next run fetches it again.
+    `accepted_jumps` waives implausible_jump for the listed bars (see
+    QuarantineLedger), so a genuine move can be let through.
+    """
+    if mode not in ("quarantine", "warn", "off"):
+        raise ValueError(f"VALIDATION_MODE must be quarantine/warn/off, got {mode!r}")
+
+    report = ValidationReport(rows_checked=len(df))
+    if mode == "off" or df.empty:
+        return df, df.iloc[0:0], report
+
+    masks = rule_masks(df, previous_closes, accepted_jumps)
+    failed = np.logical_or.reduce(list(masks.values()))
+    report.rows_failed = int(failed.sum())
+
+    if not report.rows_failed:
+        return df, df.iloc[0:0], report
+
+    report.failures = {rule: int(mask.sum()) for rule, mask in masks.items() if mask.any()}
+
+    # label only the failing rows
+    bad = df[failed].copy()
+    bad["failed_checks"] = [
+        ";".join(rule for rule in RULES if masks[rule][i]) for i in np.flatnonzero(failed)
+    ]
+
+    for ticker, checks in bad.groupby("ticker", observed=True)["failed_checks"]:
+        report.tickers[str(ticker)] = sorted(set(";".join(checks).split(";")))
+
+    if mode == "warn":
+        return df, bad, report
+
+    held_back = _after_first_failure(df, failed) & ~failed
+    report.rows_held_back = int(held_back.sum())
+    return df[~failed & ~held_back], bad, report
+
+
+def write_quarantine(bad: pd.DataFrame, report: ValidationReport, s3_client, bucket,
+                     file_date, file_label, metrics=None) -> list[str]:
+    """Stores the failing rows and the batch report under QUARANTINE_PREFIX."""
+    rows_key = f"{QUARANTINE_PREFIX}{file_date}_stock_prices_{file_label}.csv"
+    report_key = f"{QUARANTINE_PREFIX}{file_date}_stock_prices_{file_label}_report.json"
+
+    rows_body = bad.to_csv(index=False).encode("utf-8")
+    report_body = json.dumps(report.to_dict(), indent=2).encode("utf-8")
+    s3_client.put_object(Bucket=bucket, Key=rows_key, Body=rows_body, ContentType="text/csv")
+    s3_client.put_object(
+        Bucket=bucket, Key=report_key, Body=report_body, ContentType="application/json"
+    )
+
+    if metrics is not None:
+        metrics.incr("s3_bytes_out", len(rows_body) + len(report_body))
+    held_back = f", {report.rows_held_back} later rows held back" if report.rows_held_back else ""
+    logging.warning(
+        f"🚧 {report.rows_failed}/{report.rows_checked} rows failed validation "
+        f"{report.failures}{held_back} → s3://{bucket}/{rows_key}"
+    )
+    return [rows_key, report_key]
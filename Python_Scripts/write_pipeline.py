@@ -0,0 +1,56 @@
+import asyncio
+
+# -----------------------------------------------------------
+# BOUNDED BACKGROUND WRITER
+# -----------------------------------------------------------
+_DONE = object()
+
+
+class BackgroundWriter:
+    """
+    Hands items from the event loop to `handle`, which runs in a worker
+    thread one item at a time (in order), so blocking uploads overlap with
+    the fetches still in flight.
+
+    At most `max_pending` items wait in the queue; `put()` blocks beyond
+    that, which is what caps memory when uploads fall behind. A failure in
+    `handle` is re-raised from the next `put()` or from `close()`.
+    """
+
+    def __init__(self, handle, max_pending: int):
+        self._handle = handle
+        self._queue = asyncio.Queue(maxsize=max(1, max_pending))
+        self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while True:
+            item = await self._queue.get()
+            if item is _DONE:
+                return
+            await asyncio.to_thread(self._handle, item)
+
+    async def put(self, item):
+        if self._task.done():
+            self._task.result()
+            raise RuntimeError("BackgroundWriter is already closed")
+
+        put = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+
+        if not put.done():
+            # the writer died while we waited for queue space
+            put.cancel()
+            self._task.result()
+
+    async def close(self):
+        """Waits for every queued item to be handled."""
+        await self.put(_DONE)
+        await self._task
+
+    async def abort(self):
+        """Stops after the item in progress; queued items are dropped."""
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -0,0 +1,74 @@
+{#
+    Typed column list for one AlphaVantage OVERVIEW document, shared by
+    stg_stockoverview (latest per ticker) and stg_stockoverview_history.
+    Each value is extracted from the VARIANT and cast exactly once here;
+    downstream models use the typed columns as they are.
+#}
+
+{% macro company_overview_columns(raw_column='RAW') %}
+
+    {% set overview_text_fields = [
+        ('Symbol', 'TICKER'),
+        ('AssetType', 'ASSETTYPE'),
+        ('Name', 'NAME'),
+        ('Description', 'DESCRIPTION'),
+        ('CIK', 'CIK'),
+        ('Exchange', 'EXCHANGE'),
+        ('Currency', 'CURRENCY'),
+        ('Country', 'COUNTRY'),
+        ('Sector', 'SECTOR'),
+        ('Industry', 'INDUSTRY'),
+        ('Address', 'ADDRESS'),
+        ('FiscalYearEnd', 'FISCALYEAREND'),
+    ] %}
+
+    {% set overview_date_fields = [
+        ('LatestQuarter', 'LATESTQUARTER'),
+        ('DividendDate', 'DIVIDENDDATE'),
+        ('ExDividendDate', 'EXDIVIDENDDATE'),
+    ] %}
+
+    {% set overview_numeric_fields = [
+        ('MarketCapitalization', 'MARKETCAPITALIZATION'),
+        ('EBITDA', 'EBITDA'),
+        ('PERatio', 'PERATIO'),
+        ('PEGRatio', 'PEGRATIO'),
+        ('BookValue', 'BOOKVALUE'),
+        ('DividendPerShare', 'DIVIDENDPERSHARE'),
+        ('DividendYield', 'DIVIDENDYIELD'),
+        ('EPS', 'EPS'),
+        ('RevenuePerShareTTM', 'REVENUEPERSHARETTM'),
+        ('ProfitMargin', 'PROFITMARGIN'),
+        ('OperatingMarginTTM', 'OPERATINGMARGINTTM'),
+        ('ReturnOnAssetsTTM', 'RETURNONASSETS'),
+        ('ReturnOnEquityTTM', 'RETURNONEQUITY'),
+        ('RevenueTTM', 'REVENUETTM'),
+        ('GrossProfitTTM', 'GROSSPROFITTTM'),
+        ('DilutedEPSTTM', 'DILUTEDEPSTTM'),
+        ('QuarterlyEarningsGrowthYOY', 'QUARTERLYEARNINGSGROWTHYOY'),
+        ('QuarterlyRevenueGrowthYOY', 'QUARTERLYREVENUEGROWTHYOY'),
+        ('AnalystTargetPrice', 'ANALYSTTARGETPRICE'),
+        ('TrailingPE', 'TRAILINGPE'),
+        ('ForwardPE', 'FORWARDPE'),
+        ('PriceToSalesRatioTTM', 'PRICETOSALESTTM'),
+        ('PriceToBookRatio', 'PRICETOBOOKRATIO'),
+        ('EVToRevenue', 'EVTOREVENUE'),
+        ('EVToEBITDA', 'EVTOEBITDA'),
+        ('Beta', 'BETA'),
+        ('52WeekHigh', 'WEEK52HIGH'),
+        ('52WeekLow', 'WEEK52LOW'),
+        ('50DayMovingAverage', 'DAY50MOVINGAVERAGE'),
+        ('200DayMovingAverage', 'DAY200MOVINGAVERAGE'),
+        ('SharesOutstanding', 'SHARESOUTSTANDING'),
+    ] %}
+
+    {%- for key, alias in overview_text_fields %}
+        {{ json_text(raw_column, key) }} as {{ alias }},
+    {%- endfor %}
+    {%- for key, alias in overview_date_fields %}
+        {{ try_cast_date(json_text(raw_column, key)) }} as {{ alias }},
+    {%- endfor %}
+    {%- for key, alias in overview_numeric_fields %}
+        {{ try_cast_double(json_text(raw_column, key)) }} as {{ alias }},
+    {%- endfor %}
+{% endmacro %}
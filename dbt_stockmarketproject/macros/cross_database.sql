@@ -0,0 +1,109 @@
+{#
+    Snowflake conversion functions used by the models, dispatched so the
+    project also builds on the local DuckDB target (local_duckdb/).
+    Snowflake keeps its native functions; other adapters get plain casts.
+#}
+
+{% macro cast_double(expression) -%}
+    {{ return(adapter.dispatch('cast_double', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__cast_double(expression) -%}
+    cast({{ expression }} as double)
+{%- endmacro %}
+
+{% macro snowflake__cast_double(expression) -%}
+    to_double({{ expression }})
+{%- endmacro %}
+
+
+{% macro cast_number(expression) -%}
+    {{ return(adapter.dispatch('cast_number', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__cast_number(expression) -%}
+    cast({{ expression }} as bigint)
+{%- endmacro %}
+
+{% macro snowflake__cast_number(expression) -%}
+    to_number({{ expression }})
+{%- endmacro %}
+
+
+{% macro cast_date(expression) -%}
+    {{ return(adapter.dispatch('cast_date', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__cast_date(expression) -%}
+    cast({{ expression }} as date)
+{%- endmacro %}
+
+{% macro snowflake__cast_date(expression) -%}
+    to_date({{ expression }})
+{%- endmacro %}
+
+
+{% macro cast_timestamp_ntz(expression) -%}
+    {{ return(adapter.dispatch('cast_timestamp_ntz', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__cast_timestamp_ntz(expression) -%}
+    cast({{ expression }} as timestamp)
+{%- endmacro %}
+
+{% macro snowflake__cast_timestamp_ntz(expression) -%}
+    to_timestamp_ntz({{ expression }})
+{%- endmacro %}
+
+
+{#
+    Incremental models merge on their unique_key. dbt-duckdb has no
+    MERGE strategy, so it deletes + re-inserts the same keys instead.
+#}
+{% macro merge_strategy() -%}
+    {{ return('merge' if target.type == 'snowflake' else 'delete+insert') }}
+{%- endmacro %}
+
+
+{#
+    Lenient numeric/date parsing for the AlphaVantage overview strings,
+    which use 'None' and '-' for missing values: NULL instead of an error.
+#}
+{% macro try_cast_double(expression) -%}
+    {{ return(adapter.dispatch('try_cast_double', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__try_cast_double(expression) -%}
+    try_cast({{ expression }} as double)
+{%- endmacro %}
+
+{% macro snowflake__try_cast_double(expression) -%}
+    try_to_double({{ expression }})
+{%- endmacro %}
+
+
+{% macro try_cast_date(expression) -%}
+    {{ return(adapter.dispatch('try_cast_date', 'dbt_stockmarketproject')(expression)) }}
+{%- endmacro %}
+
+{% macro default__try_cast_date(expression) -%}
+    try_cast({{ expression }} as date)
+{%- endmacro %}
+
+{% macro snowflake__try_cast_date(expression) -%}
+    try_to_date({{ expression }})
+{%- endmacro %}
+
+
+{# String value of a top-level key in a JSON/VARIANT column. #}
+{% macro json_text(column, key) -%}
+    {{ return(adapter.dispatch('json_text', 'dbt_stockmarketproject')(column, key)) }}
+{%- endmacro %}
+
+{% macro default__json_text(column, key) -%}
+    json_extract_string({{ column }}, '$."{{ key }}"')
+{%- endmacro %}
+
+{% macro snowflake__json_text(column, key) -%}
+    {{ column }}:"{{ key }}"::string
+{%- endmacro %}
@@ -0,0 +1,115 @@
+{#
+    CTEs for incremental models built from lag()/window functions over
+    stg_stockpricedata. Emits `reprocess_window`, one row per ticker that
+    received bars since this model last ran:
+
+      FIRST_CHANGED_DATE  earliest new or reloaded bar: every row from here
+                          on is recomputed and merged
+      WINDOW_START_DATE   the bar `lookback_rows` rows before it, so every
+                          lag(..., n <= lookback_rows) sees exactly the
+                          predecessors a full refresh would
+
+    "Since this model last ran" is judged on LOAD_TIME (see
+    changed_tickers_cte below), so late-arriving or restated bars for old
+    dates are picked up as well as new dates.
+
+    The prior bar is searched for within var('price_lookback_max_days')
+    calendar days; tickers with fewer bars in that range (new listings,
+    long halts) fall back to their full history.
+#}
+{% macro lookback_window_ctes(source_relation, lookback_rows) %}
+
+{{ changed_tickers_cte(source_relation) }},
+
+lookback_start as (
+
+    select
+        p.TICKER,
+        p.TRADING_DATE as WINDOW_START_DATE
+    from {{ source_relation }} p
+    join changed_tickers c
+        on p.TICKER = c.TICKER
+    where p.TRADING_DATE < c.FIRST_CHANGED_DATE
+      and p.TRADING_DATE >= {{ dbt.dateadd('day', -var('price_lookback_max_days'), 'c.FIRST_CHANGED_DATE') }}
+    qualify row_number() over (
+        partition by p.TICKER
+        order by p.TRADING_DATE desc
+    ) = {{ lookback_rows }}
+
+),
+
+reprocess_window as (
+
+    select
+        c.TICKER,
+        c.FIRST_CHANGED_DATE,
+        coalesce(l.WINDOW_START_DATE, {{ cast_date("'1900-01-01'") }}) as WINDOW_START_DATE
+    from changed_tickers c
+    left join lookback_start l
+        on c.TICKER = l.TICKER
+
+)
+
+{% endmacro %}
+
+
+{#
+    `changed_tickers`: one row per ticker with bars loaded after the
+    newest LOAD_TIME already in {{ this }}, and the earliest TRADING_DATE
+    among them.
+#}
+{% macro changed_tickers_cte(source_relation) %}
+
+changed_tickers as (
+
+    select
+        TICKER,
+        min(TRADING_DATE) as FIRST_CHANGED_DATE
+    from {{ source_relation }}
+    where LOAD_TIME > {{ load_time_watermark() }}
+    group by TICKER
+
+)
+
+{% endmacro %}
+
+
+{#
+    Scalar subquery: the newest LOAD_TIME already in {{ this }}, re-opened
+    by var('late_load_lookback_hours') to catch files that landed out of
+    LOAD_TIME order (re-merging those rows is harmless).
+#}
+{% macro load_time_watermark() %}
+    (
+        select {{ dbt.dateadd(
+            'hour',
+            -var('late_load_lookback_hours'),
+            "coalesce(max(LOAD_TIME), " ~ cast_timestamp_ntz("'1900-01-01'") ~ ")"
+        ) }}
+        from {{ this }}
+    )
+{%- endmacro %}
+
+
+{#
+    is_incremental(), but false while {{ this }} has no `column` yet:
+    tables deployed before LOAD_TIME was carried through have nothing to
+    take a watermark from. That first run recomputes the full history and
+    merges it over the existing rows; on_schema_change='append_new_columns'
+    adds the column, so the next run is incremental again. No manual
+    --full-refresh needed.
+#}
+{% macro is_load_time_incremental(column='LOAD_TIME') %}
+    {%- if not is_incremental() -%}
+        {{ return(false) }}
+    {%- endif -%}
+
+    {%- set existing = adapter.get_columns_in_relation(this)
+        | map(attribute='name') | map('lower') | list -%}
+    {%- if column | lower not in existing -%}
+        {{ log("No " ~ column ~ " in " ~ this ~ " yet: rebuilding it in full this run", info=true) }}
+        {{ return(false) }}
+    {%- endif -%}
+
+    {{ return(true) }}
+{%- endmacro %}
@@ -1,7 +1,8 @@
 {{ config(
     materialized = 'incremental',
     unique_key = 'ticker',
-    incremental_strategy = 'merge'
+    incremental_strategy = merge_strategy(),
+    on_schema_change = 'append_new_columns'
 ) }}
 
 select
@@ -11,5 +12,10 @@ select
     peratio,
     eps,
     RevenueTTM,
-    EVToEBITDA
+    EVToEBITDA,
+    load_time
 from {{ ref('stg_stockoverview') }}
+
+{% if is_load_time_incremental() %}
+where load_time > {{ load_time_watermark() }}
+{% endif %}
@@ -1,66 +1,89 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized = 'incremental',
+        unique_key = ['TICKER', 'TRADING_DATE'],
+        incremental_strategy = merge_strategy(),
+        on_schema_change = 'append_new_columns'
+    )
+}}
 
-with base as (
+{% set incremental = is_load_time_incremental() %}
+
+with
+
+{% if incremental %}
+-- only tickers with new/reloaded bars, plus the 126 prior bars the
+-- longest lag() needs
+{{ lookback_window_ctes(ref('stg_stockpricedata'), lookback_rows=126) }},
+{% endif %}
+
+base as (
 
     select
         p.TICKER,
         p.TRADING_DATE,
-        p.CLOSE_PRICE
+        p.CLOSE_PRICE,
+        p.LOAD_TIME
     from {{ ref('stg_stockpricedata') }} p
 
+    {% if incremental %}
+    join reprocess_window w
+        on p.TICKER = w.TICKER
+       and p.TRADING_DATE >= w.WINDOW_START_DATE
+    {% endif %}
+
+),
+
+momentum as (
+
+    select
+        b.TICKER,
+        b.TRADING_DATE,
+        b.CLOSE_PRICE,
+
+        -- 1-month return (~21 trading days)
+        (
+            {{ cast_double('b.CLOSE_PRICE') }}
+            /
+            nullif(
+                {{ cast_double('lag(b.CLOSE_PRICE, 21) over (partition by b.TICKER order by b.TRADING_DATE)') }},
+                0
+            )
+        ) - 1 as ONE_MONTH_RETURN,
+
+        -- 3-month return (~63 trading days)
+        (
+            {{ cast_double('b.CLOSE_PRICE') }}
+            /
+            nullif(
+                {{ cast_double('lag(b.CLOSE_PRICE, 63) over (partition by b.TICKER order by b.TRADING_DATE)') }},
+                0
+            )
+        ) - 1 as THREE_MONTH_RETURN,
+
+        -- 6-month return (~126 trading days)
+        (
+            {{ cast_double('b.CLOSE_PRICE') }}
+            /
+            nullif(
+                {{ cast_double('lag(b.CLOSE_PRICE, 126) over (partition by b.TICKER order by b.TRADING_DATE)') }},
+                0
+            )
+        ) - 1 as SIX_MONTH_RETURN,
+
+        -- incremental watermark
+        b.LOAD_TIME
+
+    from base b
+
 )
 
-select
-    b.TICKER,
-    b.TRADING_DATE,
-    b.CLOSE_PRICE,
-
-    -- 1-month return (~21 trading days)
-    (
-        to_double(b.CLOSE_PRICE)
-        /
-        nullif(
-            to_double(
-                lag(b.CLOSE_PRICE, 21)
-                    over (
-                        partition by b.TICKER
-                        order by b.TRADING_DATE
-                    )
-            ),
-            0
-        )
-    ) - 1 as ONE_MONTH_RETURN,
-
-    -- 3-month return (~63 trading days)
-    (
-        to_double(b.CLOSE_PRICE)
-        /
-        nullif(
-            to_double(
-                lag(b.CLOSE_PRICE, 63)
-                    over (
-                        partition by b.TICKER
-                        order by b.TRADING_DATE
-                    )
-            ),
-            0
-        )
-    ) - 1 as THREE_MONTH_RETURN,
-
-    -- 6-month return (~126 trading days)
-    (
-        to_double(b.CLOSE_PRICE)
-        /
-        nullif(
-            to_double(
-                lag(b.CLOSE_PRICE, 126)
-                    over (
-                        partition by b.TICKER
-                        order by b.TRADING_DATE
-                    )
-            ),
-            0
-        )
-    ) - 1 as SIX_MONTH_RETURN
-
-from base b
\ No newline at end of file
+select m.*
+from momentum m
+
+{% if incremental %}
+-- lookback rows only feed the lags; they are already up to date
+join reprocess_window w
+    on m.TICKER = w.TICKER
+   and m.TRADING_DATE >= w.FIRST_CHANGED_DATE
+{% endif %}
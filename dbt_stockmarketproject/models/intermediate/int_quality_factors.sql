@@ -1,35 +1,104 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized = 'incremental' if var('factor_snapshot_history') else 'table',
+    unique_key = ['TICKER', 'AS_OF_DATE'],
+    incremental_strategy = merge_strategy(),
+    on_schema_change = 'append_new_columns'
+) }}
 
-with fundamentals as (
+{#
+    One row per ticker, with price-derived factors measured as of a single
+    date: var('factor_as_of_date') ('YYYY-MM-DD'), or the latest trading
+    date in int_stock_stats. With var('factor_snapshot_history') each run
+    merges its snapshot into the table instead of replacing it, so
+    point-in-time factors are kept per AS_OF_DATE.
+
+    Fundamentals come from stg_stockoverview (latest document) unless the
+    as-of date is set: then they are the latest overview loaded on or
+    before it, from stg_stockoverview_history. A past as-of date without
+    var('build_overview_history') is refused rather than mixing old
+    prices with today's fundamentals.
+#}
+{% set as_of_date = var('factor_as_of_date') %}
+{% set point_in_time = as_of_date and var('build_overview_history') %}
+
+{% if execute and as_of_date and not point_in_time
+      and as_of_date | string < run_started_at.strftime('%Y-%m-%d') %}
+    {{ exceptions.raise_compiler_error(
+        "int_quality_factors: factor_as_of_date " ~ as_of_date ~ " is in the past, but "
+        ~ "only current fundamentals are available. Enable build_overview_history "
+        ~ "to read them as of that date."
+    ) }}
+{% endif %}
+
+with as_of as (
+
+    {% if as_of_date %}
+    select {{ cast_date("'" ~ as_of_date ~ "'") }} as AS_OF_DATE
+    {% else %}
+    select max(TRADING_DATE) as AS_OF_DATE
+    from {{ ref('int_stock_stats') }}
+    {% endif %}
+
+),
+
+fundamentals as (
     select
-        TICKER,
-        RETURNONEQUITY,
-        RETURNONASSETS,
-        PROFITMARGIN,
-        OPERATINGMARGINTTM,
-        GROSSPROFITTTM,
-        REVENUETTM,
-        BETA
-    from {{ ref('stg_stockoverview') }}
+        o.TICKER,
+        o.RETURNONEQUITY,
+        o.RETURNONASSETS,
+        o.PROFITMARGIN,
+        o.OPERATINGMARGINTTM,
+        o.GROSSPROFITTTM,
+        o.REVENUETTM,
+        o.BETA
+    {% if point_in_time %}
+    from {{ ref('stg_stockoverview_history') }} o
+    cross join as_of a
+    where {{ cast_date('o.LOAD_TIME') }} <= a.AS_OF_DATE
+    qualify row_number() over (
+        partition by o.TICKER
+        order by o.LOAD_TIME desc
+    ) = 1
+    {% else %}
+    from {{ ref('stg_stockoverview') }} o
+    {% endif %}
 ),
 
-volatility as (
+-- the 30 most recent bars per ticker on or before the as-of date
+recent_returns as (
     select
         s.TICKER,
+        s.TRADING_DATE,
+        s.DAILY_RETURN
+    from {{ ref('int_stock_stats') }} s
+    cross join as_of a
+    where s.TRADING_DATE <= a.AS_OF_DATE
+      and s.TRADING_DATE > {{ dbt.dateadd('day', -var('price_lookback_max_days'), 'a.AS_OF_DATE') }}
+    qualify row_number() over (
+        partition by s.TICKER
+        order by s.TRADING_DATE desc
+    ) <= 30
+),
+
+volatility as (
+    select
+        TICKER,
 
-        -- 30-day rolling volatility of daily returns
-        stddev(s.DAILY_RETURN)
-            over (
-                partition by s.TICKER
-                order by s.TRADING_DATE
-                rows between 29 preceding and current row
-            ) as DAILY_VOLATILITY
+        -- bar the price factors are measured at
+        max(TRADING_DATE) as TRADING_DATE,
 
-    from {{ ref('int_stock_stats') }} s
+        -- 30-day volatility of daily returns (the rolling window's value
+        -- on that bar)
+        stddev(DAILY_RETURN) as DAILY_VOLATILITY
+
+    from recent_returns
+    group by TICKER
 )
 
 select
     f.TICKER,
+    a.AS_OF_DATE,
+    v.TRADING_DATE,
 
     f.RETURNONEQUITY       as return_on_equity,
     f.RETURNONASSETS       as return_on_assets,
@@ -51,5 +120,6 @@ select
     ) as quality_score
 
 from fundamentals f
+cross join as_of a
 left join volatility v
-    on f.TICKER = v.TICKER
\ No newline at end of file
+    on f.TICKER = v.TICKER
@@ -6,12 +6,12 @@ WITH context_info AS (
         INDUSTRY,
         TICKER,
 
-        -- Safe null handling for numeric fields
-        CAST(NULLIF(MARKETCAPITALIZATION, 'None') AS FLOAT) AS market_capitalization,
-        CAST(NULLIF(EBITDA, 'None') AS FLOAT) AS ebitda,
-        CAST(NULLIF(PERATIO, 'None') AS FLOAT) AS pe_ratio,
-        CAST(NULLIF(REVENUETTM, 'None') AS FLOAT) AS revenue_ttm,
-        CAST(NULLIF(GROSSPROFITTTM, 'None') AS FLOAT) AS gross_profit_ttm
+        -- already typed in stg_stockoverview ('None' -> NULL)
+        MARKETCAPITALIZATION AS market_capitalization,
+        EBITDA AS ebitda,
+        PERATIO AS pe_ratio,
+        REVENUETTM AS revenue_ttm,
+        GROSSPROFITTTM AS gross_profit_ttm
 
     FROM {{ ref('stg_stockoverview') }}
 
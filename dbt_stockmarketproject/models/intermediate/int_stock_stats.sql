@@ -1,14 +1,37 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized = 'incremental',
+        unique_key = ['TICKER', 'TRADING_DATE'],
+        incremental_strategy = merge_strategy(),
+        on_schema_change = 'append_new_columns'
+    )
+}}
 
-with base as (
+{% set incremental = is_load_time_incremental() %}
+
+with
+
+{% if incremental %}
+-- only tickers with new/reloaded bars, plus the 1 prior bar lag() needs
+{{ lookback_window_ctes(ref('stg_stockpricedata'), lookback_rows=1) }},
+{% endif %}
+
+base as (
 
     select
         p.TICKER,
         p.TRADING_DATE,
         p.CLOSE_PRICE,
-        p.VOLUME
+        p.VOLUME,
+        p.LOAD_TIME
     from {{ ref('stg_stockpricedata') }} p
 
+    {% if incremental %}
+    join reprocess_window w
+        on p.TICKER = w.TICKER
+       and p.TRADING_DATE >= w.WINDOW_START_DATE
+    {% endif %}
+
 ),
 
 stats as (
@@ -28,23 +51,27 @@ stats as (
 
         -- daily return (Snowflake-safe)
         (
-            to_double(b.CLOSE_PRICE)
+            {{ cast_double('b.CLOSE_PRICE') }}
             /
             nullif(
-                to_double(
-                    lag(b.CLOSE_PRICE)
-                        over (
-                            partition by b.TICKER
-                            order by b.TRADING_DATE
-                        )
-                ),
+                {{ cast_double('lag(b.CLOSE_PRICE) over (partition by b.TICKER order by b.TRADING_DATE)') }},
                 0
             )
-        ) - 1 as DAILY_RETURN
+        ) - 1 as DAILY_RETURN,
+
+        -- incremental watermark
+        b.LOAD_TIME
 
     from base b
 
 )
 
-select *
-from stats
\ No newline at end of file
+select s.*
+from stats s
+
+{% if incremental %}
+-- lookback rows only feed the windows; they are already up to date
+join reprocess_window w
+    on s.TICKER = w.TICKER
+   and s.TRADING_DATE >= w.FIRST_CHANGED_DATE
+{% endif %}
@@ -1,4 +1,41 @@
-{{ config(materialized='view') }}
+{{
+    config(
+        materialized = 'incremental',
+        unique_key = ['TICKER', 'TRADING_DATE'],
+        incremental_strategy = merge_strategy(),
+        on_schema_change = 'append_new_columns',
+        cluster_by = ['TRADING_DATE', 'TICKER']
+    )
+}}
+
+{% set incremental = is_load_time_incremental() %}
+
+with
+
+{% if incremental %}
+-- tickers with new/reloaded bars; int_stock_stats and int_price_momentum
+-- recompute those tickers from the first changed date on, so do we
+{{ changed_tickers_cte(ref('stg_stockpricedata')) }},
+{% endif %}
+
+prices as (
+
+    select
+        p.TICKER,
+        p.TRADING_DATE,
+        p.CLOSE_PRICE,
+        p.ADJUSTED_CLOSE_PRICE,
+        p.VOLUME,
+        p.LOAD_TIME
+    from {{ ref('stg_stockpricedata') }} p
+
+    {% if incremental %}
+    join changed_tickers c
+        on p.TICKER = c.TICKER
+       and p.TRADING_DATE >= c.FIRST_CHANGED_DATE
+    {% endif %}
+
+)
 
 select
     p.TICKER,
@@ -9,11 +46,14 @@ select
     s.DAILY_RETURN,
     m.ONE_MONTH_RETURN,
     m.THREE_MONTH_RETURN,
-    m.SIX_MONTH_RETURN
-from {{ ref('stg_stockpricedata') }} p
+    m.SIX_MONTH_RETURN,
+
+    -- incremental watermark
+    p.LOAD_TIME
+from prices p
 left join {{ ref('int_stock_stats') }} s
     on p.TICKER = s.TICKER
    and p.TRADING_DATE = s.TRADING_DATE
 left join {{ ref('int_price_momentum') }} m
     on p.TICKER = m.TICKER
-   and p.TRADING_DATE = m.TRADING_DATE
\ No newline at end of file
+   and p.TRADING_DATE = m.TRADING_DATE
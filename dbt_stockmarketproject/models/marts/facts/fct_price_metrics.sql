@@ -1,18 +1,31 @@
 {{ config(
     materialized = 'incremental',
     unique_key = ['ticker','trading_date'],
-    incremental_strategy = 'merge'
+    incremental_strategy = merge_strategy(),
+    on_schema_change = 'append_new_columns'
 ) }}
 
+{% set incremental = is_load_time_incremental() %}
+
+-- depends_on: {{ ref('stg_stockpricedata') }}
+
+{% if incremental %}
+-- tickers with new/restated bars; int_price_momentum recomputes them
+-- from the first changed date on, so re-merge the same rows
+with
+{{ changed_tickers_cte(ref('stg_stockpricedata')) }}
+{% endif %}
+
 select
-    ticker,
-    trading_date,
-    one_month_return,
-    three_month_return
-from {{ ref('int_price_momentum') }}
+    m.ticker,
+    m.trading_date,
+    m.one_month_return,
+    m.three_month_return,
+    m.load_time
+from {{ ref('int_price_momentum') }} m
 
-{% if is_incremental() %}
-where trading_date > (
-    select max(trading_date) from {{ this }}
-)
+{% if incremental %}
+join changed_tickers c
+    on m.ticker = c.ticker
+   and m.trading_date >= c.first_changed_date
 {% endif %}
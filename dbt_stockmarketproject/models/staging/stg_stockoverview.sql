@@ -1,60 +1,38 @@
-{{ config(materialized='view') }}
+{{
+    config(
+        materialized = 'incremental',
+        unique_key = 'TICKER',
+        incremental_strategy = merge_strategy(),
+        on_schema_change = 'append_new_columns'
+    )
+}}
+
+-- current overview per ticker: JSON parsed and typed once here, only
+-- newly loaded documents read on incremental runs
+-- (full load history: stg_stockoverview_history)
 
 with source as (
 
     select
-        RAW:"Symbol"::string              as TICKER,
-        RAW:"AssetType"::string          as ASSETTYPE,
-        RAW:"Name"::string               as NAME,
-        RAW:"Description"::string        as DESCRIPTION,
-        RAW:"CIK"::string                as CIK,
-        RAW:"Exchange"::string           as EXCHANGE,
-        RAW:"Currency"::string           as CURRENCY,
-        RAW:"Country"::string            as COUNTRY,
-        RAW:"Sector"::string             as SECTOR,
-        RAW:"Industry"::string           as INDUSTRY,
-        RAW:"Address"::string            as ADDRESS,
-        RAW:"FiscalYearEnd"::string      as FISCALYEAREND,
-        RAW:"LatestQuarter"::string      as LATESTQUARTER,
-        RAW:"MarketCapitalization"::string as MARKETCAPITALIZATION,
-        RAW:"EBITDA"::string             as EBITDA,
-        RAW:"PERatio"::string            as PERATIO,
-        RAW:"PEGRatio"::string           as PEGRATIO,
-        RAW:"BookValue"::string          as BOOKVALUE,
-        RAW:"DividendPerShare"::string   as DIVIDENDPERSHARE,
-        RAW:"DividendYield"::string      as DIVIDENDYIELD,
-        RAW:"EPS"::string                as EPS,
-        RAW:"RevenuePerShareTTM"::string as REVENUEPERSHARETTM,
-        RAW:"ProfitMargin"::string       as PROFITMARGIN,
-        RAW:"OperatingMarginTTM"::string as OPERATINGMARGINTTM,
-        RAW:"ReturnOnAssetsTTM"::string  as RETURNONASSETS,
-        RAW:"ReturnOnEquityTTM"::string  as RETURNONEQUITY,
-        RAW:"RevenueTTM"::string         as REVENUETTM,
-        RAW:"GrossProfitTTM"::string     as GROSSPROFITTTM,
-        RAW:"DilutedEPSTTM"::string      as DILUTEDEPSTTM,
-        RAW:"QuarterlyEarningsGrowthYOY"::string as QUARTERLYEARNINGSGROWTHYOY,
-        RAW:"QuarterlyRevenueGrowthYOY"::string  as QUARTERLYREVENUEGROWTHYOY,
-        RAW:"AnalystTargetPrice"::string         as ANALYSTTARGETPRICE,
-        RAW:"TrailingPE"::string                 as TRAILINGPE,
-        RAW:"ForwardPE"::string                  as FORWARDPE,
-        RAW:"PriceToSalesRatioTTM"::string       as PRICETOSALESTTM,
-        RAW:"PriceToBookRatio"::string           as PRICETOBOOKRATIO,
-        RAW:"EVToRevenue"::string                as EVTOREVENUE,
-        RAW:"EVToEBITDA"::string                 as EVTOEBITDA,
-        RAW:"Beta"::string                       as BETA,
-        RAW:"52WeekHigh"::string                 as WEEK52HIGH,
-        RAW:"52WeekLow"::string                  as WEEK52LOW,
-        RAW:"50DayMovingAverage"::string         as DAY50MOVINGAVERAGE,
-        RAW:"200DayMovingAverage"::string        as DAY200MOVINGAVERAGE,
-        RAW:"SharesOutstanding"::string          as SHARESOUTSTANDING,
-        RAW:"DividendDate"::string               as DIVIDENDDATE,
-        RAW:"ExDividendDate"::string             as EXDIVIDENDDATE,
+        {{ company_overview_columns('RAW') }}
 
         METADATA$FILENAME as SOURCE_FILE,
-        LOAD_TIME          as LOAD_TIME
+        {{ cast_timestamp_ntz('LOAD_TIME') }} as LOAD_TIME
 
     from {{ source('stock_data', 'company_overview_json_raw') }}
 
+    {% if is_load_time_incremental() %}
+    where {{ cast_timestamp_ntz('LOAD_TIME') }} > {{ load_time_watermark() }}
+    {% endif %}
+
 )
 
-select * from source
\ No newline at end of file
+select *
+from source
+where TICKER is not null
+
+-- a ticker is re-uploaded whenever its overview changes: keep the latest
+qualify row_number() over (
+    partition by TICKER
+    order by LOAD_TIME desc
+) = 1
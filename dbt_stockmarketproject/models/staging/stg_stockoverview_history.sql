@@ -0,0 +1,31 @@
+{{
+    config(
+        enabled = var('build_overview_history'),
+        materialized = 'incremental',
+        unique_key = ['TICKER', 'LOAD_TIME'],
+        incremental_strategy = merge_strategy(),
+        on_schema_change = 'append_new_columns'
+    )
+}}
+
+-- every loaded overview document, typed like stg_stockoverview
+
+select
+    {{ company_overview_columns('RAW') }}
+
+    METADATA$FILENAME as SOURCE_FILE,
+    {{ cast_timestamp_ntz('LOAD_TIME') }} as LOAD_TIME
+
+from {{ source('stock_data', 'company_overview_json_raw') }}
+
+where {{ json_text('RAW', 'Symbol') }} is not null
+
+{% if is_load_time_incremental() %}
+  and {{ cast_timestamp_ntz('LOAD_TIME') }} > {{ load_time_watermark() }}
+{% endif %}
+
+-- the same file can be loaded twice; keep one row per load
+qualify row_number() over (
+    partition by {{ json_text('RAW', 'Symbol') }}, LOAD_TIME
+    order by METADATA$FILENAME desc
+) = 1
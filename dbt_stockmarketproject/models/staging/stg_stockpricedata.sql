@@ -1,7 +1,8 @@
 {{
     config(
         materialized = 'incremental',
-        unique_key = ['TICKER', 'TRADING_DATE']
+        unique_key = ['TICKER', 'TRADING_DATE'],
+        incremental_strategy = merge_strategy()
     )
 }}
 
@@ -11,33 +12,28 @@ with raw as (
         r.TICKER                                           as TICKER,
 
         -- explicit date casting (prevents dbt compile-time string math)
-        to_date(r.DATE)                                    as TRADING_DATE,
+        {{ cast_date('r.DATE') }}                          as TRADING_DATE,
 
         -- canonical price fields
-        to_double(r.OPEN)                                  as OPEN_PRICE,
-        to_double(r.HIGH)                                  as HIGH_PRICE,
-        to_double(r.LOW)                                   as LOW_PRICE,
-        to_double(r.CLOSE)                                 as CLOSE_PRICE,
-        to_double(r.ADJUSTED_CLOSE)                         as ADJUSTED_CLOSE_PRICE,
+        {{ cast_double('r.OPEN') }}                        as OPEN_PRICE,
+        {{ cast_double('r.HIGH') }}                        as HIGH_PRICE,
+        {{ cast_double('r.LOW') }}                         as LOW_PRICE,
+        {{ cast_double('r.CLOSE') }}                       as CLOSE_PRICE,
+        {{ cast_double('r.ADJUSTED_CLOSE') }}              as ADJUSTED_CLOSE_PRICE,
 
-        to_number(r.VOLUME)                                as VOLUME,
-        to_double(r.DIVIDEND_AMOUNT)                        as DIVIDEND_AMOUNT,
-        to_double(r.SPLIT_COEFFICIENT)                      as SPLIT_COEFFICIENT,
+        {{ cast_number('r.VOLUME') }}                      as VOLUME,
+        {{ cast_double('r.DIVIDEND_AMOUNT') }}             as DIVIDEND_AMOUNT,
+        {{ cast_double('r.SPLIT_COEFFICIENT') }}           as SPLIT_COEFFICIENT,
 
         -- explicit timestamp casting
-        to_timestamp_ntz(r.LOAD_TIME)                      as LOAD_TIME
+        {{ cast_timestamp_ntz('r.LOAD_TIME') }}            as LOAD_TIME
 
     from {{ source('stock_data', 'stock_price_data_raw') }} r
 
-    {% if is_incremental() %}
-        where to_timestamp_ntz(r.LOAD_TIME) >
-            (
-                select coalesce(
-                    max(t.LOAD_TIME),
-                    to_timestamp_ntz('1900-01-01')
-                )
-                from {{ this }} t
-            )
+    {% if is_load_time_incremental() %}
+        -- re-read a window behind the watermark so files that land out of
+        -- LOAD_TIME order are not skipped; the merge makes this idempotent
+        where {{ cast_timestamp_ntz('r.LOAD_TIME') }} > {{ load_time_watermark() }}
     {% endif %}
 
 )
@@ -45,3 +41,10 @@ with raw as (
 select *
 from raw
 where TICKER is not null
+
+-- restated/backfilled bars arrive as new rows for an existing date:
+-- keep only the latest load of each bar
+qualify row_number() over (
+    partition by TICKER, TRADING_DATE
+    order by LOAD_TIME desc
+) = 1